@@ -0,0 +1,73 @@
+"""
+Runs the benchmark scenarios headless and collects their results as JSON.
+
+Run from the repository root, with the environment set up to start the game:
+
+    python bench/run.py --exe core/defense-x86_64 --output results.json
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+SCENARIOS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios')
+
+
+def run_scenario(exe: str, script: str, frames: int) -> Optional[Dict[str, Any]]:
+    """
+    Runs a scenario, returns its results or None if it failed to report them.
+    """
+    cmd = [exe, '--headless', '--bench', '--frames', str(frames), '--script', script]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, universal_newlines=True, check=False)
+
+    # the game output is interleaved with the results line
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith('{'):
+            try:
+                return dict(json.loads(line))
+            except ValueError:
+                continue
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Runs the engine benchmark scenarios.')
+    parser.add_argument('--exe', required=True, help='game executable')
+    parser.add_argument('--frames', type=int, default=600, help='frames per scenario')
+    parser.add_argument('--output', help='results file, defaults to stdout')
+    parser.add_argument('scenarios', nargs='*', help='scenario names, defaults to all')
+    args = parser.parse_args()
+
+    # underscored modules hold code shared by scenarios
+    names = args.scenarios or sorted(
+        os.path.splitext(os.path.basename(path))[0]
+        for path in glob.glob(os.path.join(SCENARIOS_DIRECTORY, '[!_]*.py'))
+    )
+
+    results: List[Dict[str, Any]] = []
+    failed = False
+    for name in names:
+        script = os.path.relpath(os.path.join(SCENARIOS_DIRECTORY, name + '.py'))
+        result = run_scenario(args.exe, script, args.frames)
+        if result is None:
+            sys.stderr.write(f'scenario "{name}" failed\n')
+            failed = True
+            continue
+        results.append(result)
+
+    output = json.dumps({'frames': args.frames, 'scenarios': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file_handle:
+            file_handle.write(output + '\n')
+    else:
+        print(output)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
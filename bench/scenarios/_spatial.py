@@ -0,0 +1,51 @@
+"""
+Spatial grid scenarios, mobs wandering across a map while towers pick their
+targets and projectiles test their hits each frame.
+"""
+import numpy
+from beer.bench import Benchmark
+from beer.spatial import SpatialGrid
+
+# map size in tiles, and tile size in pixels
+MAP_SIZE = 128
+TILE_SIZE = 16
+
+TOWERS_COUNT = 64
+TOWER_RANGE = 4 * TILE_SIZE
+PROJECTILES_COUNT = 256
+
+
+class SpatialScenario:
+    """
+    Scenario with the given number of mobs, its functions are exported as the
+    game script ones.
+    """
+
+    def __init__(self, name: str, count: int) -> None:
+        self.__bench = Benchmark(name)
+        self.__rng = numpy.random.RandomState(0)  # pylint: disable=no-member
+        self.__grid = SpatialGrid(MAP_SIZE, MAP_SIZE, TILE_SIZE, TILE_SIZE)
+        size = MAP_SIZE * TILE_SIZE
+        self.__positions = self.__rng.uniform(0, size, (count, 2))
+        self.__velocities = self.__rng.uniform(-50, 50, (count, 2))
+        self.__towers = self.__rng.uniform(0, size, (TOWERS_COUNT, 2))
+
+    def init(self) -> None:
+        self.__grid.update(self.__positions)
+
+    def update(self, delta_time: float) -> None:
+        size = MAP_SIZE * TILE_SIZE
+        self.__positions += self.__velocities * delta_time
+        outside = (self.__positions < 0) | (self.__positions >= size)
+        self.__velocities[outside] = -self.__velocities[outside]
+        numpy.clip(self.__positions, 0, size - 1, out=self.__positions)
+        self.__grid.update(self.__positions)
+
+        self.__grid.nearest(self.__towers, TOWER_RANGE)
+        for x, y in self.__rng.uniform(0, size, (PROJECTILES_COUNT, 2)):
+            self.__grid.query_rect(x, y, TILE_SIZE, TILE_SIZE)
+
+        self.__bench.frame()
+
+    def fini(self) -> None:
+        self.__bench.report()
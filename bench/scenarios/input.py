@@ -0,0 +1,33 @@
+"""
+Benchmark scenario: bursts of key events, queued and polled every frame.
+"""
+from beer.bench import Benchmark
+from beer.event import KeyCode, get_key_states, poll_events, push_key_event
+
+EVENTS_PER_FRAME = 200
+
+BENCH = Benchmark('input')
+
+EVENTS = 0
+
+
+def init() -> None:
+    pass
+
+
+def update(delta_time: float) -> None:  # pylint: disable=unused-argument
+    global EVENTS  # pylint: disable=global-statement
+
+    # events pushed now are polled on the next frame
+    keys = list(KeyCode)
+    for index in range(EVENTS_PER_FRAME):
+        push_key_event(keys[index // 2 % len(keys)], index % 2 == 0)
+
+    key_states = get_key_states()
+    pressed = {code for code in KeyCode if key_states[code]}
+    EVENTS += len(poll_events()) + len(pressed)
+    BENCH.frame()
+
+
+def fini() -> None:
+    BENCH.report()
@@ -0,0 +1,10 @@
+"""
+Benchmark scenario: spatial grid queries over 10k mobs.
+"""
+from _spatial import SpatialScenario
+
+SCENARIO = SpatialScenario('spatial_10k', 10000)
+
+init = SCENARIO.init
+update = SCENARIO.update
+fini = SCENARIO.fini
@@ -0,0 +1,10 @@
+"""
+Benchmark scenario: spatial grid queries over 1k mobs.
+"""
+from _spatial import SpatialScenario
+
+SCENARIO = SpatialScenario('spatial_1k', 1000)
+
+init = SCENARIO.init
+update = SCENARIO.update
+fini = SCENARIO.fini
@@ -0,0 +1,45 @@
+"""
+Benchmark scenario: thousands of sprites bouncing across the window.
+"""
+import random
+from typing import List, Tuple
+from beer.bench import Benchmark
+from beer.sprite import Sheet, Sprite
+from beer.texture import load_texture
+
+SHEET_FILENAME = 'game/defense/characters/characters.png'
+SPRITES_COUNT = 5000
+WIDTH = 800
+HEIGHT = 600
+
+BENCH = Benchmark('sprites')
+
+# sprites along with their velocities
+SPRITES: List[Tuple[Sprite, List[float]]] = []
+
+
+def init() -> None:
+    rng = random.Random(0)
+    sheet = Sheet(load_texture(SHEET_FILENAME), [(0, 102, 16, 16)])
+    for _ in range(SPRITES_COUNT):
+        sprite = Sprite(sheet)
+        sprite.position = (rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT))
+        sprite.visible = True
+        SPRITES.append((sprite, [rng.uniform(-100, 100), rng.uniform(-100, 100)]))
+
+
+def update(delta_time: float) -> None:
+    for sprite, velocity in SPRITES:
+        x, y = sprite.position
+        x += velocity[0] * delta_time
+        y += velocity[1] * delta_time
+        if not 0 <= x <= WIDTH:
+            velocity[0] = -velocity[0]
+        if not 0 <= y <= HEIGHT:
+            velocity[1] = -velocity[1]
+        sprite.position = (x, y)
+    BENCH.frame()
+
+
+def fini() -> None:
+    BENCH.report()
@@ -0,0 +1,42 @@
+"""
+Benchmark scenario: textures created from pixels and dropped every frame.
+"""
+from typing import List
+from beer.bench import Benchmark
+from beer.sprite import Sheet, Sprite
+from beer.texture import Texture
+
+TEXTURES_PER_FRAME = 8
+TEXTURE_SIZE = 128
+
+BENCH = Benchmark('textures')
+
+SPRITES: List[Sprite] = []
+
+FRAME = 0
+
+
+def init() -> None:
+    pass
+
+
+def update(delta_time: float) -> None:  # pylint: disable=unused-argument
+    global FRAME  # pylint: disable=global-statement
+    FRAME += 1
+
+    # previous frame sprites and textures are freed as they are replaced
+    sprites = []
+    for index in range(TEXTURES_PER_FRAME):
+        value = (FRAME * TEXTURES_PER_FRAME + index) % 256
+        pixels = bytes([value, 255 - value, 128, 255]) * (TEXTURE_SIZE * TEXTURE_SIZE)
+        texture = Texture.from_pixels(TEXTURE_SIZE, TEXTURE_SIZE, pixels)
+        sprite = Sprite(Sheet(texture, [(0, 0, TEXTURE_SIZE, TEXTURE_SIZE)]))
+        sprite.position = (index * 96.0, 200.0)
+        sprite.visible = True
+        sprites.append(sprite)
+    SPRITES[:] = sprites
+    BENCH.frame()
+
+
+def fini() -> None:
+    BENCH.report()
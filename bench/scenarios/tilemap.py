@@ -0,0 +1,52 @@
+"""
+Benchmark scenario: the demo map with all its layers, under a panning camera.
+"""
+import math
+from typing import List
+from beer import renderer
+from beer.atlas import AtlasBuilder
+from beer.bench import Benchmark
+from beer.tilelayer import TileLayer
+from beer.tilemap import load_map
+
+MAP_FILENAME = 'game/defense/maps/01_demo.tmx'
+MAP_CACHE_FILENAME = 'game/defense/.cache/01_demo.map'
+
+# layers are repeated, to stress the tile layer drawing
+REPEAT = 8
+
+BENCH = Benchmark('tilemap')
+
+LAYERS: List[TileLayer] = []
+
+TIME = 0.0
+
+
+def init() -> None:
+    tile_map = load_map(MAP_FILENAME, MAP_CACHE_FILENAME)
+    builder = AtlasBuilder()
+    for filename, frames in zip(tile_map.sheets, tile_map.frames):
+        builder.add(filename, filename, frames)
+    atlas = builder.build()
+    sheets = [atlas.sheet(filename) for filename in tile_map.sheets]
+    size = tile_map.width, tile_map.height, tile_map.tile_width, tile_map.tile_height
+
+    for index in range(REPEAT):
+        for layer in tile_map.layers:
+            for sheet, plane in layer.planes.items():
+                tile_layer = TileLayer(sheets[sheet], *size)
+                tile_layer.set_tiles(plane)
+                tile_layer.layer = index
+                tile_layer.visible = True
+                LAYERS.append(tile_layer)
+
+
+def update(delta_time: float) -> None:
+    global TIME  # pylint: disable=global-statement
+    TIME += delta_time
+    renderer.set_camera(math.cos(TIME) * 200, math.sin(TIME) * 200, 1.0 + math.sin(TIME * 0.5) * 0.5)
+    BENCH.frame()
+
+
+def fini() -> None:
+    BENCH.report()
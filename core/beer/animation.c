@@ -0,0 +1,221 @@
+#include "animation.h"
+#include "memory.h"
+#include "sprite.h"
+#include <assert.h>
+#include <stddef.h>
+
+// animations are allocated from a pool, so that their addresses stay valid as
+// handles while more are allocated
+#define ANIMATION_PAGE_LEN 256
+
+struct BeerAnimation
+{
+	const struct BeerAnimationClip *clip;
+
+	// animated sprite frame
+	int *frame;
+
+	// current clip frame and time spent on it
+	unsigned index;
+	float time;
+
+	// whether the animation is in the finished list
+	bool finished;
+
+	// links in the playing or finished list
+	struct BeerAnimation *prev, *next;
+};
+
+struct AnimationList
+{
+	struct BeerAnimation *head, *tail;
+};
+
+static struct BeerPool pool = BEER_POOL("animations", struct BeerAnimation, ANIMATION_PAGE_LEN);
+
+static struct AnimationList playing = {NULL, NULL};
+static struct AnimationList finished = {NULL, NULL};
+
+static void
+list_append(struct AnimationList *list, struct BeerAnimation *anim)
+{
+	anim->prev = list->tail;
+	anim->next = NULL;
+	if (list->tail)
+	{
+		list->tail->next = anim;
+	}
+	else
+	{
+		list->head = anim;
+	}
+	list->tail = anim;
+}
+
+static void
+list_remove(struct AnimationList *list, struct BeerAnimation *anim)
+{
+	if (anim->prev)
+	{
+		anim->prev->next = anim->next;
+	}
+	else
+	{
+		list->head = anim->next;
+	}
+
+	if (anim->next)
+	{
+		anim->next->prev = anim->prev;
+	}
+	else
+	{
+		list->tail = anim->prev;
+	}
+}
+
+static beer_err
+play(int *frame, const struct BeerAnimationClip *clip, struct BeerAnimation **r_anim)
+{
+	struct BeerAnimation *anim = NULL;
+	beer_err err = beer_pool_new(&pool, &anim);
+	if (err)
+	{
+		return err;
+	}
+
+	anim->clip = clip;
+	anim->frame = frame;
+	anim->index = 0;
+	anim->time = 0;
+	anim->finished = false;
+	list_append(&playing, anim);
+
+	*frame = clip->frames[0];
+	*r_anim = anim;
+	return BEER_OK;
+}
+
+beer_err
+beer_animation_play_sprite(
+	struct BeerSprite *sprite,
+	const struct BeerAnimationClip *clip,
+	struct BeerAnimation **r_anim
+)
+{
+	assert(sprite);
+	assert(clip && clip->len > 0);
+	assert(r_anim);
+
+	return play(&sprite->frame, clip, r_anim);
+}
+
+beer_err
+beer_animation_play_batch(
+	struct BeerSpriteBatch *batch,
+	const unsigned *indices,
+	unsigned len,
+	const struct BeerAnimationClip *clip,
+	struct BeerAnimation **r_anims
+)
+{
+	assert(batch);
+	assert(indices || len == 0);
+	assert(clip && clip->len > 0);
+	assert(r_anims || len == 0);
+
+	for (unsigned i = 0; i < len; i++)
+	{
+		assert(indices[i] < batch->len);
+		beer_err err = play(batch->frames + indices[i], clip, r_anims + i);
+		if (err)
+		{
+			// no animation is started unless all of them are
+			beer_animation_stop(r_anims, i);
+			return err;
+		}
+	}
+
+	return BEER_OK;
+}
+
+beer_err
+beer_animation_stop(struct BeerAnimation *const *anims, unsigned len)
+{
+	assert(anims || len == 0);
+
+	for (unsigned i = 0; i < len; i++)
+	{
+		struct BeerAnimation *anim = anims[i];
+		assert(anim && anim->clip);
+		list_remove(anim->finished ? &finished : &playing, anim);
+		beer_pool_free(&pool, anim);
+	}
+
+	return BEER_OK;
+}
+
+beer_err
+beer_animation_poll_finished(struct BeerAnimation **r_anims, unsigned len, unsigned *r_count)
+{
+	assert(r_anims || len == 0);
+	assert(r_count);
+
+	unsigned count = 0;
+	while (count < len && finished.head)
+	{
+		struct BeerAnimation *anim = finished.head;
+		list_remove(&finished, anim);
+		beer_pool_free(&pool, anim);
+		r_anims[count++] = anim;
+	}
+	*r_count = count;
+
+	return BEER_OK;
+}
+
+void
+beer_animation_update(float dt)
+{
+	struct BeerAnimation *anim = playing.head;
+	while (anim)
+	{
+		struct BeerAnimation *next = anim->next;
+		const struct BeerAnimationClip *clip = anim->clip;
+
+		// frames shorter than the frame time are skipped over
+		anim->time += dt;
+		while (anim->time >= clip->durations[anim->index])
+		{
+			if (anim->index + 1 < clip->len)
+			{
+				anim->time -= clip->durations[anim->index];
+				anim->index++;
+			}
+			else if (clip->loop)
+			{
+				anim->time -= clip->durations[anim->index];
+				anim->index = 0;
+			}
+			else
+			{
+				// the last frame stays on
+				list_remove(&playing, anim);
+				list_append(&finished, anim);
+				anim->finished = true;
+				break;
+			}
+		}
+
+		*anim->frame = clip->frames[anim->index];
+		anim = next;
+	}
+}
+
+void
+beer_animation_fini(void)
+{
+	beer_pool_fini(&pool);
+	playing = (struct AnimationList){NULL, NULL};
+	finished = (struct AnimationList){NULL, NULL};
+}
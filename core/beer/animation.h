@@ -0,0 +1,55 @@
+#pragma once
+
+#include "defs.h"
+#include "error.h"
+#include <stdbool.h>
+
+struct BeerSprite;
+struct BeerSpriteBatch;
+struct BeerAnimation;
+
+struct BeerAnimationClip
+{
+	// sheet frames shown in turn
+	int *frames;
+
+	// time each frame is shown for, in seconds, all of them positive
+	float *durations;
+
+	// number of frames
+	unsigned len;
+
+	// whether the clip starts over after its last frame, instead of finishing
+	bool loop;
+};
+
+// Animations are advanced by the core once per frame, before drawing, by the
+// frame time. The sprite (or batch) and the clip must outlive the animation.
+BEER_API beer_err
+beer_animation_play_sprite(
+	struct BeerSprite *sprite,
+	const struct BeerAnimationClip *clip,
+	struct BeerAnimation **r_anim
+);
+
+// starts a clip on some sprites of a batch at once, `r_anims` receives one
+// animation per index
+BEER_API beer_err
+beer_animation_play_batch(
+	struct BeerSpriteBatch *batch,
+	const unsigned *indices,
+	unsigned len,
+	const struct BeerAnimationClip *clip,
+	struct BeerAnimation **r_anims
+);
+
+// stops animations, leaving their sprites on the current frame; animations
+// which finished and were not polled yet are dropped as well
+BEER_API beer_err
+beer_animation_stop(struct BeerAnimation *const *anims, unsigned len);
+
+// moves up to `len` of the animations which finished since the last call, in
+// the order they finished, into `r_anims`; they are freed and must not be
+// used afterwards
+BEER_API beer_err
+beer_animation_poll_finished(struct BeerAnimation **r_anims, unsigned len, unsigned *r_count);
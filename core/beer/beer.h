@@ -1,11 +1,16 @@
 #pragma once
 
+#include "animation.h"
 #include "event.h"
 #include "error.h"
 #include "fs.h"
 #include "init.h"
+#include "memory.h"
+#include "pak.h"
 #include "primitives.h"
 #include "renderer.h"
 #include "script.h"
 #include "sprite.h"
+#include "stats.h"
 #include "texture.h"
+#include "tilelayer.h"
@@ -17,6 +17,7 @@ typedef enum beer_err
 	BEER_ERR_FS_NO_ACCESS,
 	BEER_ERR_FS_NOT_A_DIR,
 	BEER_ERR_FS_NOT_A_FILE,
+	BEER_ERR_FS_BAD_ARCHIVE,
 
 	BEER_ERR_PY_INIT,
 	BEER_ERR_PY_COMPILE,
@@ -1,9 +1,18 @@
 #include "event.h"
 #include <assert.h>
 #include <SDL.h>
+#include <string.h>
+
+// key events queue length, must be a power of two
+#define EVENTS_LEN 256
 
 static struct BeerKeyState keys[BEER_KEY_MAX] = {{.pressed = 0}};
 
+// key events ring buffer, `events_head` and `events_tail` wrap around
+static struct BeerKeyEvent events[EVENTS_LEN];
+static unsigned events_head = 0;
+static unsigned events_tail = 0;
+
 static enum BeerKeyCode
 sdlk_to_beer(SDL_Keycode code)
 {
@@ -19,11 +28,44 @@ sdlk_to_beer(SDL_Keycode code)
 	}
 }
 
+static SDL_Keycode
+beer_to_sdlk(enum BeerKeyCode key)
+{
+	switch (key)
+	{
+	case BEER_KEY_W: return SDLK_w;
+	case BEER_KEY_A: return SDLK_a;
+	case BEER_KEY_S: return SDLK_s;
+	case BEER_KEY_D: return SDLK_d;
+	case BEER_KEY_ESC: return SDLK_ESCAPE;
+	case BEER_KEY_SPACE: return SDLK_SPACE;
+	default: return SDLK_UNKNOWN;
+	}
+}
+
 static void
 handle_key_event(const SDL_KeyboardEvent *evt)
 {
-	struct BeerKeyState *state = &keys[sdlk_to_beer(evt->keysym.sym)];
+	enum BeerKeyCode key = sdlk_to_beer(evt->keysym.sym);
+	struct BeerKeyState *state = &keys[key];
 	state->pressed = evt->type == SDL_KEYDOWN;
+
+	if (key == BEER_KEY_UNKNOWN || evt->repeat)
+	{
+		return;
+	}
+
+	// drop the oldest event when the queue is full
+	if (events_tail - events_head == EVENTS_LEN)
+	{
+		events_head++;
+	}
+
+	events[events_tail++ % EVENTS_LEN] = (struct BeerKeyEvent){
+		.key = key,
+		.pressed = state->pressed,
+		.timestamp = evt->timestamp,
+	};
 }
 
 void
@@ -48,3 +90,46 @@ beer_key_get_state(enum BeerKeyCode key, struct BeerKeyState *r_state)
 
 	return BEER_OK;
 }
+
+BEER_API beer_err
+beer_key_get_states(struct BeerKeyState *r_states)
+{
+	assert(r_states);
+
+	memcpy(r_states, keys, sizeof(keys));
+
+	return BEER_OK;
+}
+
+BEER_API beer_err
+beer_key_push_event(enum BeerKeyCode key, bool pressed)
+{
+	assert(key > BEER_KEY_UNKNOWN && key < BEER_KEY_MAX);
+
+	SDL_Event evt = {.type = pressed ? SDL_KEYDOWN : SDL_KEYUP};
+	evt.key.state = pressed ? SDL_PRESSED : SDL_RELEASED;
+	evt.key.keysym.sym = beer_to_sdlk(key);
+
+	if (SDL_PushEvent(&evt) < 0)
+	{
+		return BEER_ERR_SDL;
+	}
+
+	return BEER_OK;
+}
+
+BEER_API beer_err
+beer_key_poll_events(struct BeerKeyEvent *r_events, unsigned len, unsigned *r_count)
+{
+	assert(r_events || len == 0);
+	assert(r_count);
+
+	unsigned count = 0;
+	while (count < len && events_head != events_tail)
+	{
+		r_events[count++] = events[events_head++ % EVENTS_LEN];
+	}
+	*r_count = count;
+
+	return BEER_OK;
+}
@@ -21,5 +21,31 @@ struct BeerKeyState
 	bool pressed;
 };
 
+struct BeerKeyEvent
+{
+	enum BeerKeyCode key;
+
+	// whether the key went down or up
+	bool pressed;
+
+	// event time in milliseconds since initialization
+	unsigned timestamp;
+};
+
 BEER_API beer_err
 beer_key_get_state(enum BeerKeyCode key, struct BeerKeyState *r_state);
+
+// copies the states of all the keys, indexed by key code, into an array of
+// BEER_KEY_MAX states
+BEER_API beer_err
+beer_key_get_states(struct BeerKeyState *r_states);
+
+// queues a synthetic key press or release, handled along with the OS events
+// at the start of the next frame
+BEER_API beer_err
+beer_key_push_event(enum BeerKeyCode key, bool pressed);
+
+// moves up to `len` of the oldest queued key events into `r_events`; the queue
+// keeps only the most recent events, older ones are dropped when it is full
+BEER_API beer_err
+beer_key_poll_events(struct BeerKeyEvent *r_events, unsigned len, unsigned *r_count);
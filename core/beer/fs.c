@@ -3,6 +3,7 @@
 #include "error.h"
 #include "fs.h"
 #include "memory.h"
+#include "pak.h"
 #include <assert.h>
 #include <errno.h>
 #include <stdarg.h>
@@ -20,6 +21,10 @@
 
 extern int errno;
 
+// mounted archives, searched from the last one
+static struct BeerPak **mounts = NULL;
+static unsigned mounts_len = 0;
+
 static beer_err
 errno_to_beer_err(void)
 {
@@ -38,9 +43,72 @@ errno_to_beer_err(void)
 	}
 }
 
+// Finds a file in the mounted archives, by its path relative to the working
+// directory.
+static bool
+find_mounted(const char *path, struct BeerPak **r_pak, unsigned *r_index)
+{
+	while (path[0] == '.' && path[1] == '/')
+	{
+		path += 2;
+	}
+
+	for (unsigned i = mounts_len; i-- > 0;)
+	{
+		if (beer_pak_find(mounts[i], path, r_index) == BEER_OK)
+		{
+			*r_pak = mounts[i];
+			return true;
+		}
+	}
+	return false;
+}
+
+beer_err
+beer_fs_mount(const char *path)
+{
+	assert(path);
+
+	struct BeerPak *pak = NULL;
+	beer_err err = beer_pak_open(path, &pak);
+	if (err)
+	{
+		return err;
+	}
+
+	err = beer_realloc((mounts_len + 1) * sizeof(struct BeerPak*), (void**)&mounts);
+	if (err)
+	{
+		beer_pak_close(pak);
+		return err;
+	}
+	mounts[mounts_len++] = pak;
+
+	return BEER_OK;
+}
+
+void
+beer_fs_fini(void)
+{
+	for (unsigned i = 0; i < mounts_len; i++)
+	{
+		beer_pak_close(mounts[i]);
+	}
+	beer_free(mounts);
+	mounts = NULL;
+	mounts_len = 0;
+}
+
 beer_err
 beer_dir_list(const char *path, char **r_paths[], int *r_paths_len)
 {
+	assert(path);
+	assert(r_paths);
+	assert(r_paths_len);
+
+	*r_paths = NULL;
+	*r_paths_len = 0;
+
 #ifdef BEER_ON_UNIX
 	// open the directory
 	DIR *dir = opendir(path);
@@ -49,26 +117,46 @@ beer_dir_list(const char *path, char **r_paths[], int *r_paths_len)
 		return errno_to_beer_err();
 	}
 
-	// read the number of entries and reset the reading to the beginning
-	size_t len = 0;
+	// fill an array of entry names in one pass, growing it as needed
+	beer_err err = BEER_OK;
+	char **paths = NULL;
+	int len = 0, capacity = 0;
 	struct dirent *dirent;
-	long pos = telldir(dir);
 	while ((dirent = readdir(dir)))
 	{
+		if (len == capacity)
+		{
+			int new_capacity = capacity ? capacity * 2 : 16;
+			char **new_paths = realloc(paths, new_capacity * sizeof(char*));
+			if (!new_paths)
+			{
+				err = BEER_ERR_NO_MEM;
+				break;
+			}
+			paths = new_paths;
+			capacity = new_capacity;
+		}
+
+		if (!(paths[len] = strndup(dirent->d_name, 256)))
+		{
+			err = BEER_ERR_NO_MEM;
+			break;
+		}
 		len++;
 	}
-	seekdir(dir, pos);
 
-	// allocate an array of string pointers and fill it with entry names
-	char **paths = malloc(len * sizeof(char*));
-	int i = 0;
-	while ((dirent = readdir(dir)))
+	closedir(dir);
+
+	if (err)
 	{
-		paths[i++] = strndup(dirent->d_name, 256);
+		while (len > 0)
+		{
+			free(paths[--len]);
+		}
+		free(paths);
+		return err;
 	}
 
-	closedir(dir);
-
 	*r_paths = paths;
 	*r_paths_len = len;
 #endif
@@ -82,6 +170,14 @@ beer_file_get_type(const char *path, enum BeerFileType *type)
 	assert(path);
 	assert(type);
 
+	struct BeerPak *pak;
+	unsigned index;
+	if (find_mounted(path, &pak, &index))
+	{
+		*type = BEER_FILE_TYPE_FILE;
+		return BEER_OK;
+	}
+
 #ifdef BEER_ON_UNIX
 	struct stat st;
 	if (stat(path, &st) != 0)
@@ -118,6 +214,25 @@ beer_file_read(const char *path, char **r_data, size_t *r_size)
 	FILE *fp = NULL;
 	*r_data = NULL;
 
+	// mounted files are copied, to keep the data owned by the caller
+	const char *mapped;
+	if (beer_file_map(path, &mapped, &size) == BEER_OK)
+	{
+		err = beer_alloc(size + 1, (void**)r_data);
+		if (err)
+		{
+			return err;
+		}
+		memcpy(*r_data, mapped, size);
+		(*r_data)[size] = 0;
+
+		if (r_size)
+		{
+			*r_size = size + 1;
+		}
+		return BEER_OK;
+	}
+
 	if (stat(path, &st) != 0)
 	{
 		return errno_to_beer_err();
@@ -177,6 +292,77 @@ cleanup:
 	return err;
 }
 
+beer_err
+beer_file_map(const char *path, const char **r_data, size_t *r_size)
+{
+	assert(path);
+	assert(r_data);
+	assert(r_size);
+
+	struct BeerPak *pak;
+	unsigned index;
+	if (!find_mounted(path, &pak, &index))
+	{
+		return BEER_ERR_FS_NO_ENTRY;
+	}
+	return beer_pak_read(pak, index, r_data, r_size);
+}
+
+beer_err
+beer_file_write(const char *path, const char *data, size_t size)
+{
+	assert(path);
+	assert(data || size == 0);
+
+	size_t tmp_len = strlen(path) + sizeof(".tmp");
+	char *tmp_path = NULL;
+	beer_err err = beer_alloc(tmp_len, (void**)&tmp_path);
+	if (err)
+	{
+		return err;
+	}
+	snprintf(tmp_path, tmp_len, "%s.tmp", path);
+
+	FILE *fp = fopen(tmp_path, "wb");
+	if (fp == NULL)
+	{
+		err = errno_to_beer_err();
+		goto cleanup;
+	}
+
+	if (fwrite(data, 1, size, fp) != size)
+	{
+		err = BEER_ERR_IO;
+	}
+
+	if (fclose(fp) != 0 && !err)
+	{
+		err = errno_to_beer_err();
+	}
+
+#ifdef BEER_ON_WINDOWS
+	// rename() does not replace existing files on Windows
+	if (!err)
+	{
+		remove(path);
+	}
+#endif
+
+	if (!err && rename(tmp_path, path) != 0)
+	{
+		err = errno_to_beer_err();
+	}
+
+	if (err)
+	{
+		remove(tmp_path);
+	}
+
+cleanup:
+	beer_free(tmp_path);
+	return err;
+}
+
 char*
 beer_path_join(const char **paths, int paths_len)
 {
@@ -214,6 +400,13 @@ beer_path_exists(const char *path)
 {
 	assert(path);
 
+	struct BeerPak *pak;
+	unsigned index;
+	if (find_mounted(path, &pak, &index))
+	{
+		return true;
+	}
+
 	struct stat st;
 	int exists = stat(path, &st) == 0;
 	errno = 0;
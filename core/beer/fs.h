@@ -12,6 +12,12 @@ enum BeerFileType
 	BEER_FILE_TYPE_FILE
 };
 
+// Mounts an archive, whose files are then found by their path relative to the
+// working directory before those on disk. Archives mounted later take
+// precedence, and all of them stay mounted until shutdown.
+BEER_API beer_err
+beer_fs_mount(const char *path);
+
 BEER_API beer_err
 beer_dir_list(const char *path, char **r_paths[], int *r_paths_len);
 
@@ -21,6 +27,16 @@ beer_file_get_type(const char *path, enum BeerFileType *type);
 BEER_API beer_err
 beer_file_read(const char *path, char **r_data, size_t *r_size);
 
+// Gives the contents of a file of a mounted archive, in place, valid until
+// shutdown.
+BEER_API beer_err
+beer_file_map(const char *path, const char **r_data, size_t *r_size);
+
+// writes a file through a temporary one, so that it is never left partially
+// written
+BEER_API beer_err
+beer_file_write(const char *path, const char *data, size_t size);
+
 BEER_API bool
 beer_path_exists(const char *path);
 
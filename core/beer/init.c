@@ -1,25 +1,152 @@
 #include "init.h"
 #include "renderer.h"
+#include "stats.h"
 #include <SDL.h>
+#include <assert.h>
 #include <stdbool.h>
+#include <stdio.h>
 
 SDL_Window *g_window = NULL;
 SDL_Renderer *g_renderer = NULL;
 
 extern beer_err
-beer_py_init(void);
+beer_py_init(bool minimal, bool import_time);
 
 extern void
 beer_py_fini(void);
 
+extern void
+beer_renderer_fini(void);
+
+extern beer_err
+beer_renderer_snapshot(void);
+
+extern beer_err
+beer_renderer_present_committed(Uint64 tick, unsigned *r_ticks);
+
+extern void
+beer_renderer_set_alpha(float value);
+
 extern void
 handle_sdl_event(const SDL_Event *evt);
 
+extern void
+beer_animation_update(float dt);
+
+extern void
+beer_animation_fini(void);
+
+extern void
+beer_fs_fini(void);
+
+extern void
+beer_memory_end_frame(void);
+
+extern void
+beer_memory_fini(void);
+
+extern beer_err
+beer_pipeline_start(bool (*update)(float), unsigned tick_rate, unsigned max_ticks);
+
+extern bool
+beer_pipeline_sync(const SDL_Event *evts, unsigned len);
+
+extern beer_err
+beer_pipeline_stop(void);
+
+extern void
+beer_pipeline_fini(void);
+
+extern beer_err
+beer_replay_start_recording(unsigned tick_rate);
+
+extern beer_err
+beer_replay_load(const char *filename, unsigned *r_tick_rate);
+
+extern void
+beer_replay_begin_frame(void);
+
+extern void
+beer_replay_record_event(const SDL_Event *evt);
+
+extern void
+beer_replay_end_frame(unsigned ticks, float tick_dt, float frame_dt, float alpha);
+
+extern bool
+beer_replay_next_frame(unsigned *r_ticks, float *r_tick_dt, float *r_frame_dt, float *r_alpha);
+
+extern beer_err
+beer_replay_write(const char *filename);
+
+extern void
+beer_replay_fini(void);
+
+extern void
+beer_stats_init(void);
+
+extern void
+beer_stats_begin_frame(void);
+
+extern void
+beer_stats_mark(enum BeerStatsPhase phase);
+
+extern void
+beer_stats_end_frame(unsigned ticks);
+
 static bool initialized = false;
 
+static struct BeerConfig config;
+
+// simulation time not yet run by ticks, in performance counter units
+static Uint64 tick_acc = 0;
+
+// time beer_init() was called at, in performance counter units
+static Uint64 init_time = 0;
+
+// tick rate of the replayed trace, 0 when its frames ran a single variable
+// tick each
+static unsigned replay_tick_rate = 0;
+
+void
+beer_config_default(unsigned win_w, unsigned win_h, struct BeerConfig *r_config)
+{
+	assert(r_config);
+
+	*r_config = (struct BeerConfig){
+		.width = win_w,
+		.height = win_h,
+		.headless = false,
+		.present_mode = BEER_PRESENT_VSYNC,
+		.max_fps = 0,
+		.tick_rate = 60,
+		.max_ticks = 5,
+		.max_frames = 0,
+		.pipelined = false,
+		.record_filename = NULL,
+		.replay_filename = NULL,
+		.trace_filename = NULL,
+		.python_minimal = false,
+		.python_import_time = false,
+	};
+}
+
 beer_err
-beer_init(unsigned win_w, unsigned win_h)
+beer_init(const struct BeerConfig *cfg)
 {
+	assert(cfg);
+	assert(cfg->tick_rate == 0 || cfg->max_ticks > 0);
+	assert(!cfg->pipelined || cfg->tick_rate > 0);
+	assert(!cfg->pipelined || (!cfg->record_filename && !cfg->replay_filename));
+	assert(!cfg->record_filename || !cfg->replay_filename);
+
+	config = *cfg;
+	init_time = SDL_GetPerformanceCounter();
+
+	if (config.headless)
+	{
+		SDL_setenv("SDL_VIDEODRIVER", "dummy", 1);
+	}
+
 	if (SDL_Init(SDL_INIT_VIDEO) < 0)
 	{
 		return BEER_ERR_INIT;
@@ -29,20 +156,32 @@ beer_init(unsigned win_w, unsigned win_h)
 		"Beer",
 		SDL_WINDOWPOS_CENTERED,
 		SDL_WINDOWPOS_CENTERED,
-		(int)win_w,
-		(int)win_h,
-		0
+		(int)config.width,
+		(int)config.height,
+		config.headless ? SDL_WINDOW_HIDDEN : 0
 	);
 	if (!g_window)
 	{
 		return BEER_ERR_INIT;
 	}
 
-	g_renderer = SDL_CreateRenderer(
-		g_window,
-		-1,
-		SDL_RENDERER_ACCELERATED | SDL_RENDERER_PRESENTVSYNC
-	);
+	Uint32 flags = SDL_RENDERER_TARGETTEXTURE;
+	if (config.headless)
+	{
+		flags |= SDL_RENDERER_SOFTWARE;
+	}
+	else
+	{
+		flags |= SDL_RENDERER_ACCELERATED;
+	}
+
+	// there is no display to sync with when headless
+	if (config.present_mode == BEER_PRESENT_VSYNC && !config.headless)
+	{
+		flags |= SDL_RENDERER_PRESENTVSYNC;
+	}
+
+	g_renderer = SDL_CreateRenderer(g_window, -1, flags);
 	if (!g_renderer)
 	{
 		return BEER_ERR_INIT;
@@ -50,7 +189,23 @@ beer_init(unsigned win_w, unsigned win_h)
 
 	SDL_SetRenderDrawBlendMode(g_renderer, SDL_BLENDMODE_BLEND);
 
-	beer_err err = beer_py_init();
+	beer_stats_init();
+
+	beer_err err = BEER_OK;
+	if (config.record_filename)
+	{
+		err = beer_replay_start_recording(config.tick_rate);
+	}
+	else if (config.replay_filename)
+	{
+		err = beer_replay_load(config.replay_filename, &replay_tick_rate);
+	}
+	if (err != BEER_OK)
+	{
+		return err;
+	}
+
+	err = beer_py_init(config.python_minimal, config.python_import_time);
 	if (err != BEER_OK)
 	{
 		return err;
@@ -72,18 +227,184 @@ beer_init(unsigned win_w, unsigned win_h)
 	return BEER_OK;
 }
 
+static void
+limit_frame_rate(Uint64 frame_start, Uint64 freq)
+{
+	if (config.present_mode != BEER_PRESENT_NO_VSYNC || config.max_fps == 0)
+	{
+		return;
+	}
+
+	// sleep through most of the remaining frame time, the scheduler
+	// granularity makes the last millisecond unreliable
+	Uint64 frame_end = frame_start + freq / config.max_fps;
+	Uint64 now = SDL_GetPerformanceCounter();
+	if (now < frame_end)
+	{
+		Uint32 ms = (Uint32)((frame_end - now) * 1000 / freq);
+		if (ms > 1)
+		{
+			SDL_Delay(ms - 1);
+		}
+		while (SDL_GetPerformanceCounter() < frame_end);
+	}
+}
+
+static bool
+run_ticks(bool (*update)(float), Uint64 elapsed, Uint64 freq, unsigned *r_ticks, beer_err *r_err)
+{
+	if (config.tick_rate == 0)
+	{
+		float dt = (float)((double)elapsed / freq);
+		beer_renderer_set_alpha(1);
+		beer_replay_end_frame(1, dt, dt, 1);
+		*r_ticks = 1;
+		return update != NULL ? update(dt) : true;
+	}
+
+	Uint64 tick = freq / config.tick_rate;
+	float dt = 1.0f / config.tick_rate;
+
+	*r_ticks = 0;
+	tick_acc += elapsed;
+	while (tick_acc >= tick && *r_ticks < config.max_ticks)
+	{
+		if ((*r_err = beer_renderer_snapshot()) != BEER_OK ||
+		    (update != NULL && !update(dt)))
+		{
+			return false;
+		}
+		tick_acc -= tick;
+		(*r_ticks)++;
+	}
+
+	// too far behind, drop whole ticks and keep the fraction of the current
+	// one for interpolation
+	if (tick_acc >= tick)
+	{
+		tick_acc %= tick;
+	}
+
+	float alpha = (float)((double)tick_acc / tick);
+	beer_renderer_set_alpha(alpha);
+	beer_replay_end_frame(*r_ticks, dt, (float)((double)elapsed / freq), alpha);
+
+	return true;
+}
+
+// runs the ticks of the next replayed frame, after handling its key events
+static bool
+replay_ticks(bool (*update)(float), float *r_frame_dt, unsigned *r_ticks, beer_err *r_err)
+{
+	unsigned ticks;
+	float dt, alpha;
+	*r_ticks = 0;
+	if (!beer_replay_next_frame(&ticks, &dt, r_frame_dt, &alpha))
+	{
+		return false;
+	}
+
+	while (*r_ticks < ticks)
+	{
+		if ((replay_tick_rate > 0 && (*r_err = beer_renderer_snapshot()) != BEER_OK) ||
+		    (update != NULL && !update(dt)))
+		{
+			return false;
+		}
+		(*r_ticks)++;
+	}
+
+	beer_renderer_set_alpha(alpha);
+
+	return true;
+}
+
+static beer_err
+run_pipelined(bool (*update)(float))
+{
+	// events polled at once, the simulation thread handles them on its next
+	// tick
+	SDL_Event evts[64];
+	beer_err err = BEER_OK;
+	bool run = true;
+
+	Uint64 freq = SDL_GetPerformanceFrequency();
+	Uint64 tick = freq / config.tick_rate;
+	unsigned frames = 0;
+
+	if ((err = beer_pipeline_start(update, config.tick_rate, config.max_ticks)) != BEER_OK)
+	{
+		return err;
+	}
+
+	while (run)
+	{
+		Uint64 frame_start = SDL_GetPerformanceCounter();
+		beer_stats_begin_frame();
+
+		unsigned len = 0;
+		while (len < sizeof(evts) / sizeof(evts[0]) && SDL_PollEvent(&evts[len]))
+		{
+			if (evts[len].type == SDL_QUIT)
+			{
+				run = false;
+			}
+			len++;
+		}
+
+		beer_stats_mark(BEER_STATS_PHASE_EVENTS);
+
+		// SDL calls made by the script are served here, once per frame
+		run = beer_pipeline_sync(evts, len) && run;
+		beer_stats_mark(BEER_STATS_PHASE_UPDATE);
+
+		bool ok = (err = beer_renderer_clear()) == BEER_OK;
+		beer_stats_mark(BEER_STATS_PHASE_CLEAR);
+
+		unsigned ticks = 0;
+		ok = ok && (err = beer_renderer_present_committed(tick, &ticks)) == BEER_OK;
+		beer_stats_mark(BEER_STATS_PHASE_PRESENT);
+
+		run &= ok;
+
+		limit_frame_rate(frame_start, freq);
+		beer_stats_mark(BEER_STATS_PHASE_WAIT);
+		beer_stats_end_frame(ticks);
+
+		frames++;
+
+		if (config.max_frames && frames == config.max_frames)
+		{
+			run = false;
+		}
+	}
+
+	beer_err sim_err = beer_pipeline_stop();
+	return err != BEER_OK ? err : sim_err;
+}
+
 beer_err
 beer_run(bool (*update)(float))
 {
+	if (config.pipelined)
+	{
+		return run_pipelined(update);
+	}
+
 	SDL_Event evt;
 	beer_err err = BEER_OK;
 	bool run = true;
 
-	Uint32 last_update = SDL_GetTicks(), now;
-	float dt;
+	Uint64 freq = SDL_GetPerformanceFrequency();
+	Uint64 last_update = SDL_GetPerformanceCounter(), now;
+	unsigned frames = 0;
 
 	while (run)
 	{
+		Uint64 frame_start = SDL_GetPerformanceCounter();
+		beer_stats_begin_frame();
+		beer_replay_begin_frame();
+
 		while (SDL_PollEvent(&evt))
 		{
 			if (evt.type == SDL_QUIT)
@@ -91,21 +412,68 @@ beer_run(bool (*update)(float))
 				run = false;
 				break;
 			}
-			else
+			// the replayed key events replace the live ones, including those
+			// pushed by the script, which are recorded as well
+			else if (!config.replay_filename)
 			{
 				handle_sdl_event(&evt);
+				beer_replay_record_event(&evt);
 			}
 		}
 
-		now = SDL_GetTicks();
-		dt = (now - last_update) / 1000.0f;
+		beer_stats_mark(BEER_STATS_PHASE_EVENTS);
+
+		now = SDL_GetPerformanceCounter();
+		Uint64 elapsed = now - last_update;
 		last_update = now;
 
-		run &= (
-			(update != NULL ? update(dt) : true) &&
-			(err = beer_renderer_clear()) == BEER_OK &&
-			(err = beer_renderer_present()) == BEER_OK
-		);
+		unsigned ticks = 0;
+		float frame_dt = (float)((double)elapsed / freq);
+		bool ok = true;
+		if (config.replay_filename)
+		{
+			// the run ends along with the trace
+			ok = replay_ticks(update, &frame_dt, &ticks, &err);
+		}
+		else
+		{
+			ok = run_ticks(update, elapsed, freq, &ticks, &err);
+		}
+
+		// animations follow the frame time rather than the ticks
+		beer_animation_update(frame_dt);
+		beer_stats_mark(BEER_STATS_PHASE_UPDATE);
+
+		ok = ok && (err = beer_renderer_clear()) == BEER_OK;
+		beer_stats_mark(BEER_STATS_PHASE_CLEAR);
+
+		// draw submission is marked by the renderer, before presenting
+		ok = ok && (err = beer_renderer_present()) == BEER_OK;
+		beer_stats_mark(BEER_STATS_PHASE_PRESENT);
+
+		run &= ok;
+
+		limit_frame_rate(frame_start, freq);
+		beer_stats_mark(BEER_STATS_PHASE_WAIT);
+		beer_stats_end_frame(ticks);
+
+		// frame arena memory is released along with the frame
+		beer_memory_end_frame();
+
+		frames++;
+
+#ifdef DEBUG
+		if (frames == 1)
+		{
+			Uint64 startup = SDL_GetPerformanceCounter() - init_time;
+			printf("First frame after %.1f ms\n", (double)startup * 1000 / freq);
+		}
+#endif
+
+		if (config.max_frames && frames == config.max_frames)
+		{
+			run = false;
+		}
 	}
 
 	return err;
@@ -119,7 +487,22 @@ beer_fini(void)
 		return;
 	}
 
+	if (config.trace_filename && beer_stats_write_trace(config.trace_filename) != BEER_OK)
+	{
+		printf("failed to write trace to %s\n", config.trace_filename);
+	}
+
+	if (config.record_filename && beer_replay_write(config.record_filename) != BEER_OK)
+	{
+		printf("failed to write input record to %s\n", config.record_filename);
+	}
+	beer_replay_fini();
+
 	beer_py_fini();
+	beer_animation_fini();
+	beer_renderer_fini();
+	beer_pipeline_fini();
+	beer_fs_fini();
 
 	if (SDL_WasInit(SDL_INIT_VIDEO))
 	{
@@ -138,6 +521,8 @@ beer_fini(void)
 		SDL_Quit();
 	}
 
+	beer_memory_fini();
+
 	initialized = false;
 
 #ifdef DEBUG
@@ -4,8 +4,78 @@
 #include "error.h"
 #include <stdbool.h>
 
+enum BeerPresentMode
+{
+	// frames are presented in sync with the display refresh
+	BEER_PRESENT_VSYNC,
+
+	// frames are presented right away, at most `max_fps` per second
+	BEER_PRESENT_NO_VSYNC,
+
+	// frames are presented right away, as fast as possible
+	BEER_PRESENT_UNCAPPED,
+};
+
+struct BeerConfig
+{
+	// window size
+	unsigned width, height;
+
+	// whether to render offscreen, through SDL dummy video driver and a
+	// software renderer, with no window shown
+	bool headless;
+
+	enum BeerPresentMode present_mode;
+
+	// frame rate limit in BEER_PRESENT_NO_VSYNC mode, 0 for no limit
+	unsigned max_fps;
+
+	// simulation ticks per second, the update function is called with a fixed
+	// time step and positions drawn are interpolated between the last two
+	// ticks; 0 to call it once per frame with the frame time instead
+	unsigned tick_rate;
+
+	// maximum number of ticks run per frame, when the simulation falls
+	// further behind the exceeding time is dropped
+	unsigned max_ticks;
+
+	// number of frames after which beer_run() returns, 0 to run until quit
+	unsigned max_frames;
+
+	// whether the update function runs on a simulation thread, at the fixed
+	// tick rate, while the main thread draws the state committed after the
+	// last ticks; SDL calls made by the script are forwarded to the main
+	// thread, and textures and tile layers changes then wait for a frame
+	bool pipelined;
+
+	// file the key events and the timing of each frame are recorded to, and
+	// written on beer_fini(), NULL for none
+	const char *record_filename;
+
+	// file of recorded key events and timing to replay instead of the live
+	// input and clock, beer_run() returns at its end; NULL for none. Neither
+	// recording nor replaying works with a pipelined simulation
+	const char *replay_filename;
+
+	// file the recorded frame stats are written to on beer_fini(), as a
+	// Chrome trace, NULL for none
+	const char *trace_filename;
+
+	// whether to start Python with no `site` processing and ignoring its
+	// environment variables, modules are then only found in the standard
+	// library and core/beer/python directories
+	bool python_minimal;
+
+	// whether Python reports the time taken by each import, on stderr
+	bool python_import_time;
+};
+
+// fills a configuration with the defaults: vsync, fixed 60 ticks per second
+BEER_API void
+beer_config_default(unsigned win_w, unsigned win_h, struct BeerConfig *r_config);
+
 BEER_API beer_err
-beer_init(unsigned win_w, unsigned win_h);
+beer_init(const struct BeerConfig *config);
 
 BEER_API beer_err
 beer_run(bool (*update)(float));
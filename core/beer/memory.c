@@ -1,17 +1,92 @@
 #include "memory.h"
+#include <SDL.h>
 #include <assert.h>
 #include <stdlib.h>
 #include <string.h>
 
+// initial size of the frame arena, it grows to fit the largest frame
+#define ARENA_INITIAL_SIZE (64 * 1024)
+
+// strictest alignment of the fundamental types
+union MaxAlign
+{
+	long double ld;
+	long long ll;
+	void *ptr;
+	void (*func)(void);
+};
+
+#define ALIGNMENT sizeof(union MaxAlign)
+#define ALIGN(size) (((size) + ALIGNMENT - 1) / ALIGNMENT * ALIGNMENT)
+
+// prefix of each allocation, keeping its size for the live counters
+union Header
+{
+	size_t size;
+	union MaxAlign align_;
+};
+
+// arena block allocated when the arena was full, freed at the end of the frame
+union ArenaOverflow
+{
+	union ArenaOverflow *next;
+	union MaxAlign align_;
+};
+
+static struct BeerMemoryStats stats = {0};
+
+// guards the stats, allocations may be made from the simulation thread while
+// the main thread records them
+static SDL_SpinLock stats_lock = 0;
+
+// allocations made before the current frame
+static size_t frame_start_allocations = 0;
+
+static struct
+{
+	char *block;
+	size_t capacity;
+	size_t used;
+
+	// bytes taken in the current frame, overflow blocks included
+	size_t frame_bytes;
+
+	union ArenaOverflow *overflow;
+} arena = {NULL, 0, 0, 0, NULL};
+
+// pools which allocated pages, for their stats
+static struct BeerPool *pools = NULL;
+
+// called with the stats lock held
+static void
+count_alloc(size_t size)
+{
+	stats.allocations++;
+	stats.bytes += size;
+	stats.live_bytes += size;
+	if (stats.live_bytes > stats.peak_bytes)
+	{
+		stats.peak_bytes = stats.live_bytes;
+	}
+}
+
 beer_err
 beer_alloc(size_t size, void **r_ptr)
 {
 	assert(r_ptr);
-	*r_ptr = malloc(size);
-	if (!*r_ptr)
+	union Header *header = malloc(sizeof(union Header) + size);
+	if (!header)
 	{
+		*r_ptr = NULL;
 		return BEER_ERR_NO_MEM;
 	}
+	header->size = size;
+	*r_ptr = header + 1;
+
+	SDL_AtomicLock(&stats_lock);
+	stats.live_allocations++;
+	count_alloc(size);
+	SDL_AtomicUnlock(&stats_lock);
 	return BEER_OK;
 }
 
@@ -27,8 +102,276 @@ beer_alloc0(size_t size, void **r_ptr)
 	return err;
 }
 
+beer_err
+beer_realloc(size_t size, void **r_ptr)
+{
+	assert(r_ptr);
+	if (!*r_ptr)
+	{
+		return beer_alloc(size, r_ptr);
+	}
+
+	union Header *header = (union Header*)*r_ptr - 1;
+	size_t old_size = header->size;
+	header = realloc(header, sizeof(union Header) + size);
+	if (!header)
+	{
+		return BEER_ERR_NO_MEM;
+	}
+	header->size = size;
+	*r_ptr = header + 1;
+
+	SDL_AtomicLock(&stats_lock);
+	stats.live_bytes -= old_size;
+	count_alloc(size);
+	SDL_AtomicUnlock(&stats_lock);
+	return BEER_OK;
+}
+
 void
 beer_free(void *ptr)
 {
-	free(ptr);
+	if (ptr)
+	{
+		union Header *header = (union Header*)ptr - 1;
+		SDL_AtomicLock(&stats_lock);
+		stats.live_allocations--;
+		stats.live_bytes -= header->size;
+		SDL_AtomicUnlock(&stats_lock);
+		free(header);
+	}
+}
+
+beer_err
+beer_frame_alloc(size_t size, void **r_ptr)
+{
+	assert(r_ptr);
+
+	size = ALIGN(size);
+	if (!arena.block)
+	{
+		beer_err err = beer_alloc(ARENA_INITIAL_SIZE, (void**)&arena.block);
+		if (err)
+		{
+			return err;
+		}
+		arena.capacity = ARENA_INITIAL_SIZE;
+	}
+
+	if (arena.used + size <= arena.capacity)
+	{
+		*r_ptr = arena.block + arena.used;
+		arena.used += size;
+	}
+	else
+	{
+		// the arena is grown at the end of the frame, blocks until then are
+		// allocated on their own
+		union ArenaOverflow *overflow = NULL;
+		beer_err err = beer_alloc(sizeof(union ArenaOverflow) + size, (void**)&overflow);
+		if (err)
+		{
+			return err;
+		}
+		overflow->next = arena.overflow;
+		arena.overflow = overflow;
+		*r_ptr = overflow + 1;
+	}
+
+	arena.frame_bytes += size;
+	return BEER_OK;
+}
+
+void
+beer_memory_end_frame(void)
+{
+	while (arena.overflow)
+	{
+		union ArenaOverflow *next = arena.overflow->next;
+		beer_free(arena.overflow);
+		arena.overflow = next;
+	}
+
+	if (arena.frame_bytes > arena.capacity)
+	{
+		size_t capacity = arena.capacity;
+		while (capacity < arena.frame_bytes)
+		{
+			capacity *= 2;
+		}
+
+		// the previous contents are dropped anyway
+		void *block = NULL;
+		if (beer_alloc(capacity, &block) == BEER_OK)
+		{
+			beer_free(arena.block);
+			arena.block = block;
+			arena.capacity = capacity;
+		}
+	}
+
+	SDL_AtomicLock(&stats_lock);
+	stats.arena_bytes = arena.frame_bytes;
+	if (arena.frame_bytes > stats.arena_peak)
+	{
+		stats.arena_peak = arena.frame_bytes;
+	}
+	stats.arena_capacity = arena.capacity;
+
+	stats.frame_allocations = stats.allocations - frame_start_allocations;
+	frame_start_allocations = stats.allocations;
+	SDL_AtomicUnlock(&stats_lock);
+
+	arena.used = arena.frame_bytes = 0;
+}
+
+void
+beer_memory_fini(void)
+{
+	beer_memory_end_frame();
+	beer_free(arena.block);
+	arena.block = NULL;
+	arena.capacity = 0;
+}
+
+static beer_err
+grow_pool(struct BeerPool *pool)
+{
+	if (!pool->stride_)
+	{
+		// free items are chained through a link past their data, so that
+		// they read zeroes
+		pool->stride_ = ALIGN(pool->item_size + sizeof(void*));
+		pool->next_ = pools;
+		pools = pool;
+	}
+
+	char *page = NULL;
+	beer_err err = beer_alloc0(pool->stride_ * pool->page_len, (void**)&page);
+	if (err)
+	{
+		return err;
+	}
+
+	void *new_pages = pool->pages_;
+	err = beer_realloc(sizeof(void*) * (pool->pages_len_ + 1), &new_pages);
+	if (err)
+	{
+		beer_free(page);
+		return err;
+	}
+	pool->pages_ = new_pages;
+	pool->pages_[pool->pages_len_++] = page;
+
+	// chain the new items in the free list, lowest address first
+	for (unsigned i = pool->page_len; i > 0; i--)
+	{
+		char *item = page + (i - 1) * pool->stride_;
+		*(void**)(item + pool->stride_ - sizeof(void*)) = pool->free_list_;
+		pool->free_list_ = item;
+	}
+
+	return BEER_OK;
+}
+
+beer_err
+beer_pool_alloc(struct BeerPool *pool, void **r_ptr)
+{
+	assert(pool && pool->item_size > 0 && pool->page_len > 0);
+	assert(r_ptr);
+
+	if (!pool->free_list_)
+	{
+		beer_err err = grow_pool(pool);
+		if (err)
+		{
+			return err;
+		}
+	}
+
+	char *item = pool->free_list_;
+	void **link = (void**)(item + pool->stride_ - sizeof(void*));
+	pool->free_list_ = *link;
+	*link = NULL;
+
+	pool->used_++;
+	if (pool->used_ > pool->peak_)
+	{
+		pool->peak_ = pool->used_;
+	}
+
+	*r_ptr = item;
+	return BEER_OK;
+}
+
+void
+beer_pool_free(struct BeerPool *pool, void *ptr)
+{
+	assert(pool);
+	if (ptr)
+	{
+		char *item = ptr;
+		memset(item, 0, pool->item_size);
+		*(void**)(item + pool->stride_ - sizeof(void*)) = pool->free_list_;
+		pool->free_list_ = item;
+		pool->used_--;
+	}
+}
+
+void
+beer_pool_fini(struct BeerPool *pool)
+{
+	assert(pool);
+	for (unsigned i = 0; i < pool->pages_len_; i++)
+	{
+		beer_free(pool->pages_[i]);
+	}
+	beer_free(pool->pages_);
+
+	// the pool stays registered, and can be used again
+	pool->pages_ = NULL;
+	pool->pages_len_ = 0;
+	pool->free_list_ = NULL;
+	pool->used_ = 0;
+}
+
+void
+beer_pool_get_stats(const struct BeerPool *pool, struct BeerPoolStats *r_stats)
+{
+	assert(pool);
+	assert(r_stats);
+
+	*r_stats = (struct BeerPoolStats){
+		.name = pool->name,
+		.item_size = pool->item_size,
+		.capacity = pool->pages_len_ * pool->page_len,
+		.used = pool->used_,
+		.peak = pool->peak_,
+	};
+}
+
+beer_err
+beer_memory_get_stats(struct BeerMemoryStats *r_stats)
+{
+	assert(r_stats);
+	SDL_AtomicLock(&stats_lock);
+	*r_stats = stats;
+	SDL_AtomicUnlock(&stats_lock);
+	return BEER_OK;
+}
+
+beer_err
+beer_memory_get_pool_stats(struct BeerPoolStats *r_stats, unsigned len, unsigned *r_count)
+{
+	assert(r_stats || len == 0);
+	assert(r_count);
+
+	unsigned count = 0;
+	for (struct BeerPool *pool = pools; pool && count < len; pool = pool->next_)
+	{
+		beer_pool_get_stats(pool, r_stats + count++);
+	}
+	*r_count = count;
+
+	return BEER_OK;
 }
@@ -4,13 +4,102 @@
 #include "error.h"
 #include <stddef.h>
 
+struct BeerMemoryStats
+{
+	// number of allocations and reallocations made since startup
+	size_t allocations;
+
+	// total amount of bytes requested by them
+	size_t bytes;
+
+	// number of allocations not freed yet, and amount of bytes they hold
+	size_t live_allocations;
+	size_t live_bytes;
+
+	// highest amount of live bytes since startup
+	size_t peak_bytes;
+
+	// number of allocations made during the last frame
+	size_t frame_allocations;
+
+	// amount of bytes taken from the frame arena during the last frame, the
+	// highest such amount since startup, and the arena size
+	size_t arena_bytes;
+	size_t arena_peak;
+	size_t arena_capacity;
+};
+
+// Pool of fixed-size items, allocated by pages of `page_len` items whose
+// addresses never change. Items are zeroed when allocated and when freed, so
+// that stale pointers to freed items read zeroes.
+struct BeerPool
+{
+	// name reported in the pool stats
+	const char *name;
+
+	size_t item_size;
+	unsigned page_len;
+
+	// private
+	size_t stride_;
+	void **pages_;
+	unsigned pages_len_;
+	void *free_list_;
+	unsigned used_, peak_;
+	struct BeerPool *next_;
+};
+
+struct BeerPoolStats
+{
+	const char *name;
+	size_t item_size;
+
+	// number of items allocated, in use, and highest number in use since
+	// startup
+	unsigned capacity;
+	unsigned used;
+	unsigned peak;
+};
+
+#define BEER_POOL(name, type, page_len) {(name), sizeof(type), (page_len), 0, NULL, 0, NULL, 0, 0, NULL}
+
 BEER_API beer_err
 beer_alloc(size_t size, void **r_ptr);
 
 BEER_API beer_err
 beer_alloc0(size_t size, void **r_ptr);
 
+BEER_API beer_err
+beer_realloc(size_t size, void **r_ptr);
+
 #define beer_new(type, r_ptrptr) (beer_alloc0(sizeof(type), (void**)r_ptrptr))
 
 void
 beer_free(void *ptr);
+
+// Allocates transient memory from the frame arena, which is released all at
+// once at the end of each beer_run() frame; it must not be freed.
+BEER_API beer_err
+beer_frame_alloc(size_t size, void **r_ptr);
+
+BEER_API beer_err
+beer_pool_alloc(struct BeerPool *pool, void **r_ptr);
+
+#define beer_pool_new(pool, r_ptrptr) (beer_pool_alloc((pool), (void**)r_ptrptr))
+
+void
+beer_pool_free(struct BeerPool *pool, void *ptr);
+
+// frees all the pool pages, along with the items still in use
+void
+beer_pool_fini(struct BeerPool *pool);
+
+void
+beer_pool_get_stats(const struct BeerPool *pool, struct BeerPoolStats *r_stats);
+
+BEER_API beer_err
+beer_memory_get_stats(struct BeerMemoryStats *r_stats);
+
+// copies the stats of up to `len` of the pools used since startup
+BEER_API beer_err
+beer_memory_get_pool_stats(struct BeerPoolStats *r_stats, unsigned len, unsigned *r_count);
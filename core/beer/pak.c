@@ -0,0 +1,440 @@
+#define _DEFAULT_SOURCE
+
+#include "fs.h"
+#include "memory.h"
+#include "pak.h"
+#include <SDL.h>
+#include <assert.h>
+#include <stdint.h>
+#include <string.h>
+
+#ifdef BEER_ON_UNIX
+# include <fcntl.h>
+# include <sys/mman.h>
+# include <sys/stat.h>
+# include <unistd.h>
+#endif
+
+#define PAK_MAGIC "BEERPAK"
+#define PAK_VERSION 1
+#define HEADER_SIZE 32
+#define ENTRY_SIZE 32
+
+struct BeerPak
+{
+	// archive contents, mapped or read in memory
+	const char *data;
+	size_t size;
+	bool mapped;
+
+	unsigned len;
+	const char *index;
+	const char *names;
+
+	// decompressed contents of the compressed entries, set on their first
+	// read
+	void **buffers;
+};
+
+static Uint64
+read_u64(const char *p)
+{
+	Uint64 v;
+	memcpy(&v, p, sizeof(v));
+	return SDL_SwapLE64(v);
+}
+
+static Uint32
+read_u32(const char *p)
+{
+	Uint32 v;
+	memcpy(&v, p, sizeof(v));
+	return SDL_SwapLE32(v);
+}
+
+static Uint16
+read_u16(const char *p)
+{
+	Uint16 v;
+	memcpy(&v, p, sizeof(v));
+	return SDL_SwapLE16(v);
+}
+
+static void
+read_entry(const struct BeerPak *pak, unsigned index, struct BeerPakEntry *r_entry, Uint64 *r_offset)
+{
+	const char *p = pak->index + (size_t)index * ENTRY_SIZE;
+	*r_offset = read_u64(p);
+	r_entry->stored_size = read_u64(p + 8);
+	r_entry->size = read_u64(p + 16);
+	r_entry->name = pak->names + read_u32(p + 24);
+	r_entry->compression = (unsigned char)p[30];
+}
+
+// checks the whole index once, so that reads can trust it
+static bool
+validate(const struct BeerPak *pak)
+{
+	if (pak->size < HEADER_SIZE || memcmp(pak->data, PAK_MAGIC, sizeof(PAK_MAGIC)) != 0 ||
+	    read_u32(pak->data + 8) != PAK_VERSION)
+	{
+		return false;
+	}
+
+	Uint64 len = read_u32(pak->data + 12);
+	Uint64 index_offset = read_u64(pak->data + 16);
+	Uint64 names_offset = read_u64(pak->data + 24);
+	if (index_offset > pak->size || len > (pak->size - index_offset) / ENTRY_SIZE ||
+	    names_offset < index_offset + len * ENTRY_SIZE || names_offset > pak->size)
+	{
+		return false;
+	}
+
+	Uint64 names_size = pak->size - names_offset;
+	const char *names = pak->data + names_offset;
+	const char *prev = NULL;
+	for (Uint64 i = 0; i < len; i++)
+	{
+		const char *p = pak->data + index_offset + i * ENTRY_SIZE;
+		Uint64 offset = read_u64(p);
+		Uint64 stored_size = read_u64(p + 8);
+		Uint64 size = read_u64(p + 16);
+		Uint64 name_offset = read_u32(p + 24);
+		Uint64 name_len = read_u16(p + 28);
+		unsigned compression = (unsigned char)p[30];
+
+		// entries lie before the index, with a zero byte after them
+		if (offset > index_offset || stored_size >= index_offset - offset ||
+		    compression >= BEER_PAK_COMPRESSION_MAX ||
+		    (compression == BEER_PAK_COMPRESSION_NONE && size != stored_size) ||
+		    size > SIZE_MAX - 1)
+		{
+			return false;
+		}
+
+		if (name_offset + name_len >= names_size || names[name_offset + name_len] != 0 ||
+		    strlen(names + name_offset) != name_len)
+		{
+			return false;
+		}
+
+		// the binary search relies on the order
+		const char *name = names + name_offset;
+		if (prev && strcmp(prev, name) >= 0)
+		{
+			return false;
+		}
+		prev = name;
+	}
+
+	return true;
+}
+
+#ifdef BEER_ON_UNIX
+static beer_err
+map_file(const char *path, struct BeerPak *pak)
+{
+	int fd = open(path, O_RDONLY);
+	if (fd < 0)
+	{
+		return BEER_ERR_FS_NO_ENTRY;
+	}
+
+	struct stat st;
+	beer_err err = BEER_OK;
+	if (fstat(fd, &st) != 0 || !S_ISREG(st.st_mode))
+	{
+		err = BEER_ERR_FS_NOT_A_FILE;
+	}
+	else if (st.st_size < HEADER_SIZE)
+	{
+		err = BEER_ERR_FS_BAD_ARCHIVE;
+	}
+	else
+	{
+		void *data = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+		if (data == MAP_FAILED)
+		{
+			err = BEER_ERR_IO;
+		}
+		else
+		{
+			pak->data = data;
+			pak->size = st.st_size;
+			pak->mapped = true;
+		}
+	}
+
+	// the mapping holds its own reference to the file
+	close(fd);
+	return err;
+}
+#endif
+
+static void
+release(struct BeerPak *pak)
+{
+#ifdef BEER_ON_UNIX
+	if (pak->mapped)
+	{
+		munmap((void*)pak->data, pak->size);
+		return;
+	}
+#endif
+	beer_free((void*)pak->data);
+}
+
+beer_err
+beer_pak_open(const char *path, struct BeerPak **r_pak)
+{
+	assert(path);
+	assert(r_pak);
+
+	struct BeerPak *pak = NULL;
+	beer_err err = beer_alloc0(sizeof(struct BeerPak), (void**)&pak);
+	if (err)
+	{
+		return err;
+	}
+
+#ifdef BEER_ON_UNIX
+	err = map_file(path, pak);
+#else
+	char *data = NULL;
+	err = beer_file_read(path, &data, &pak->size);
+	pak->data = data;
+	if (pak->size > 0)
+	{
+		// not counting the NUL-terminator
+		pak->size--;
+	}
+#endif
+	if (err)
+	{
+		beer_free(pak);
+		return err;
+	}
+
+	if (!validate(pak))
+	{
+		err = BEER_ERR_FS_BAD_ARCHIVE;
+		goto error;
+	}
+
+	pak->len = read_u32(pak->data + 12);
+	pak->index = pak->data + read_u64(pak->data + 16);
+	pak->names = pak->data + read_u64(pak->data + 24);
+	if (pak->len > 0)
+	{
+		err = beer_alloc0(pak->len * sizeof(void*), (void**)&pak->buffers);
+		if (err)
+		{
+			goto error;
+		}
+	}
+
+	*r_pak = pak;
+	return BEER_OK;
+
+error:
+	release(pak);
+	beer_free(pak);
+	return err;
+}
+
+void
+beer_pak_close(struct BeerPak *pak)
+{
+	if (pak)
+	{
+		for (unsigned i = 0; i < pak->len; i++)
+		{
+			beer_free(pak->buffers[i]);
+		}
+		beer_free(pak->buffers);
+		release(pak);
+		beer_free(pak);
+	}
+}
+
+unsigned
+beer_pak_len(const struct BeerPak *pak)
+{
+	assert(pak);
+	return pak->len;
+}
+
+beer_err
+beer_pak_get_entry(const struct BeerPak *pak, unsigned index, struct BeerPakEntry *r_entry)
+{
+	assert(pak);
+	assert(r_entry);
+	assert(index < pak->len);
+
+	Uint64 offset;
+	read_entry(pak, index, r_entry, &offset);
+	return BEER_OK;
+}
+
+beer_err
+beer_pak_find(const struct BeerPak *pak, const char *name, unsigned *r_index)
+{
+	assert(pak);
+	assert(name);
+	assert(r_index);
+
+	unsigned lo = 0, hi = pak->len;
+	while (lo < hi)
+	{
+		unsigned mid = lo + (hi - lo) / 2;
+		const char *entry_name = pak->names + read_u32(pak->index + (size_t)mid * ENTRY_SIZE + 24);
+		int cmp = strcmp(name, entry_name);
+		if (cmp == 0)
+		{
+			*r_index = mid;
+			return BEER_OK;
+		}
+		if (cmp < 0)
+		{
+			hi = mid;
+		}
+		else
+		{
+			lo = mid + 1;
+		}
+	}
+
+	return BEER_ERR_FS_NO_ENTRY;
+}
+
+// decodes an LZ4 block, which must fill the destination exactly
+static bool
+lz4_decompress(const unsigned char *src, size_t src_size, unsigned char *dst, size_t dst_size)
+{
+	size_t s = 0, d = 0;
+	while (s < src_size)
+	{
+		unsigned token = src[s++];
+		unsigned char b;
+
+		size_t literals = token >> 4;
+		if (literals == 15)
+		{
+			do
+			{
+				if (s == src_size)
+				{
+					return false;
+				}
+				b = src[s++];
+				literals += b;
+			}
+			while (b == 255);
+		}
+		if (literals > src_size - s || literals > dst_size - d)
+		{
+			return false;
+		}
+		memcpy(dst + d, src + s, literals);
+		s += literals;
+		d += literals;
+
+		// the last sequence has no match
+		if (s == src_size)
+		{
+			break;
+		}
+
+		if (src_size - s < 2)
+		{
+			return false;
+		}
+		size_t offset = src[s] | (size_t)src[s + 1] << 8;
+		s += 2;
+		if (offset == 0 || offset > d)
+		{
+			return false;
+		}
+
+		size_t match = (token & 15) + 4;
+		if ((token & 15) == 15)
+		{
+			do
+			{
+				if (s == src_size)
+				{
+					return false;
+				}
+				b = src[s++];
+				match += b;
+			}
+			while (b == 255);
+		}
+		if (match > dst_size - d)
+		{
+			return false;
+		}
+
+		// the match may overlap the bytes it produces
+		for (size_t i = 0; i < match; i++, d++)
+		{
+			dst[d] = dst[d - offset];
+		}
+	}
+
+	return d == dst_size;
+}
+
+beer_err
+beer_pak_read(struct BeerPak *pak, unsigned index, const char **r_data, size_t *r_size)
+{
+	assert(pak);
+	assert(r_data);
+	assert(r_size);
+	assert(index < pak->len);
+
+	struct BeerPakEntry entry;
+	Uint64 offset;
+	read_entry(pak, index, &entry, &offset);
+
+	if (entry.compression == BEER_PAK_COMPRESSION_NONE)
+	{
+		*r_data = pak->data + offset;
+		*r_size = entry.size;
+		return BEER_OK;
+	}
+
+	char *buffer = SDL_AtomicGetPtr(&pak->buffers[index]);
+	if (!buffer)
+	{
+		// NUL-terminated like the stored entries
+		beer_err err = beer_alloc(entry.size + 1, (void**)&buffer);
+		if (err)
+		{
+			return err;
+		}
+		buffer[entry.size] = 0;
+
+		if (!lz4_decompress(
+			(const unsigned char*)pak->data + offset,
+			entry.stored_size,
+			(unsigned char*)buffer,
+			entry.size
+		))
+		{
+			beer_free(buffer);
+			return BEER_ERR_FS_BAD_ARCHIVE;
+		}
+
+		// another thread may have decompressed it meanwhile
+		if (!SDL_AtomicCASPtr(&pak->buffers[index], NULL, buffer))
+		{
+			beer_free(buffer);
+			buffer = SDL_AtomicGetPtr(&pak->buffers[index]);
+		}
+	}
+
+	*r_data = buffer;
+	*r_size = entry.size;
+	return BEER_OK;
+}
@@ -0,0 +1,66 @@
+#pragma once
+
+#include "defs.h"
+#include "error.h"
+#include <stdbool.h>
+#include <stddef.h>
+
+// Asset archive, memory mapped, built by `python -m beer.packer`.
+//
+// File layout, little endian:
+//
+//     magic, version, entries count    8s I I
+//     index offset, names offset       Q Q
+//     entries data                     each at a multiple of BEER_PAK_ALIGNMENT,
+//                                      followed by at least one zero byte
+//     index                            entries sorted by name, 32 bytes each
+//     names                            NUL-terminated UTF-8 paths
+//
+// Each index entry holds the data offset, stored size, original size, name
+// offset and length, and compression of its file. Compressed entries are LZ4
+// blocks, decompressed on their first read; stored entries are read in place.
+struct BeerPak;
+
+#define BEER_PAK_ALIGNMENT 64
+
+enum BeerPakCompression
+{
+	BEER_PAK_COMPRESSION_NONE,
+	BEER_PAK_COMPRESSION_LZ4,
+	BEER_PAK_COMPRESSION_MAX,
+};
+
+struct BeerPakEntry
+{
+	// path within the archive, with forward slashes
+	const char *name;
+
+	// size of the file, and size of its data in the archive
+	size_t size;
+	size_t stored_size;
+
+	enum BeerPakCompression compression;
+};
+
+BEER_API beer_err
+beer_pak_open(const char *path, struct BeerPak **r_pak);
+
+// closes an archive, the data read from it is no longer valid
+BEER_API void
+beer_pak_close(struct BeerPak *pak);
+
+BEER_API unsigned
+beer_pak_len(const struct BeerPak *pak);
+
+BEER_API beer_err
+beer_pak_get_entry(const struct BeerPak *pak, unsigned index, struct BeerPakEntry *r_entry);
+
+// finds an entry by name, with a binary search of the index
+BEER_API beer_err
+beer_pak_find(const struct BeerPak *pak, const char *name, unsigned *r_index);
+
+// Gives the contents of an entry, pointing in the archive mapping, or in a
+// buffer owned by the archive for compressed entries. May be called from any
+// thread.
+BEER_API beer_err
+beer_pak_read(struct BeerPak *pak, unsigned index, const char **r_data, size_t *r_size);
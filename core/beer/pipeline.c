@@ -0,0 +1,287 @@
+#include "error.h"
+#include <SDL.h>
+#include <assert.h>
+#include <stdbool.h>
+
+// SDL events queue length, from the main thread to the simulation thread, must
+// be a power of two
+#define EVENTS_LEN 256
+
+extern void
+handle_sdl_event(const SDL_Event *evt);
+
+extern beer_err
+beer_renderer_snapshot(void);
+
+extern beer_err
+beer_renderer_commit(unsigned ticks);
+
+extern void
+beer_animation_update(float dt);
+
+extern void
+beer_memory_end_frame(void);
+
+extern void
+beer_py_thread_begin(void);
+
+extern void
+beer_py_thread_end(void);
+
+static SDL_Thread *thread = NULL;
+static SDL_threadID main_thread;
+
+// guards everything below, and signals both threads of its changes
+static SDL_mutex *lock = NULL;
+static SDL_cond *cond = NULL;
+
+static bool (*update)(float) = NULL;
+static unsigned tick_rate = 0;
+static unsigned max_ticks = 0;
+
+// set by the main thread to stop the simulation, and by the simulation thread
+// once it has stopped
+static bool quit = false;
+static bool done = false;
+static beer_err result = BEER_OK;
+
+// events received by the main thread, not yet handled by the simulation thread
+static SDL_Event events[EVENTS_LEN];
+static unsigned events_head = 0;
+static unsigned events_tail = 0;
+
+// function a thread waits for the main thread to run, and number of calls
+// posted and run so far
+static void (*call_func)(void*) = NULL;
+static void *call_arg = NULL;
+static unsigned calls_posted = 0;
+static unsigned calls_served = 0;
+
+static bool
+receive_events(void)
+{
+	SDL_LockMutex(lock);
+	while (events_head != events_tail)
+	{
+		handle_sdl_event(&events[events_head++ % EVENTS_LEN]);
+	}
+	bool run = !quit;
+	SDL_UnlockMutex(lock);
+
+	return run;
+}
+
+static int
+simulate(void *arg)
+{
+	(void)arg;
+
+	Uint64 freq = SDL_GetPerformanceFrequency();
+	Uint64 tick = freq / tick_rate;
+	float dt = 1.0f / tick_rate;
+	Uint64 acc = 0, last = SDL_GetPerformanceCounter();
+	beer_err err = BEER_OK;
+	bool run = true;
+
+	beer_py_thread_begin();
+
+	while (run)
+	{
+		Uint64 now = SDL_GetPerformanceCounter();
+		acc += now - last;
+		last = now;
+
+		unsigned ticks = 0;
+		while (acc >= tick && ticks < max_ticks)
+		{
+			if (!receive_events() || (err = beer_renderer_snapshot()) != BEER_OK ||
+			    (update && !update(dt)))
+			{
+				run = false;
+				break;
+			}
+			beer_animation_update(dt);
+			acc -= tick;
+			ticks++;
+		}
+
+		// too far behind, drop whole ticks
+		if (acc >= tick)
+		{
+			acc %= tick;
+		}
+
+		// the ticks run are made visible at once, on their last boundary
+		if (ticks > 0)
+		{
+			run = run && (err = beer_renderer_commit(ticks)) == BEER_OK;
+			beer_memory_end_frame();
+		}
+
+		// sleep until the next tick is due, the scheduler granularity makes
+		// the last millisecond unreliable
+		if (run && acc < tick)
+		{
+			Uint32 ms = (Uint32)((tick - acc) * 1000 / freq);
+			if (ms > 1)
+			{
+				SDL_Delay(ms - 1);
+			}
+		}
+	}
+
+	beer_py_thread_end();
+
+	SDL_LockMutex(lock);
+	done = true;
+	result = err;
+	SDL_CondBroadcast(cond);
+	SDL_UnlockMutex(lock);
+
+	return 0;
+}
+
+// runs the call a thread waits for, if any, with the lock held
+static void
+serve_call(void)
+{
+	if (call_func)
+	{
+		call_func(call_arg);
+		call_func = NULL;
+		calls_served++;
+		SDL_CondBroadcast(cond);
+	}
+}
+
+beer_err
+beer_pipeline_start(bool (*update_func)(float), unsigned rate, unsigned max)
+{
+	assert(!thread);
+	assert(rate > 0 && max > 0);
+
+	update = update_func;
+	tick_rate = rate;
+	max_ticks = max;
+	quit = done = false;
+	result = BEER_OK;
+	events_head = events_tail = 0;
+	main_thread = SDL_ThreadID();
+
+	if (!lock && !(lock = SDL_CreateMutex()))
+	{
+		return BEER_ERR_SDL;
+	}
+	if (!cond && !(cond = SDL_CreateCond()))
+	{
+		return BEER_ERR_SDL;
+	}
+
+	thread = SDL_CreateThread(simulate, "simulation", NULL);
+	if (!thread)
+	{
+		return BEER_ERR_SDL;
+	}
+
+	return BEER_OK;
+}
+
+// Hands the events polled by the main thread over to the simulation thread,
+// runs the call it waits for, and returns whether it still runs.
+bool
+beer_pipeline_sync(const SDL_Event *evts, unsigned len)
+{
+	assert(thread);
+	assert(evts || len == 0);
+
+	SDL_LockMutex(lock);
+	for (unsigned i = 0; i < len; i++)
+	{
+		// drop the oldest event when the queue is full
+		if (events_tail - events_head == EVENTS_LEN)
+		{
+			events_head++;
+		}
+		events[events_tail++ % EVENTS_LEN] = evts[i];
+	}
+	serve_call();
+	bool running = !done;
+	SDL_UnlockMutex(lock);
+
+	return running;
+}
+
+beer_err
+beer_pipeline_stop(void)
+{
+	assert(thread);
+
+	// the simulation thread may be waiting on a call before it notices
+	SDL_LockMutex(lock);
+	quit = true;
+	while (!done)
+	{
+		serve_call();
+		SDL_CondWait(cond, lock);
+	}
+	beer_err err = result;
+	SDL_UnlockMutex(lock);
+
+	SDL_WaitThread(thread, NULL);
+	thread = NULL;
+
+	return err;
+}
+
+bool
+beer_pipeline_is_running(void)
+{
+	return thread != NULL;
+}
+
+// Runs a function on the main thread, which owns the SDL renderer, blocking
+// until it returns; it is called right away when not pipelined.
+void
+beer_pipeline_call(void (*func)(void*), void *arg)
+{
+	assert(func);
+
+	if (!thread || SDL_ThreadID() == main_thread)
+	{
+		func(arg);
+		return;
+	}
+
+	// Python threads other than the simulation one may call too
+	SDL_LockMutex(lock);
+	while (call_func)
+	{
+		SDL_CondWait(cond, lock);
+	}
+	call_func = func;
+	call_arg = arg;
+	unsigned call = ++calls_posted;
+	SDL_CondBroadcast(cond);
+
+	while (calls_served < call)
+	{
+		SDL_CondWait(cond, lock);
+	}
+	SDL_UnlockMutex(lock);
+}
+
+void
+beer_pipeline_fini(void)
+{
+	if (cond)
+	{
+		SDL_DestroyCond(cond);
+		cond = NULL;
+	}
+
+	if (lock)
+	{
+		SDL_DestroyMutex(lock);
+		lock = NULL;
+	}
+}
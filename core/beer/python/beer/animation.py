@@ -0,0 +1,142 @@
+"""
+Sprite animation clips, played by the core.
+
+Clips are started on sprites, or on many sprites of a batch at once, and the
+core advances them every frame before drawing, so that playing animations costs
+nothing on the script side. Clips which do not loop stop on their last frame,
+and `dispatch` then calls their completion callback, once per clip with all its
+animations which finished.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from _beer import ffi, lib
+from beer.sprite import Sprite, SpriteBatch
+
+# animations are identified by the address of their core handle
+Animation = int
+
+FinishCallback = Callable[[List[Animation]], None]
+
+# number of finished animations polled from the core at once
+FINISHED_BATCH_LEN = 256
+
+
+class Clip:
+    """
+    Sequence of sheet frames, each shown for a given time in seconds, or all of
+    them for the same time.
+    """
+
+    def __init__(
+            self,
+            frames: Sequence[int],
+            durations: Union[float, Sequence[float]],
+            loop: bool = True,
+            on_finish: Optional[FinishCallback] = None) -> None:
+        if isinstance(durations, (int, float)):
+            durations = [durations] * len(frames)
+        if not frames or len(durations) != len(frames):
+            raise ValueError('clip needs as many frame durations as frames, and at least one')
+        if any(duration <= 0 for duration in durations):
+            raise ValueError('clip frame durations must be positive')
+
+        self.__frames = ffi.new('int[]', list(frames))
+        self.__durations = ffi.new('float[]', list(durations))
+
+        self.__ptr = ffi.new('struct BeerAnimationClip*')
+        self.__ptr.frames = self.__frames
+        self.__ptr.durations = self.__durations
+        self.__ptr.len = len(frames)
+        self.__ptr.loop = loop
+
+        self.on_finish = on_finish
+
+    def __len__(self) -> int:
+        return len(self.__frames)
+
+    @property
+    def loop(self) -> bool:
+        return bool(self.__ptr.loop)
+
+    @property
+    def pointer(self) -> Any:
+        return self.__ptr
+
+
+# clip and sprite or batch of the playing animations, which are kept alive until
+# the animation is stopped or dispatched
+_PLAYING: Dict[Animation, Tuple[Clip, Union[Sprite, SpriteBatch]]] = {}
+
+_FINISHED = ffi.new('struct BeerAnimation*[]', FINISHED_BATCH_LEN)
+_COUNT = ffi.new('unsigned*')
+
+
+def play(sprite: Sprite, clip: Clip) -> Animation:
+    """
+    Starts playing a clip on a sprite, from its first frame.
+    """
+    handle = ffi.new('struct BeerAnimation*[1]')
+    if lib.beer_animation_play_sprite(sprite.pointer, clip.pointer, handle) != lib.BEER_OK:
+        raise RuntimeError('failed to play animation')
+    animation = _addresses(handle, 1)[0]
+    _PLAYING[animation] = (clip, sprite)
+    return animation
+
+
+def play_batch(batch: SpriteBatch, indices: Sequence[int], clip: Clip) -> List[Animation]:
+    """
+    Starts playing a clip on the sprites of a batch at the given indices.
+    """
+    indices = list(indices)
+    if any(not 0 <= index < len(batch) for index in indices):
+        raise IndexError('sprite index out of batch bounds')
+
+    handles = ffi.new('struct BeerAnimation*[]', len(indices))
+    err = lib.beer_animation_play_batch(batch.pointer, indices, len(indices), clip.pointer, handles)
+    if err != lib.BEER_OK:
+        raise RuntimeError('failed to play animations')
+
+    animations = _addresses(handles, len(indices))
+    _PLAYING.update(dict.fromkeys(animations, (clip, batch)))
+    return animations
+
+
+def stop(animations: Iterable[Animation]) -> None:
+    """
+    Stops animations, their sprites keep their current frame. Animations
+    already stopped or dispatched are ignored.
+    """
+    stopped = [animation for animation in set(animations) if _PLAYING.pop(animation, None) is not None]
+    handles = [ffi.cast('struct BeerAnimation*', animation) for animation in stopped]
+    lib.beer_animation_stop(handles, len(handles))
+
+
+def dispatch() -> None:
+    """
+    Calls the completion callbacks of the animations which finished since the
+    last call, meant to be called once per update.
+    """
+    finished: Dict[Clip, List[Animation]] = {}
+    while True:
+        lib.beer_animation_poll_finished(_FINISHED, FINISHED_BATCH_LEN, _COUNT)
+        count = _COUNT[0]
+        for animation in _addresses(_FINISHED, count):
+            clip, _ = _PLAYING.pop(animation)
+            if clip.on_finish is not None:
+                finished.setdefault(clip, []).append(animation)
+        if count < FINISHED_BATCH_LEN:
+            break
+
+    for clip, animations in finished.items():
+        assert clip.on_finish is not None
+        clip.on_finish(animations)
+
+
+def is_playing(animation: Animation) -> bool:
+    """
+    Returns whether an animation was neither stopped nor dispatched yet.
+    """
+    return animation in _PLAYING
+
+
+def _addresses(handles: Any, count: int) -> List[Animation]:
+    return memoryview(ffi.buffer(handles, count * ffi.sizeof('struct BeerAnimation*'))).cast('P').tolist()
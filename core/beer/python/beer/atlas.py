@@ -0,0 +1,282 @@
+"""
+Texture atlas packing module.
+
+Source images, or just the frames a sheet uses out of them, are packed into a
+few large page textures, and sheets are rebuilt on top of the pages with their
+frames remapped, keeping frame indices unchanged.
+"""
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple, cast
+from beer import pak
+from beer.pixelcache import DecodedImage
+from beer.sprite import Sheet
+from beer.texture import Texture, decode_image
+
+if TYPE_CHECKING:
+    from PIL import Image  # pylint: disable=unused-import
+
+Rect = Tuple[int, int, int, int]
+
+# frames of each source, as the index of their page and their rectangles
+Entries = Dict[str, Tuple[int, List[Rect]]]
+
+# version of the prebuilt atlas index format
+INDEX_VERSION = 2
+
+
+class _Page:
+    """
+    Atlas page filled with shelves, rows of rectangles stacked downwards.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.width = 0
+        self.height = 0
+        # shelves as [y, height, used width]
+        self.shelves: List[List[int]] = []
+
+    def place(self, width: int, height: int) -> Optional[Tuple[int, int]]:
+        if width > self.size or height > self.size:
+            return None
+
+        # shelf tall enough with room left, wasting the least height
+        shelves = [shelf for shelf in self.shelves if height <= shelf[1] and shelf[2] + width <= self.size]
+        best = min(shelves, key=lambda shelf: shelf[1]) if shelves else None
+
+        if best is None:
+            if self.height + height > self.size:
+                return None
+            best = [self.height, height, 0]
+            self.shelves.append(best)
+            self.height += height
+
+        pos = (best[2], best[0])
+        best[2] += width
+        self.width = max(self.width, best[2])
+        return pos
+
+    def place_all(self, rects: Sequence[Rect], padding: int) -> Optional[Dict[Rect, Tuple[int, int]]]:
+        """
+        Places all the rectangles or none of them.
+        """
+        state = self.width, self.height, [list(shelf) for shelf in self.shelves]
+        positions: Dict[Rect, Tuple[int, int]] = {}
+        for rect in rects:
+            pos = self.place(rect[2] + padding, rect[3] + padding)
+            if pos is None:
+                self.width, self.height, self.shelves = state
+                return None
+            positions[rect] = pos
+        return positions
+
+
+class _Source:
+
+    def __init__(self, name: str, filename: str, frames: Optional[Sequence[Rect]]) -> None:
+        self.name = name
+        self.filename = filename
+        self.frames = [_rect(frame) for frame in frames] if frames is not None else None
+
+
+class Atlas:
+    """
+    Packed page textures along with the remapped frames of each source.
+    """
+
+    def __init__(self, pages: Sequence[Texture], entries: Entries) -> None:
+        self.__pages = list(pages)
+        self.__entries = entries
+        self.__sheets: Dict[str, Sheet] = {}
+
+    @property
+    def pages(self) -> List[Texture]:
+        return list(self.__pages)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.__entries)
+
+    def frames(self, name: str) -> List[Rect]:
+        """
+        Returns the frames of a source, in page coordinates.
+        """
+        return list(self.__entries[name][1])
+
+    def sheet(self, name: str) -> Sheet:
+        """
+        Returns the sheet of a source, frames have the indices they were added
+        with.
+        """
+        sheet = self.__sheets.get(name)
+        if sheet is None:
+            page, frames = self.__entries[name]
+            sheet = Sheet(self.__pages[page], frames)
+            self.__sheets[name] = sheet
+        return sheet
+
+
+class AtlasBuilder:
+    """
+    Collects source images and packs them into atlas pages.
+
+    Frames of a source are always packed on the same page, since a sheet has
+    a single texture. Only the frames of a source end up in the atlas: when
+    none are given, the whole image is used as a single frame.
+    """
+
+    def __init__(self, page_size: int = 2048, padding: int = 1) -> None:
+        self.__page_size = page_size
+        self.__padding = padding
+        self.__sources: Dict[str, _Source] = {}
+
+    def add(self, name: str, filename: str, frames: Optional[Sequence[Rect]] = None) -> None:
+        """
+        Adds the frames of an image file under the given name.
+        """
+        if name in self.__sources:
+            raise RuntimeError('atlas source "{}" already added'.format(name))
+        self.__sources[name] = _Source(name, filename, frames)
+
+    def build(self, directory: Optional[str] = None) -> Atlas:
+        """
+        Packs the sources into a new atlas.
+
+        When a directory is given, the atlas is saved there and reused by
+        later builds, as long as the sources and their files did not change.
+        """
+        pages, entries = self.pack(directory)
+        return Atlas([Texture.from_pixels(*page, 'atlas page') for page in pages], entries)
+
+    def pack(self, directory: Optional[str] = None) -> Tuple[List[DecodedImage], Entries]:
+        """
+        Packs the sources into page images, without creating any texture, so
+        that it may be called from any thread.
+        """
+        manifest = self.__manifest()
+        if directory is not None:
+            packed = _load(directory, manifest)
+            if packed is not None:
+                return packed
+
+        images, entries = self.__pack()
+        if directory is not None:
+            _save(directory, manifest, images, entries)
+
+        return [(img.width, img.height, img.tobytes()) for img in images], entries
+
+    def __manifest(self) -> List[Any]:
+        manifest: List[Any] = [self.__page_size, self.__padding]
+        for source in self.__sources.values():
+            # files of the mounted archives have no modification time, they
+            # are known by their name and size
+            data = pak.map_mounted(source.filename)
+            if data is not None:
+                mtime, size = None, len(data)
+            else:
+                stat = os.stat(source.filename)
+                mtime, size = stat.st_mtime_ns, stat.st_size
+            manifest.append([source.name, pak.entry_name(source.filename), mtime, size, source.frames])
+        # round trip through JSON so that it compares with a loaded one
+        return cast(List[Any], json.loads(json.dumps(manifest)))
+
+    def __pack(self) -> Tuple[List['Image.Image'], Entries]:
+        from PIL import Image  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        pages: List[_Page] = []
+        placements: List[Tuple[_Source, 'Image.Image', int, Dict[Rect, Tuple[int, int]]]] = []
+
+        for source in self.__sources.values():
+            img = _open_image(source.filename)
+            frames = source.frames if source.frames is not None else [(0, 0, img.width, img.height)]
+
+            # tallest frames first, duplicates share their placement
+            unique = sorted(set(frames), key=lambda rect: (-rect[3], -rect[2]))
+
+            for index, page in enumerate(pages + [_Page(self.__page_size)]):
+                positions = page.place_all(unique, self.__padding)
+                if positions is not None:
+                    if index == len(pages):
+                        pages.append(page)
+                    placements.append((source, img, index, positions))
+                    break
+            else:
+                raise RuntimeError('"{}" frames do not fit in an atlas page'.format(source.name))
+
+        images = [Image.new('RGBA', (max(page.width, 1), max(page.height, 1))) for page in pages]
+        entries: Entries = {}
+        for source, img, index, positions in placements:
+            for (x, y, width, height), pos in positions.items():
+                images[index].paste(img.crop((x, y, x + width, y + height)), pos)
+            frames = source.frames if source.frames is not None else [(0, 0, img.width, img.height)]
+            entries[source.name] = (index, [positions[rect] + rect[2:] for rect in frames])
+
+        return images, entries
+
+
+def _open_image(filename: str) -> 'Image.Image':
+    # sources are read from the mounted archives when they have them
+    from PIL import Image  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+    with pak.open_file(filename) as file_handle:
+        return Image.open(file_handle).convert('RGBA')
+
+
+def _rect(values: Sequence[int]) -> Rect:
+    return values[0], values[1], values[2], values[3]
+
+
+def _save(
+        directory: str,
+        manifest: List[Any],
+        images: List['Image.Image'],
+        entries: Entries) -> None:
+    os.makedirs(directory, exist_ok=True)
+    for index, img in enumerate(images):
+        img.save(os.path.join(directory, 'page{}.png'.format(index)))
+
+    # the index is written last, an interrupted save is never picked up
+    with open(os.path.join(directory, 'atlas.json'), 'w') as file_handle:
+        json.dump({
+            'version': INDEX_VERSION,
+            'manifest': manifest,
+            'pages': len(images),
+            'entries': entries,
+        }, file_handle)
+
+
+def _load(directory: str, manifest: List[Any]) -> Optional[Tuple[List[DecodedImage], Entries]]:
+    try:
+        index = json.loads(bytes(pak.read(os.path.join(directory, 'atlas.json'))).decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+
+    if index.get('version') != INDEX_VERSION or not _matches(index.get('manifest'), manifest):
+        return None
+
+    try:
+        pages = [decode_image(os.path.join(directory, 'page{}.png'.format(i))) for i in range(index['pages'])]
+    except OSError:
+        return None
+
+    entries = {
+        name: (page, [_rect(frame) for frame in frames])
+        for name, (page, frames) in index['entries'].items()
+    }
+    return pages, entries
+
+
+def _matches(saved: Any, manifest: List[Any]) -> bool:
+    # sources read from the archives match the ones the atlas was saved with
+    # whatever their modification time, packed along with it
+    if not isinstance(saved, list) or len(saved) != len(manifest) or saved[:2] != manifest[:2]:
+        return False
+    for saved_source, source in zip(saved[2:], manifest[2:]):
+        if not isinstance(saved_source, list) or len(saved_source) != len(source):
+            return False
+        if source[2] is None:
+            saved_source = saved_source[:2] + [None] + saved_source[3:]
+        if saved_source != source:
+            return False
+    return True
@@ -0,0 +1,90 @@
+"""
+Frame time benchmarking.
+
+Benchmark scenarios are game scripts which record each frame on a `Benchmark`
+and report it on exit, they are meant to be run headless and uncapped:
+
+    defense --headless --bench --frames 600 --script bench/scenarios/sprites.py
+"""
+from typing import Any, Dict, List
+import json
+import math
+import sys
+import time
+from beer import memory, renderer
+
+
+class Benchmark:
+    """
+    Per-frame time, draw calls and core allocations of a scenario.
+
+    `frame` is called once per update, each record spans from the previous
+    call, so that it covers the whole frame, rendering included.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.__name = name
+        self.__times: List[float] = []
+        self.__draws: List[int] = []
+        self.__allocations: List[int] = []
+        self.__last_time = time.perf_counter()
+        self.__last_allocations = memory.get_stats().allocations
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def frames(self) -> int:
+        return len(self.__times)
+
+    def frame(self) -> None:
+        """
+        Records the frame which ended with this call.
+        """
+        now = time.perf_counter()
+        allocations = memory.get_stats().allocations
+        self.__times.append(now - self.__last_time)
+        self.__draws.append(renderer.get_stats().drawn)
+        self.__allocations.append(allocations - self.__last_allocations)
+        self.__last_time = now
+        self.__last_allocations = allocations
+
+    def results(self) -> Dict[str, Any]:
+        """
+        Returns the frame time percentiles and mean in milliseconds, along with
+        the per-frame draw calls and allocations.
+        """
+        # the first frame includes the scenario setup
+        times = sorted(self.__times[1:])
+        draws = self.__draws[1:]
+        allocations = self.__allocations[1:]
+        frames = len(times)
+        return {
+            'name': self.__name,
+            'frames': frames,
+            'frame_ms': {
+                'p50': _percentile(times, 50) * 1000,
+                'p95': _percentile(times, 95) * 1000,
+                'p99': _percentile(times, 99) * 1000,
+                'mean': sum(times) / frames * 1000 if frames else 0.0,
+                'max': times[-1] * 1000 if frames else 0.0,
+            },
+            'draw_calls': sum(draws) / frames if frames else 0.0,
+            'allocations': sum(allocations) / frames if frames else 0.0,
+        }
+
+    def report(self) -> None:
+        """
+        Prints the results as a single JSON line to stdout.
+        """
+        sys.stdout.write(json.dumps(self.results()) + '\n')
+        sys.stdout.flush()
+
+
+def _percentile(values: List[float], percent: int) -> float:
+    # nearest rank, on sorted values
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
@@ -2,8 +2,12 @@
 OS event handling API layer (keyboard, mouse, WM, etc.).
 """
 from enum import IntEnum, unique
+from typing import List, cast
 from _beer import ffi, lib
 
+# number of key events fetched per core call
+EVENTS_BATCH_LEN = 64
+
 
 @unique
 class KeyCode(IntEnum):
@@ -38,3 +42,61 @@ def get_key_state(code: KeyCode) -> KeyState:
     if lib.beer_key_get_state(code, state) != lib.BEER_OK:
         raise RuntimeError(f'invalid key {code}')
     return KeyState(state.pressed)
+
+
+class KeyEvent:
+    """
+    Keyboard key press or release.
+    """
+
+    key: KeyCode
+    pressed: bool
+    timestamp: int
+
+    def __init__(self, key: KeyCode, pressed: bool, timestamp: int) -> None:
+        self.key = key
+        self.pressed = pressed
+        self.timestamp = timestamp
+
+
+# buffers reused across calls
+_KEY_STATES = ffi.new('struct BeerKeyState[]', lib.BEER_KEY_MAX)
+_KEY_EVENTS = ffi.new('struct BeerKeyEvent[]', EVENTS_BATCH_LEN)
+_COUNT = ffi.new('unsigned*')
+
+
+def get_key_states() -> memoryview:
+    """
+    Retrieves the state of all the keys at once, as a view of pressed flags
+    indexed by key code.
+
+    The view is overwritten by the next call.
+    """
+    lib.beer_key_get_states(_KEY_STATES)
+    return cast(memoryview, memoryview(ffi.buffer(_KEY_STATES)).cast('?'))
+
+
+def push_key_event(key: KeyCode, pressed: bool) -> None:
+    """
+    Queues a synthetic key press or release, seen from the next frame on.
+    """
+    if lib.beer_key_push_event(key, pressed) != lib.BEER_OK:
+        raise RuntimeError(f'failed to push {key.name} event')
+
+
+def poll_events() -> List[KeyEvent]:
+    """
+    Retrieves the key events which occurred since the last poll, oldest first.
+
+    Keys pressed and released between two polls are reported as well, even
+    though their state is not pressed anymore.
+    """
+    events: List[KeyEvent] = []
+    while True:
+        lib.beer_key_poll_events(_KEY_EVENTS, EVENTS_BATCH_LEN, _COUNT)
+        events.extend(
+            KeyEvent(KeyCode(evt.key), evt.pressed, evt.timestamp)
+            for evt in _KEY_EVENTS[0:_COUNT[0]]
+        )
+        if _COUNT[0] < EVENTS_BATCH_LEN:
+            return events
@@ -0,0 +1,162 @@
+"""
+Background asset loading module.
+
+Files are read, decoded and parsed by a pool of worker threads, while textures,
+which have to be created on the main thread, are uploaded by `Loader.update`
+within a per frame budget.
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, List, Optional, Tuple
+import queue
+from beer.atlas import Atlas, AtlasBuilder, Entries
+from beer.pixelcache import DecodedImage
+from beer.texture import Texture, TextureCache, CACHE, decode_image
+
+# default amount of pixel bytes uploaded per frame
+UPLOAD_BUDGET = 4 * 1024 * 1024
+
+
+class _Upload:
+    """
+    Textures to create for a load, the future is resolved once they are all
+    created.
+    """
+
+    def __init__(
+            self,
+            future: 'Future[Any]',
+            images: List[Tuple[DecodedImage, Callable[[DecodedImage], Texture]]],
+            finish: Callable[[List[Texture]], Any]) -> None:
+        self.future = future
+        self.images = deque(images)
+        self.textures: List[Texture] = []
+        self.finish = finish
+
+
+class Loader:
+    """
+    Asynchronous asset loader.
+
+    Loads return futures, which are resolved with their assets and can be
+    polled from the script update. The loader `update` method must be called
+    once per frame, for textures to be created.
+    """
+
+    def __init__(
+            self,
+            workers: Optional[int] = None,
+            budget: int = UPLOAD_BUDGET,
+            cache: TextureCache = CACHE) -> None:
+        self.__executor = ThreadPoolExecutor(workers)
+        self.__budget = budget
+        self.__cache = cache
+        self.__decoded: 'queue.Queue[_Upload]' = queue.Queue()
+        self.__uploads: Deque[_Upload] = deque()
+
+    @property
+    def budget(self) -> int:
+        """
+        Amount of pixel bytes uploaded per frame, at least one texture is
+        uploaded per frame regardless.
+        """
+        return self.__budget
+
+    @budget.setter
+    def budget(self, value: int) -> None:
+        self.__budget = value
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of loads waiting for their textures to be uploaded.
+        """
+        return self.__decoded.qsize() + len(self.__uploads)
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> 'Future[Any]':
+        """
+        Runs a function on a worker thread, it must not create textures.
+        """
+        return self.__executor.submit(func, *args)
+
+    def load_texture(self, filename: str) -> 'Future[Texture]':
+        """
+        Loads a texture through the texture cache.
+        """
+        def decode() -> List[Tuple[DecodedImage, Callable[[DecodedImage], Texture]]]:
+            # hash the file here, sparing the main thread
+            self.__cache.key(filename)
+            return [(decode_image(filename), lambda decoded: self.__cache.load(filename, decoded))]
+
+        return self.__load(decode, lambda textures: textures[0])
+
+    def build_atlas(self, builder: AtlasBuilder, directory: Optional[str] = None) -> 'Future[Atlas]':
+        """
+        Packs an atlas, see `AtlasBuilder.build`.
+
+        The builder must not be changed until the atlas is loaded.
+        """
+        entries: Entries = {}
+
+        def pack() -> List[Tuple[DecodedImage, Callable[[DecodedImage], Texture]]]:
+            pages, packed = builder.pack(directory)
+            entries.update(packed)
+            return [(page, lambda decoded: Texture.from_pixels(*decoded, 'atlas page')) for page in pages]
+
+        return self.__load(pack, lambda textures: Atlas(textures, entries))
+
+    def update(self) -> None:
+        """
+        Creates the textures of the decoded loads, within the frame budget.
+        """
+        while True:
+            try:
+                self.__uploads.append(self.__decoded.get_nowait())
+            except queue.Empty:
+                break
+
+        uploaded = 0
+        while self.__uploads and (uploaded == 0 or uploaded < self.__budget):
+            upload = self.__uploads[0]
+            if upload.images:
+                decoded, create = upload.images.popleft()
+                try:
+                    upload.textures.append(create(decoded))
+                except Exception as exc:  # pylint: disable=broad-except
+                    self.__uploads.popleft()
+                    upload.future.set_exception(exc)
+                    continue
+                uploaded += decoded[0] * decoded[1] * 4
+
+            if not upload.images:
+                self.__uploads.popleft()
+                try:
+                    result = upload.finish(upload.textures)
+                except Exception as exc:  # pylint: disable=broad-except
+                    upload.future.set_exception(exc)
+                    continue
+                upload.future.set_result(result)
+
+    def shutdown(self) -> None:
+        """
+        Waits for the worker threads to finish their work and stops them.
+        """
+        self.__executor.shutdown()
+
+    def __load(
+            self,
+            decode: Callable[[], List[Tuple[DecodedImage, Callable[[DecodedImage], Texture]]]],
+            finish: Callable[[List[Texture]], Any]) -> 'Future[Any]':
+        future: 'Future[Any]' = Future()
+        future.set_running_or_notify_cancel()
+
+        def work() -> None:
+            try:
+                images = decode()
+            except Exception as exc:  # pylint: disable=broad-except
+                future.set_exception(exc)
+            else:
+                self.__decoded.put(_Upload(future, images, finish))
+
+        self.__executor.submit(work)
+        return future
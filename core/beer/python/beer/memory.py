@@ -0,0 +1,80 @@
+"""
+Core memory usage inspection.
+"""
+from typing import Any, List
+from _beer import ffi, lib
+
+# maximum number of pools reported
+POOLS_MAX = 64
+
+
+class MemoryStats:
+    """
+    Core allocation counters.
+
+    `allocations` and `bytes` are cumulative since startup, `live_allocations`
+    and `live_bytes` count what is not freed yet, and steadily growing values
+    across a long session point at a leak. `frame_allocations` and the arena
+    counters are those of the last frame.
+    """
+
+    allocations: int
+    bytes: int
+    live_allocations: int
+    live_bytes: int
+    peak_bytes: int
+    frame_allocations: int
+    arena_bytes: int
+    arena_peak: int
+    arena_capacity: int
+
+    def __init__(self, data: Any) -> None:
+        self.allocations = data.allocations
+        self.bytes = data.bytes
+        self.live_allocations = data.live_allocations
+        self.live_bytes = data.live_bytes
+        self.peak_bytes = data.peak_bytes
+        self.frame_allocations = data.frame_allocations
+        self.arena_bytes = data.arena_bytes
+        self.arena_peak = data.arena_peak
+        self.arena_capacity = data.arena_capacity
+
+
+class PoolStats:
+    """
+    Usage of a core object pool, in number of items.
+    """
+
+    name: str
+    item_size: int
+    capacity: int
+    used: int
+    peak: int
+
+    def __init__(self, data: Any) -> None:
+        self.name = ffi.string(data.name).decode('utf-8')
+        self.item_size = data.item_size
+        self.capacity = data.capacity
+        self.used = data.used
+        self.peak = data.peak
+
+
+def get_stats() -> MemoryStats:
+    """
+    Retrieves the core allocation counters.
+    """
+    stats = ffi.new('struct BeerMemoryStats*')
+    if lib.beer_memory_get_stats(stats) != lib.BEER_OK:
+        raise RuntimeError('failed to get memory stats')
+    return MemoryStats(stats)
+
+
+def get_pool_stats() -> List[PoolStats]:
+    """
+    Retrieves the usage of the core object pools.
+    """
+    stats = ffi.new('struct BeerPoolStats[]', POOLS_MAX)
+    count = ffi.new('unsigned*')
+    if lib.beer_memory_get_pool_stats(stats, POOLS_MAX, count) != lib.BEER_OK:
+        raise RuntimeError('failed to get pool stats')
+    return [PoolStats(stats + i) for i in range(count[0])]
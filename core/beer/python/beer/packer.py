@@ -0,0 +1,179 @@
+"""
+Asset archives builder.
+
+Files are packed into one archive, read by the core with `beer.pak`, with their
+data aligned and followed by an index sorted by path. Files which shrink with
+LZ4 block compression are stored compressed, except those of formats which are
+compressed already.
+
+Archives are built from the game root, with paths relative to it:
+
+    python -m beer.packer ARCHIVE PATH...
+
+Hidden files and directories, such as caches, are only packed when given.
+"""
+from typing import Dict, Iterable, List, Tuple
+import argparse
+import os
+import struct
+
+MAGIC = b'BEERPAK\0'
+VERSION = 1
+
+# data offsets alignment, matching BEER_PAK_ALIGNMENT
+ALIGNMENT = 64
+
+COMPRESSION_NONE = 0
+COMPRESSION_LZ4 = 1
+
+# magic, version, entries count, index offset, names offset
+_HEADER = struct.Struct('<8sIIQQ')
+
+# data offset, stored size, size, name offset, name length, compression
+_ENTRY = struct.Struct('<QQQIHBx')
+
+# extensions of the files stored as they are
+COMPRESSED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.ogg', '.mp3', '.zip', '.gz', '.pak'}
+
+# LZ4 block constraints: matches are at least 4 bytes long, and the last 5
+# bytes of a block are literals, with no match starting in the last 12
+_MIN_MATCH = 4
+_LAST_LITERALS = 5
+_MATCH_LIMIT = 12
+_MAX_OFFSET = 0xFFFF
+
+
+def compress(data: bytes) -> bytes:
+    """
+    Compresses data to an LZ4 block, with a greedy search of 4 bytes matches.
+    """
+    out = bytearray()
+    table: Dict[bytes, int] = {}
+    anchor = pos = 0
+    end = len(data)
+    while pos < end - _MATCH_LIMIT:
+        key = data[pos:pos + _MIN_MATCH]
+        ref = table.get(key)
+        table[key] = pos
+        if ref is None or pos - ref > _MAX_OFFSET:
+            pos += 1
+            continue
+
+        length = _MIN_MATCH
+        max_length = end - _LAST_LITERALS - pos
+        while length < max_length and data[ref + length] == data[pos + length]:
+            length += 1
+
+        _write_sequence(out, data[anchor:pos], pos - ref, length)
+        pos = anchor = pos + length
+
+    _write_sequence(out, data[anchor:], 0, 0)
+    return bytes(out)
+
+
+def _write_sequence(out: bytearray, literals: bytes, offset: int, length: int) -> None:
+    # a zero length ends the block with its last literals
+    match = length - _MIN_MATCH if length else 0
+    out.append(min(len(literals), 15) << 4 | min(match, 15))
+    if len(literals) >= 15:
+        _write_length(out, len(literals) - 15)
+    out += literals
+    if length:
+        out += offset.to_bytes(2, 'little')
+        if match >= 15:
+            _write_length(out, match - 15)
+
+
+def _write_length(out: bytearray, length: int) -> None:
+    while length >= 255:
+        out.append(255)
+        length -= 255
+    out.append(length)
+
+
+def find_files(paths: Iterable[str]) -> List[str]:
+    """
+    Returns the given files and those found in the given directory trees,
+    leaving out the hidden files and directories and the Python caches found
+    in them.
+    """
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs[:] = sorted(name for name in dirs if not name.startswith('.') and name != '__pycache__')
+            files.extend(os.path.join(root, name) for name in sorted(names) if not name.startswith('.'))
+    return files
+
+
+def build(filename: str, files: Iterable[str], root: str = '.') -> int:
+    """
+    Builds an archive of the given files, named by their path relative to the
+    root, returns the number of files packed.
+    """
+    entries: List[Tuple[bytes, str]] = sorted(
+        (os.path.relpath(path, root).replace(os.sep, '/').encode('utf-8'), path)
+        for path in set(files)
+    )
+    for i, (name, path) in enumerate(entries):
+        if name.startswith(b'../') or len(name) > 0xFFFF:
+            raise ValueError('bad archive path for {}'.format(path))
+        if i > 0 and entries[i - 1][0] == name:
+            raise ValueError('{} packed twice'.format(path))
+
+    # written aside and moved in place, so that a broken archive is never
+    # mounted
+    tmp_filename = filename + '.tmp'
+    index = bytearray()
+    names = bytearray()
+    with open(tmp_filename, 'wb') as file_handle:
+        offset = _HEADER.size
+        for name, path in entries:
+            data, size, compression = _read_stored(path)
+
+            # aligned, with at least a zero byte after the data
+            offset += -offset % ALIGNMENT
+            file_handle.seek(offset)
+            file_handle.write(data)
+            file_handle.write(b'\0')
+            index += _ENTRY.pack(offset, len(data), size, len(names), len(name), compression)
+            names += name + b'\0'
+            offset += len(data) + 1
+
+        file_handle.write(index)
+        file_handle.write(names)
+        file_handle.seek(0)
+        file_handle.write(_HEADER.pack(MAGIC, VERSION, len(entries), offset, offset + len(index)))
+    os.replace(tmp_filename, filename)
+
+    return len(entries)
+
+
+def _read_stored(path: str) -> Tuple[bytes, int, int]:
+    # data of a file as stored in the archive, with its size and compression
+    with open(path, 'rb') as file_handle:
+        data = file_handle.read()
+
+    if os.path.splitext(path)[1].lower() not in COMPRESSED_EXTENSIONS:
+        compressed = compress(data)
+        if len(compressed) < len(data):
+            return compressed, len(data), COMPRESSION_LZ4
+    return data, len(data), COMPRESSION_NONE
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Builds an asset archive.')
+    parser.add_argument('archive', help='archive file')
+    parser.add_argument('paths', nargs='+', help='files and directories to pack')
+    parser.add_argument('--root', default='.', help='directory the archive paths are relative to')
+    args = parser.parse_args()
+
+    files = find_files(args.paths)
+    packed = build(args.archive, files, args.root)
+    print('{} files packed in {}'.format(packed, args.archive))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Asset archives, read through the core.
+
+Archives built with `beer.packer` are memory mapped by the core, which serves
+from the same mapping the files it loads itself and those read here. Stored
+files are read in place and compressed ones are decompressed once, so their
+contents are given as memory views, with no copies.
+
+Mounted archives are searched before the filesystem, by path relative to the
+working directory, newest first.
+"""
+from typing import Any, BinaryIO, List, Optional, cast
+import io
+import mmap
+import os
+from _beer import ffi, lib
+
+
+class PakEntry:
+    """
+    File of an archive.
+    """
+
+    name: str
+    size: int
+    stored_size: int
+    compressed: bool
+
+    def __init__(self, data: Any) -> None:
+        self.name = ffi.string(data.name).decode('utf-8')
+        self.size = data.size
+        self.stored_size = data.stored_size
+        self.compressed = data.compression != lib.BEER_PAK_COMPRESSION_NONE
+
+
+class PakFile(io.RawIOBase):
+    """
+    Read-only file over a memory view, such as an archive file.
+    """
+
+    name: str
+
+    def __init__(self, data: memoryview, name: str) -> None:
+        super().__init__()
+        self.__data = data
+        self.__pos = 0
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        target = memoryview(buffer).cast('B')
+        chunk = self.__data[self.__pos:self.__pos + len(target)]
+        target[:len(chunk)] = chunk
+        self.__pos += len(chunk)
+        return len(chunk)
+
+    def readall(self) -> bytes:
+        chunk = self.__data[self.__pos:]
+        self.__pos = len(self.__data)
+        return bytes(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.__pos
+        elif whence == io.SEEK_END:
+            offset += len(self.__data)
+        elif whence != io.SEEK_SET:
+            raise ValueError('invalid whence {}'.format(whence))
+        if offset < 0:
+            raise ValueError('negative seek position {}'.format(offset))
+        self.__pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self.__pos
+
+    def getbuffer(self) -> memoryview:
+        """
+        Returns the whole file contents, with no copy.
+        """
+        return self.__data
+
+
+class Pak:
+    """
+    Archive opened on its own, not mounted.
+
+    The memory views read from it keep it open, it cannot be closed while any
+    of them is alive.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.__views = 0
+        self.__ptr = ffi.new('struct BeerPak**')
+        if lib.beer_pak_open(filename.encode('utf-8'), self.__ptr) != lib.BEER_OK:
+            raise RuntimeError('failed to open archive {}'.format(filename))
+
+    def __del__(self) -> None:
+        # views collected along with the archive may not have been released
+        if self.__views == 0:
+            self.close()
+
+    def __len__(self) -> int:
+        return cast(int, lib.beer_pak_len(self.__pak))
+
+    def __contains__(self, name: str) -> bool:
+        return self.__find(name) is not None
+
+    @property
+    def __pak(self) -> Any:
+        if self.__ptr[0] == ffi.NULL:
+            raise RuntimeError('archive closed')
+        return self.__ptr[0]
+
+    def close(self) -> None:
+        if self.__views > 0:
+            raise RuntimeError('archive still has {} views alive'.format(self.__views))
+        if self.__ptr[0] != ffi.NULL:
+            lib.beer_pak_close(self.__ptr[0])
+            self.__ptr[0] = ffi.NULL
+
+    def entries(self) -> List[PakEntry]:
+        """
+        Returns the files of the archive, sorted by name.
+        """
+        entry = ffi.new('struct BeerPakEntry*')
+        entries = []
+        for index in range(len(self)):
+            lib.beer_pak_get_entry(self.__pak, index, entry)
+            entries.append(PakEntry(entry))
+        return entries
+
+    def names(self) -> List[str]:
+        return [entry.name for entry in self.entries()]
+
+    def read(self, name: str) -> memoryview:
+        """
+        Returns the contents of a file of the archive, with no copy.
+        """
+        index = self.__find(name)
+        if index is None:
+            raise KeyError(name)
+
+        data = ffi.new('char**')
+        size = ffi.new('size_t*')
+        if lib.beer_pak_read(self.__pak, index, data, size) != lib.BEER_OK:
+            raise RuntimeError('failed to read {} from archive'.format(name))
+
+        # the buffer owns a reference to the archive, dropped with the last
+        # view over it
+        self.__views += 1
+        return _view(ffi.gc(data[0], self.__release_view), size[0])
+
+    def open(self, name: str) -> PakFile:
+        return PakFile(self.read(name), name)
+
+    def __release_view(self, _data: Any) -> None:
+        self.__views -= 1
+
+    def __find(self, name: str) -> Optional[int]:
+        index = ffi.new('unsigned*')
+        if lib.beer_pak_find(self.__pak, name.encode('utf-8'), index) != lib.BEER_OK:
+            return None
+        return cast(int, index[0])
+
+
+def mount(filename: str) -> None:
+    """
+    Mounts an archive, for the core and this module to read files from, until
+    shutdown.
+    """
+    if lib.beer_fs_mount(filename.encode('utf-8')) != lib.BEER_OK:
+        raise RuntimeError('failed to mount archive {}'.format(filename))
+
+
+def map_mounted(filename: str) -> Optional[memoryview]:
+    """
+    Returns the contents of a file of the mounted archives, with no copy, or
+    None when none of them has it.
+    """
+    data = ffi.new('char**')
+    size = ffi.new('size_t*')
+    if lib.beer_file_map(entry_name(filename).encode('utf-8'), data, size) != lib.BEER_OK:
+        return None
+    return _view(data[0], size[0])
+
+
+def read(filename: str) -> memoryview:
+    """
+    Returns the contents of a file from the mounted archives, or else from
+    disk, memory mapped. May be called from any thread.
+    """
+    data = map_mounted(filename)
+    if data is not None:
+        return data
+
+    with open(filename, 'rb') as file_handle:
+        if os.fstat(file_handle.fileno()).st_size == 0:
+            return memoryview(b'')
+        return memoryview(mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def open_file(filename: str) -> BinaryIO:
+    """
+    Opens a file from the mounted archives, or else from disk, for binary
+    reading. May be called from any thread.
+    """
+    data = map_mounted(filename)
+    if data is not None:
+        return cast(BinaryIO, PakFile(data, filename))
+    return open(filename, 'rb')
+
+
+def _view(data: Any, size: int) -> memoryview:
+    # the archive is mapped read-only, writing to it would crash; read-only
+    # views need Python 3.8
+    view = memoryview(ffi.buffer(data, size))
+    if hasattr(view, 'toreadonly'):
+        return view.toreadonly()
+    return view
+
+
+def entry_name(filename: str) -> str:
+    """
+    Returns the name a file has in the archives: its path relative to the
+    working directory, with forward slashes.
+    """
+    path = os.path.normpath(filename)
+    if os.path.isabs(path):
+        path = os.path.relpath(path)
+    return path.replace(os.sep, '/')
@@ -0,0 +1,271 @@
+"""
+Flow field pathfinding over tile maps.
+
+Instead of searching a path for each agent, a flow field holds for every tile
+of the map its distance to the nearest goal tile and the direction of the next
+tile on the way there, so that any number of agents heading to the same goals
+route by lookup.
+"""
+from collections import deque
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import heapq
+import numpy
+
+if TYPE_CHECKING:
+    # the tile map loader needs the core, fields are built without it
+    from beer.tilemap import TileMap  # pylint: disable=unused-import
+
+Tile = Tuple[int, int]
+
+# tile or layer property marking tiles which cannot be walked through
+NOT_WALKABLE = 'not_walkable'
+
+# distance of the tiles from which no goal can be reached
+UNREACHABLE = numpy.iinfo(numpy.int32).max
+
+# neighbour offsets, in the order ties between them are broken
+_NEIGHBOURS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+def walkable_grid(tile_map: 'TileMap') -> Any:
+    """
+    Returns a (height, width) boolean grid of the walkable tiles of a map.
+
+    A tile is not walkable when any layer has a tile there whose properties,
+    or the layer properties, set `not_walkable`.
+    """
+    blocked = numpy.zeros((tile_map.height, tile_map.width), dtype=bool)
+    for layer in tile_map.layers:
+        layer_blocked = bool(layer.properties.get(NOT_WALKABLE))
+        for sheet, plane in layer.planes.items():
+            frames = numpy.asarray(plane)
+            if layer_blocked:
+                blocked |= frames >= 0
+                continue
+
+            # lookup of the frames not walkable, no tile (-1) maps to the
+            # last entry which is always false
+            lookup = numpy.zeros(len(tile_map.frames[sheet]) + 1, dtype=bool)
+            for frame in range(len(tile_map.frames[sheet])):
+                lookup[frame] = bool(tile_map.get_tile_properties(sheet, frame).get(NOT_WALKABLE))
+            blocked |= lookup[frames]
+    return ~blocked
+
+
+class FlowField:
+    """
+    Distances and directions towards a set of goal tiles.
+
+    `distances` is a (height, width) int32 grid of steps to the nearest goal,
+    UNREACHABLE for tiles from which none can be reached, and `directions` a
+    (height, width, 2) int8 grid of (dx, dy) offsets of the next tile to step
+    on, (0, 0) on goals and unreachable tiles.
+    """
+
+    def __init__(self, walkable: Any, goals: FrozenSet[Tile]) -> None:
+        self.__height = int(walkable.shape[0])
+        self.__width = int(walkable.shape[1])
+        self.__goals = goals
+
+        # searches run on flat lists, indexed by y * width + x, which are much
+        # faster to access one item at a time than arrays
+        self.__dist = [UNREACHABLE] * (self.__width * self.__height)
+        self.__next: List[int] = []
+        self.__distances: Any = None
+        self.__directions: Any = None
+        self.__fill(walkable.ravel().tolist())
+
+    @property
+    def goals(self) -> FrozenSet[Tile]:
+        return self.__goals
+
+    @property
+    def distances(self) -> Any:
+        return self.__distances
+
+    @property
+    def directions(self) -> Any:
+        return self.__directions
+
+    def get_direction(self, x: int, y: int) -> Tuple[int, int]:
+        dx, dy = self.__directions[y, x]
+        return int(dx), int(dy)
+
+    def next_tiles(self, tiles: Any) -> Any:
+        """
+        Returns the next tile of each of an (n, 2) array of (x, y) tiles.
+        """
+        tiles = numpy.asarray(tiles)
+        return tiles + self.__directions[tiles[:, 1], tiles[:, 0]]
+
+    def _update(self, walkable: List[bool], blocked: Iterable[Tile], unblocked: Iterable[Tile]) -> None:
+        """
+        Updates the field after the given tiles changed walkability, the grid
+        is given as a flat list.
+        """
+        dist = self.__dist
+        nxt = self.__next
+
+        # tiles whose way went through a blocked tile, found walking the flow
+        # backwards, lose their distance; the others keep theirs, as blocking
+        # tiles can only make ways longer
+        queue = deque(self.__index(tile) for tile in blocked)
+        invalid: List[int] = []
+        for index in queue:
+            dist[index] = UNREACHABLE
+        while queue:
+            index = queue.popleft()
+            invalid.append(index)
+            for neighbour in self.__neighbours(index):
+                if nxt[neighbour] == index and dist[neighbour] != UNREACHABLE:
+                    dist[neighbour] = UNREACHABLE
+                    queue.append(neighbour)
+
+        # invalidated and unblocked tiles are reached again from their valid
+        # neighbours
+        goals = {self.__index(goal) for goal in self.__goals if self.__contains(goal)}
+        heap: List[Tuple[int, int]] = []
+        for index in invalid + [self.__index(tile) for tile in unblocked]:
+            if not walkable[index]:
+                continue
+            best = 0 if index in goals else min(
+                (dist[neighbour] + 1 for neighbour in self.__neighbours(index)),
+                default=UNREACHABLE)
+            if best < dist[index]:
+                dist[index] = best
+                heap.append((best, index))
+
+        self.__relax(walkable, heap)
+        self.__update_directions()
+
+    def __fill(self, walkable: List[bool]) -> None:
+        heap = []
+        for goal in self.__goals:
+            index = self.__index(goal)
+            if self.__contains(goal) and walkable[index]:
+                self.__dist[index] = 0
+                heap.append((0, index))
+        self.__relax(walkable, heap)
+        self.__update_directions()
+
+    def __relax(self, walkable: List[bool], heap: List[Tuple[int, int]]) -> None:
+        # uniform cost search from the queued tiles, lowering distances only
+        heapq.heapify(heap)
+        dist = self.__dist
+        while heap:
+            distance, index = heapq.heappop(heap)
+            if distance != dist[index]:
+                continue
+            for neighbour in self.__neighbours(index):
+                if walkable[neighbour] and distance + 1 < dist[neighbour]:
+                    dist[neighbour] = distance + 1
+                    heapq.heappush(heap, (distance + 1, neighbour))
+
+    def __update_directions(self) -> None:
+        # each tile points to its nearest neighbour, if nearer than itself
+        distances = numpy.array(self.__dist, dtype=numpy.int32).reshape(self.__height, self.__width)
+        padded = numpy.pad(distances, 1, mode='constant', constant_values=UNREACHABLE)
+        neighbours = numpy.stack([
+            padded[1 + dy:1 + dy + self.__height, 1 + dx:1 + dx + self.__width]
+            for dx, dy in _NEIGHBOURS
+        ])
+        nearest = neighbours.argmin(axis=0)
+        closer = neighbours.min(axis=0) < distances
+
+        offsets = numpy.array(_NEIGHBOURS, dtype=numpy.int8)
+        directions = numpy.where(closer[..., numpy.newaxis], offsets[nearest], 0).astype(numpy.int8)
+        indices = numpy.arange(distances.size).reshape(distances.shape)
+        flat_offsets = numpy.array([dx + dy * self.__width for dx, dy in _NEIGHBOURS])
+
+        self.__distances = distances
+        self.__directions = directions
+        self.__next = numpy.where(closer, indices + flat_offsets[nearest], -1).ravel().tolist()
+
+    def __index(self, tile: Tile) -> int:
+        return tile[1] * self.__width + tile[0]
+
+    def __contains(self, tile: Tile) -> bool:
+        return 0 <= tile[0] < self.__width and 0 <= tile[1] < self.__height
+
+    def __neighbours(self, index: int) -> List[int]:
+        y, x = divmod(index, self.__width)
+        neighbours = []
+        if y > 0:
+            neighbours.append(index - self.__width)
+        if y < self.__height - 1:
+            neighbours.append(index + self.__width)
+        if x > 0:
+            neighbours.append(index - 1)
+        if x < self.__width - 1:
+            neighbours.append(index + 1)
+        return neighbours
+
+
+class PathFinder:
+    """
+    Walkability grid along with the flow fields computed on it, cached by goal.
+
+    Fields are kept up to date incrementally when tiles are blocked, for
+    instance by a tower placement, or unblocked.
+    """
+
+    def __init__(self, walkable: Any) -> None:
+        self.__walkable = numpy.array(walkable, dtype=bool)
+        self.__walkable_list = self.__walkable.ravel().tolist()
+        self.__fields: Dict[FrozenSet[Tile], FlowField] = {}
+
+    @classmethod
+    def from_map(cls, tile_map: 'TileMap') -> 'PathFinder':
+        return cls(walkable_grid(tile_map))
+
+    @property
+    def walkable(self) -> Any:
+        """
+        Read-only view of the walkability grid.
+        """
+        view = self.__walkable.view()
+        view.flags.writeable = False
+        return view
+
+    def field(self, goals: Iterable[Tile]) -> FlowField:
+        """
+        Returns the flow field towards the given goal tiles.
+        """
+        key = frozenset((int(x), int(y)) for x, y in goals)
+        flow_field = self.__fields.get(key)
+        if flow_field is None:
+            flow_field = self.__fields[key] = FlowField(self.__walkable, key)
+        return flow_field
+
+    def set_walkable(self, tiles: Iterable[Tile], walkable: bool) -> None:
+        """
+        Changes the walkability of some tiles, updating the cached fields.
+        """
+        width = self.__walkable.shape[1]
+        changed = [(int(x), int(y)) for x, y in set(tiles) if self.__walkable[y, x] != walkable]
+        for x, y in changed:
+            self.__walkable[y, x] = walkable
+            self.__walkable_list[y * width + x] = walkable
+        if not changed:
+            return
+
+        for flow_field in self.__fields.values():
+            if walkable:
+                flow_field._update(self.__walkable_list, (), changed)  # pylint: disable=protected-access
+            else:
+                flow_field._update(self.__walkable_list, changed, ())  # pylint: disable=protected-access
+
+    def block(self, tiles: Iterable[Tile]) -> None:
+        self.set_walkable(tiles, False)
+
+    def unblock(self, tiles: Iterable[Tile]) -> None:
+        self.set_walkable(tiles, True)
+
+    def forget(self, goals: Optional[Iterable[Tile]] = None) -> None:
+        """
+        Drops the cached field towards the given goals, or all of them.
+        """
+        if goals is None:
+            self.__fields.clear()
+        else:
+            self.__fields.pop(frozenset((int(x), int(y)) for x, y in goals), None)
@@ -0,0 +1,174 @@
+"""
+Decoded pixels cache.
+
+Images are decoded once to raw RGBA pixels, which are stored in a cache
+directory and memory mapped on later loads, so that textures are created right
+from the mapped file, with no decoding and no intermediate copies.
+
+The cache can be warmed ahead of time for whole asset trees:
+
+    python -m beer.pixelcache CACHE_DIRECTORY ASSETS_DIRECTORY...
+"""
+from typing import Any, BinaryIO, Iterable, List, Optional, Tuple, Union
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+# image decoded to RGBA pixels, as (width, height, pixels)
+DecodedImage = Tuple[int, int, Any]
+
+MAGIC = b'BEERPIX\0'
+VERSION = 1
+
+# magic, version, width, height, source modification time and size; pixels
+# follow at PIXELS_OFFSET
+_HEADER = struct.Struct('=8sIIIqq')
+PIXELS_OFFSET = 64
+
+# extensions of the images found when warming an assets tree
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tga'}
+
+
+def decode(file: Union[str, BinaryIO]) -> DecodedImage:
+    """
+    Decodes an image file, given by name or opened, to RGBA pixels.
+    """
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    img = Image.open(file).convert('RGBA')
+    return img.width, img.height, img.tobytes()
+
+
+class PixelCache:
+    """
+    Cache of decoded images, by source path and modification time.
+
+    May be used from any thread.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.__directory = directory
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    def get(self, filename: str) -> DecodedImage:
+        """
+        Returns the pixels of an image, as a view of the mapped cache file when
+        it is up to date, otherwise the image is decoded and cached.
+        """
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        cached = self.__map(path, stat)
+        if cached is not None:
+            return cached
+
+        decoded = decode(filename)
+        self.__store(path, stat, decoded)
+        return decoded
+
+    def warm(self, filenames: Iterable[str]) -> int:
+        """
+        Decodes the images whose cache is missing or out of date, returns how
+        many were decoded.
+        """
+        decoded = 0
+        for filename in filenames:
+            path = os.path.abspath(filename)
+            stat = os.stat(path)
+            if self.__read_header(path, stat) is None:
+                self.__store(path, stat, decode(filename))
+                decoded += 1
+        return decoded
+
+    def __cache_path(self, path: str) -> str:
+        return os.path.join(self.__directory, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.rgba')
+
+    def __read_header(self, path: str, stat: os.stat_result) -> Optional[Tuple[int, int]]:
+        try:
+            with open(self.__cache_path(path), 'rb') as file_handle:
+                magic, version, width, height, mtime, size = _HEADER.unpack(file_handle.read(_HEADER.size))
+        except (OSError, struct.error):
+            return None
+
+        if (magic, version, mtime, size) != (MAGIC, VERSION, stat.st_mtime_ns, stat.st_size):
+            return None
+        return width, height
+
+    def __map(self, path: str, stat: os.stat_result) -> Optional[DecodedImage]:
+        size = self.__read_header(path, stat)
+        if size is None:
+            return None
+
+        width, height = size
+        try:
+            with open(self.__cache_path(path), 'rb') as file_handle:
+                buffer = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        pixels = memoryview(buffer)[PIXELS_OFFSET:PIXELS_OFFSET + width * height * 4]
+        if len(pixels) != width * height * 4:
+            return None
+        return width, height, pixels
+
+    def __store(self, path: str, stat: os.stat_result, decoded: DecodedImage) -> None:
+        width, height, pixels = decoded
+        cache_path = self.__cache_path(path)
+        tmp_path = '{}.{}.{}.tmp'.format(cache_path, os.getpid(), threading.get_ident())
+        header = _HEADER.pack(MAGIC, VERSION, width, height, stat.st_mtime_ns, stat.st_size)
+
+        # the cache is an optimization, failing to write it is not an error
+        try:
+            os.makedirs(self.__directory, exist_ok=True)
+            with open(tmp_path, 'wb') as file_handle:
+                file_handle.write(header.ljust(PIXELS_OFFSET, b'\0'))
+                file_handle.write(pixels)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+CACHE: Optional[PixelCache] = None
+
+
+def enable(directory: str) -> PixelCache:
+    """
+    Enables the process-wide pixel cache, used for all texture loads.
+    """
+    global CACHE  # pylint: disable=global-statement
+    CACHE = PixelCache(directory)
+    return CACHE
+
+
+def find_images(directories: Iterable[str]) -> List[str]:
+    """
+    Returns the images found in the given directory trees.
+    """
+    return [
+        os.path.join(root, name)
+        for directory in directories
+        for root, _, names in os.walk(directory)
+        for name in sorted(names)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Warms the decoded pixels cache of asset trees.')
+    parser.add_argument('cache', help='cache directory')
+    parser.add_argument('assets', nargs='+', help='assets directories')
+    args = parser.parse_args()
+
+    images = find_images(args.assets)
+    decoded = PixelCache(args.cache).warm(images)
+    print('{} images, {} decoded'.format(len(images), decoded))
+
+
+if __name__ == '__main__':
+    main()
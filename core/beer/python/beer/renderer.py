@@ -0,0 +1,113 @@
+"""
+Renderer camera and state inspection.
+"""
+from typing import Any, Tuple, cast
+from abc import ABC, abstractmethod
+from _beer import ffi, lib
+
+
+class Drawable(ABC):
+    """
+    Base of objects drawn by a renderer node while visible.
+
+    Drawables are drawn by ascending layer; within a layer, the ones sharing a
+    texture are drawn together, in the order they were made visible.
+    """
+
+    def __init__(self) -> None:
+        self.__node: Any = None
+        self.__layer = 0
+
+    @abstractmethod
+    def _add_node(self, r_node: Any) -> int:
+        """
+        Adds the render node of the drawable, returning the error code.
+        """
+
+    @property
+    def node(self) -> Any:
+        """
+        Render node pointer, or None if the drawable is hidden.
+        """
+        return self.__node[0] if self.__node is not None else None
+
+    @property
+    def visible(self) -> bool:
+        return self.__node is not None
+
+    @visible.setter
+    def visible(self, flag: bool) -> None:
+        if flag and self.__node is None:
+            node = ffi.new('struct BeerRenderNode**', ffi.NULL)
+            if self._add_node(node) != lib.BEER_OK:
+                raise RuntimeError('failed to add render node')
+            self.__node = node
+            if self.__layer != 0:
+                self.layer = self.__layer
+        elif not flag and self.__node is not None:
+            if lib.beer_renderer_remove_node(self.__node[0]) != lib.BEER_OK:
+                raise RuntimeError('failed to remove render node')
+            self.__node = None
+
+    @property
+    def layer(self) -> int:
+        return self.__layer
+
+    @layer.setter
+    def layer(self, value: int) -> None:
+        if self.__node is not None:
+            if lib.beer_renderer_set_node_layer(self.__node[0], value) != lib.BEER_OK:
+                raise RuntimeError('failed to set render node layer')
+        self.__layer = value
+
+
+class RendererStats:
+    """
+    Render list occupancy and last frame draw counts.
+    """
+
+    capacity: int
+    nodes: int
+    drawn: int
+    culled: int
+    texture_switches: int
+
+    def __init__(self, capacity: int, nodes: int, drawn: int, culled: int, texture_switches: int) -> None:
+        self.capacity = capacity
+        self.nodes = nodes
+        self.drawn = drawn
+        self.culled = culled
+        self.texture_switches = texture_switches
+
+
+def get_stats() -> RendererStats:
+    """
+    Retrieves the render list capacity, number of nodes in use and the number
+    of draws issued, culled and texture switches in the last frame.
+    """
+    stats = ffi.new('struct BeerRendererStats*')
+    if lib.beer_renderer_get_stats(stats) != lib.BEER_OK:
+        raise RuntimeError('failed to get renderer stats')
+    return RendererStats(stats.capacity, stats.nodes, stats.drawn, stats.culled, stats.texture_switches)
+
+
+def set_camera(x: float, y: float, zoom: float = 1.0) -> None:
+    """
+    Sets the world position shown at the top-left window corner and the zoom
+    factor.
+    """
+    if zoom <= 0:
+        raise ValueError('camera zoom must be positive')
+    camera = ffi.new('struct BeerCamera*', {'x': x, 'y': y, 'zoom': zoom})
+    if lib.beer_renderer_set_camera(camera) != lib.BEER_OK:
+        raise RuntimeError('failed to set camera')
+
+
+def get_camera() -> Tuple[float, float, float]:
+    """
+    Retrieves the camera position and zoom factor.
+    """
+    camera = ffi.new('struct BeerCamera*')
+    if lib.beer_renderer_get_camera(camera) != lib.BEER_OK:
+        raise RuntimeError('failed to get camera')
+    return cast(float, camera.x), cast(float, camera.y), cast(float, camera.zoom)
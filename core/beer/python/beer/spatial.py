@@ -0,0 +1,169 @@
+"""
+Uniform grid spatial index.
+
+Entities are bucketed by the grid cell they stand in, cells are usually the
+size of the map tiles or a multiple of it. The grid is rebuilt in bulk from an
+array of positions, by sorting the entities by cell, so that the entities of
+a row of cells are contiguous and a query only slices a few ranges out of the
+sorted indices before testing the candidates.
+"""
+from typing import TYPE_CHECKING, Any, Optional, Tuple
+import math
+import numpy
+
+if TYPE_CHECKING:
+    # the tile map loader needs the core, grids are built without it
+    from beer.tilemap import TileMap  # pylint: disable=unused-import
+
+
+class SpatialGrid:
+    """
+    Index of entity positions, entities are referred to by their row in the
+    positions array the grid was last updated with.
+
+    Entities beyond the grid bounds are kept in its border cells, so they are
+    found by queries all the same, only less efficiently.
+    """
+
+    def __init__(self, columns: int, rows: int, cell_width: float, cell_height: float) -> None:
+        self.__columns = columns
+        self.__rows = rows
+        self.__cell_width = cell_width
+        self.__cell_height = cell_height
+        self.__cell_size = numpy.array((cell_width, cell_height), dtype=numpy.float64)
+        self.__positions = numpy.zeros((0, 2), dtype=numpy.float64)
+        self.__order = numpy.zeros(0, dtype=numpy.intp)
+        self.__starts = numpy.zeros(columns * rows + 1, dtype=numpy.intp)
+
+    @classmethod
+    def from_map(cls, tile_map: 'TileMap', tiles_per_cell: int = 1) -> 'SpatialGrid':
+        """
+        Creates a grid covering a map, with cells aligned to its tiles.
+        """
+        return cls(
+            -(-tile_map.width // tiles_per_cell),
+            -(-tile_map.height // tiles_per_cell),
+            tile_map.tile_width * tiles_per_cell,
+            tile_map.tile_height * tiles_per_cell)
+
+    @property
+    def columns(self) -> int:
+        return self.__columns
+
+    @property
+    def rows(self) -> int:
+        return self.__rows
+
+    @property
+    def count(self) -> int:
+        return len(self.__order)
+
+    def update(self, positions: Any, mask: Optional[Any] = None) -> None:
+        """
+        Indexes an (n, 2) array of (x, y) positions, replacing the previous
+        ones. When a boolean mask is given, only the entities it selects are
+        indexed.
+        """
+        self.__positions = numpy.array(positions, dtype=numpy.float64).reshape(-1, 2)
+        indices = numpy.arange(len(self.__positions)) if mask is None else numpy.flatnonzero(mask)
+
+        cells = self.__cells(self.__positions[indices])
+        self.__order = indices[numpy.argsort(cells, kind='stable')]
+        counts = numpy.bincount(cells, minlength=self.__columns * self.__rows)
+        numpy.cumsum(counts, out=self.__starts[1:])
+
+    def query_rect(self, x: float, y: float, width: float, height: float) -> Any:
+        """
+        Returns the indices of the entities within a rectangle, its right and
+        bottom edges excluded.
+        """
+        candidates = self.__candidates(x, y, x + width, y + height)
+        positions = self.__positions[candidates]
+        inside = (
+            (positions[:, 0] >= x) & (positions[:, 0] < x + width) &
+            (positions[:, 1] >= y) & (positions[:, 1] < y + height)
+        )
+        return candidates[inside]
+
+    def query_radius(self, x: float, y: float, radius: float) -> Any:
+        """
+        Returns the indices of the entities within a distance of a point.
+        """
+        candidates = self.__candidates(x - radius, y - radius, x + radius, y + radius)
+        offsets = self.__positions[candidates] - (x, y)
+        return candidates[(offsets * offsets).sum(axis=1) <= radius * radius]
+
+    def nearest(self, points: Any, radius: float) -> Any:
+        """
+        Returns for each of an (n, 2) array of points the index of the nearest
+        entity within a distance, or -1 when there is none, as towers pick
+        their targets.
+        """
+        points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+        result = numpy.full(len(points), -1, dtype=numpy.intp)
+        if not points.size or not self.count:
+            return result
+
+        # candidates of all the points gathered at once, grouped by point
+        owners, starts, lengths = self.__ranges(points, radius)
+        owners = numpy.repeat(owners, lengths)
+        candidates = self.__order[numpy.repeat(starts, lengths) + _ranks(lengths)]
+        offsets = self.__positions[candidates] - points[owners]
+        distances = (offsets * offsets).sum(axis=1)
+        inside = distances <= radius * radius
+        candidates, owners, distances = candidates[inside], owners[inside], distances[inside]
+
+        # nearest candidate of each point, the first one found on ties as the
+        # sort is stable
+        order = numpy.lexsort((distances, owners))
+        found, firsts = numpy.unique(owners[order], return_index=True)
+        result[found] = candidates[order[firsts]]
+        return result
+
+    def __ranges(self, points: Any, radius: float) -> Tuple[Any, Any, Any]:
+        # ranges of the sorted indices in the cells overlapping the square
+        # around each point, one per point and row: point, start and length
+        first = self.__cell_coords(points - radius)
+        last = self.__cell_coords(points + radius)
+        rows = last[:, 1] - first[:, 1] + 1
+        owners = numpy.repeat(numpy.arange(len(points)), rows)
+        row_cells = (first[owners, 1] + _ranks(rows)) * self.__columns
+        starts = self.__starts[row_cells + first[owners, 0]]
+        lengths = self.__starts[row_cells + last[owners, 0] + 1] - starts
+        return owners, starts, lengths
+
+    def __cells(self, positions: Any) -> Any:
+        cells = self.__cell_coords(positions)
+        return cells[:, 1] * self.__columns + cells[:, 0]
+
+    def __cell_coords(self, positions: Any) -> Any:
+        # (column, row) of the cells of an array of positions
+        cells = numpy.floor(positions / self.__cell_size).astype(numpy.intp)
+        numpy.clip(cells[:, 0], 0, self.__columns - 1, out=cells[:, 0])
+        numpy.clip(cells[:, 1], 0, self.__rows - 1, out=cells[:, 1])
+        return cells
+
+    def __candidates(self, left: float, top: float, right: float, bottom: float) -> Any:
+        # entities of the cells overlapping the bounds, one range of the
+        # sorted indices per row
+        column0, row0 = self.__cell(left, top)
+        column1, row1 = self.__cell(right, bottom)
+        starts = self.__starts
+        ranges = [
+            self.__order[starts[row * self.__columns + column0]:starts[row * self.__columns + column1 + 1]]
+            for row in range(row0, row1 + 1)
+        ]
+        if len(ranges) == 1:
+            return ranges[0]
+        return numpy.concatenate(ranges) if ranges else self.__order[:0]
+
+    def __cell(self, x: float, y: float) -> Tuple[int, int]:
+        column = min(max(math.floor(x / self.__cell_width), 0), self.__columns - 1)
+        row = min(max(math.floor(y / self.__cell_height), 0), self.__rows - 1)
+        return column, row
+
+
+def _ranks(lengths: Any) -> Any:
+    # 0, 1, ... n - 1 for each length n, concatenated
+    total = int(lengths.sum())
+    return numpy.arange(total) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
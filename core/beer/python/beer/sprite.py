@@ -1,8 +1,10 @@
 """
 2D sprite creation and rendering module.
 """
-from typing import Sequence, Tuple, Any, cast, Optional
+from array import array
+from typing import Iterable, List, Sequence, Tuple, Any, cast, Optional
 from _beer import lib, ffi
+from beer.renderer import Drawable
 from beer.texture import Texture
 
 
@@ -21,6 +23,8 @@ class Sheet:
         self.__ptr.texture = texture.pointer
         self.__ptr.frames = self.__frames
         self.__ptr.frames_len = len(frames)
+        self.__ptr.max_width = max((frame[2] for frame in frames), default=0)
+        self.__ptr.max_height = max((frame[3] for frame in frames), default=0)
         self.__texture = texture  # keep alive
 
     @property
@@ -28,18 +32,18 @@ class Sheet:
         return self.__ptr
 
 
-class Sprite:
+class Sprite(Drawable):
     """
     2D sprite.
     """
 
     def __init__(self, sheet: Sheet) -> None:
+        super().__init__()
         self.__ptr = ffi.new('struct BeerSprite*')
         self.__ptr.x = 0.0
         self.__ptr.y = 0.0
         self.__ptr.frame = 0
         self.__ptr.sheet = sheet.pointer
-        self.__node = None
         self.__sheet = cast(Optional[Sheet], sheet)
 
     def __del__(self) -> None:
@@ -53,7 +57,7 @@ class Sprite:
 
     @x.setter
     def x(self, value: float) -> None:
-        self.__ptr.x = value
+        self.position = (value, self.__ptr.y)
 
     @property
     def y(self) -> float:
@@ -61,7 +65,25 @@ class Sprite:
 
     @y.setter
     def y(self, value: float) -> None:
-        self.__ptr.y = value
+        self.position = (self.__ptr.x, value)
+
+    @property
+    def position(self) -> Tuple[float, float]:
+        return cast(float, self.__ptr.x), cast(float, self.__ptr.y)
+
+    @position.setter
+    def position(self, pos: Tuple[float, float]) -> None:
+        # visible sprites are moved through the renderer, which keeps track of
+        # their location for culling
+        if self.node is not None:
+            if lib.beer_renderer_move_sprite_node(self.node, pos[0], pos[1]) != 0:
+                raise RuntimeError('failed to move sprite render node')
+        else:
+            self.__ptr.x, self.__ptr.y = pos
+
+    @property
+    def pointer(self) -> Any:
+        return self.__ptr
 
     @property
     def frame(self) -> int:
@@ -71,18 +93,166 @@ class Sprite:
     def frame(self, index: int) -> None:
         self.__ptr.frame = index
 
+    def _add_node(self, r_node: Any) -> int:
+        return cast(int, lib.beer_renderer_add_sprite_node(self.__ptr, r_node))
+
+
+class SpriteBatch(Drawable):
+    """
+    Fixed-size group of sprites sharing a sheet.
+
+    Positions and frames are kept in contiguous C arrays and exposed as
+    writable memoryviews, which can be wrapped without copying by NumPy
+    (`numpy.asarray(batch.positions)`) to update a whole group at once.
+    The batch is drawn by a single render node. Sprites with a negative frame
+    are hidden, which is also the initial state.
+    """
+
+    def __init__(self, sheet: Sheet, size: int) -> None:
+        if size <= 0:
+            raise ValueError('sprite batch size must be positive')
+        super().__init__()
+
+        self.__positions = ffi.new('float[]', size * 2)
+        self.__frames = ffi.new('int[]', size)
+        self.__size = size
+
+        self.__ptr = ffi.new('struct BeerSpriteBatch*')
+        self.__ptr.sheet = sheet.pointer
+        self.__ptr.positions = self.__positions
+        self.__ptr.frames = self.__frames
+        self.__ptr.len = size
+        self.__sheet = cast(Optional[Sheet], sheet)
+
+        self.frames[:] = array('i', [-1]) * size
+
+    def __del__(self) -> None:
+        self.visible = False
+        self.__ptr.sheet = ffi.NULL
+        self.__sheet = None
+
+    def __len__(self) -> int:
+        return self.__size
+
     @property
-    def visible(self) -> bool:
-        return self.__node is not None
-
-    @visible.setter
-    def visible(self, flag: bool) -> None:
-        if flag and self.__node is None:
-            node = ffi.new('struct BeerRenderNode**', ffi.NULL)
-            if lib.beer_renderer_add_sprite_node(self.__ptr, node) != 0:
-                raise RuntimeError('failed to add sprite render node')
-            self.__node = node
-        elif not flag and self.__node is not None:
-            if lib.beer_renderer_remove_node(self.__node[0]) != 0:
-                raise RuntimeError('failed to remove sprite render node')
-            self.__node = None
+    def pointer(self) -> Any:
+        return self.__ptr
+
+    @property
+    def positions(self) -> memoryview:
+        """
+        Sprite positions as a (size, 2) float32 view of (x, y) pairs.
+        """
+        return cast(memoryview, memoryview(ffi.buffer(self.__positions)).cast('f', (self.__size, 2)))
+
+    @property
+    def frames(self) -> memoryview:
+        """
+        Sprite frame indices as a (size,) int32 view.
+        """
+        return memoryview(ffi.buffer(self.__frames)).cast('i')
+
+    def _add_node(self, r_node: Any) -> int:
+        return cast(int, lib.beer_renderer_add_sprite_batch_node(self.__ptr, r_node))
+
+
+class SpritePoolStats:
+    """
+    Sprite pool counters, `peak` is the highest number of sprites in use at
+    once since the pool was created.
+    """
+
+    capacity: int
+    used: int
+    peak: int
+    acquired: int
+    released: int
+
+    def __init__(self, capacity: int, used: int, peak: int, acquired: int, released: int) -> None:
+        self.capacity = capacity
+        self.used = used
+        self.peak = peak
+        self.acquired = acquired
+        self.released = released
+
+
+class SpritePool:
+    """
+    Preallocated sprites sharing a sheet, handed out and taken back in bulk.
+
+    Sprites are slots of a sprite batch, identified by their index in it, so
+    that acquiring and releasing them neither allocates memory nor touches the
+    render list. The pool batch is drawn once made visible, released sprites
+    are hidden right away. Animations playing on a sprite must be stopped
+    before it is released.
+    """
+
+    def __init__(self, sheet: Sheet, capacity: int) -> None:
+        self.__batch = SpriteBatch(sheet, capacity)
+        self.__frames = self.__batch.frames
+        self.__in_use = bytearray(capacity)
+
+        # free sprites, popped from the end so the lowest indices go first
+        self.__free = list(range(capacity - 1, -1, -1))
+
+        self.__peak = 0
+        self.__acquired = 0
+        self.__released = 0
+
+    @property
+    def batch(self) -> SpriteBatch:
+        return self.__batch
+
+    @property
+    def capacity(self) -> int:
+        return len(self.__batch)
+
+    @property
+    def used(self) -> int:
+        return len(self.__batch) - len(self.__free)
+
+    def acquire(self, count: int, frame: int = 0) -> List[int]:
+        """
+        Takes `count` free sprites, shown with the given frame, and returns
+        their indices.
+        """
+        if count > len(self.__free):
+            raise RuntimeError(f'sprite pool cannot provide {count} more sprites')
+        if count <= 0:
+            return []
+
+        ids = self.__free[-count:]
+        ids.reverse()
+        del self.__free[-count:]
+        for index in ids:
+            self.__in_use[index] = 1
+            self.__frames[index] = frame
+
+        self.__acquired += count
+        self.__peak = max(self.__peak, self.used)
+        return ids
+
+    def release(self, ids: Iterable[int]) -> None:
+        """
+        Hides the given sprites and returns them to the pool.
+        """
+        released = sorted(set(ids), reverse=True)
+        if any(not 0 <= index < self.capacity for index in released):
+            raise IndexError('sprite index out of pool bounds')
+        for index in released:
+            if not self.__in_use[index]:
+                raise RuntimeError(f'sprite {index} is not in use')
+
+        for index in released:
+            self.__in_use[index] = 0
+            self.__frames[index] = -1
+
+        # released sprites are reused first, lowest index first
+        self.__free.extend(released)
+        self.__released += len(released)
+
+    def is_used(self, index: int) -> bool:
+        return bool(self.__in_use[index])
+
+    def get_stats(self) -> SpritePoolStats:
+        return SpritePoolStats(self.capacity, self.used, self.__peak, self.__acquired, self.__released)
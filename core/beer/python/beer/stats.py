@@ -0,0 +1,79 @@
+"""
+Core frame profiling.
+
+The core records, for each of the last `FRAMES` frames, the time spent in each
+phase of the main loop along with a few counters. The frame being run is not
+recorded yet, so during an update the last recorded frame is the previous one.
+"""
+from enum import IntEnum, unique
+from typing import Any, Dict, List
+from _beer import ffi, lib
+
+# number of frames kept by the core
+FRAMES = lib.BEER_STATS_FRAMES
+
+
+@unique
+class Phase(IntEnum):
+    """
+    Main loop phases, in the order they are run.
+    """
+
+    EVENTS = lib.BEER_STATS_PHASE_EVENTS
+    UPDATE = lib.BEER_STATS_PHASE_UPDATE
+    CLEAR = lib.BEER_STATS_PHASE_CLEAR
+    DRAW = lib.BEER_STATS_PHASE_DRAW
+    PRESENT = lib.BEER_STATS_PHASE_PRESENT
+    WAIT = lib.BEER_STATS_PHASE_WAIT
+
+
+class FrameStats:
+    """
+    Recorded frame, times are in seconds and counters are per frame.
+    """
+
+    frame: int
+    start: float
+    phases: Dict[Phase, float]
+    ticks: int
+    drawn: int
+    textures: int
+    allocations: int
+    bytes: int
+    live_bytes: int
+
+    def __init__(self, data: Any) -> None:
+        self.frame = data.frame
+        self.start = data.start / 1e6
+        self.phases = {phase: data.phases[phase] / 1e6 for phase in Phase}
+        self.ticks = data.ticks
+        self.drawn = data.drawn
+        self.textures = data.textures
+        self.allocations = data.allocations
+        self.bytes = data.bytes
+        self.live_bytes = data.live_bytes
+
+    @property
+    def duration(self) -> float:
+        return sum(self.phases.values())
+
+
+def get_frames(count: int = FRAMES) -> List[FrameStats]:
+    """
+    Retrieves the most recent recorded frames, up to `count`, oldest first.
+    """
+    count = min(count, FRAMES)
+    frames = ffi.new('struct BeerFrameStats[]', count)
+    r_count = ffi.new('unsigned*')
+    if lib.beer_stats_get_frames(frames, count, r_count) != lib.BEER_OK:
+        raise RuntimeError('failed to get frame stats')
+    return [FrameStats(frames + i) for i in range(r_count[0])]
+
+
+def write_trace(filename: str) -> None:
+    """
+    Writes the recorded frames to a Chrome trace file, which can be opened in
+    chrome://tracing or Perfetto.
+    """
+    if lib.beer_stats_write_trace(filename.encode('utf-8')) != lib.BEER_OK:
+        raise RuntimeError(f'failed to write trace to "{filename}"')
@@ -1,7 +1,11 @@
-from typing import Any, cast
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, cast
 from enum import IntEnum, unique
-from PIL import Image
+import hashlib
+import os
 from _beer import ffi, lib
+from beer import pak, pixelcache
+from beer.pixelcache import DecodedImage
 
 
 @unique
@@ -10,25 +14,74 @@ class PixelFormat(IntEnum):
     RGBA8888 = lib.BEER_PIXEL_FORMAT_RGBA8888
 
 
-class Texture:
+def decode_image(filename: str) -> DecodedImage:
+    """
+    Decodes an image file to RGBA pixels, right from the mounted archives when
+    they have it, otherwise through the pixel cache when it is enabled. May be
+    called from any thread.
+    """
+    if pak.map_mounted(filename) is not None:
+        return pixelcache.decode(pak.open_file(filename))
+    if pixelcache.CACHE is not None:
+        return pixelcache.CACHE.get(filename)
+    return pixelcache.decode(filename)
 
-    def __init__(self, filename: str) -> None:
-        self.__tex = ffi.new('struct BeerTexture**', ffi.NULL)
 
-        img = Image.open(filename).convert('RGBA')
+class _TextureData:
+    """
+    Owner of a core texture, which is freed along with it.
+    """
+
+    def __init__(self, width: int, height: int, pixels: Any, name: str) -> None:
+        self.ptr = ffi.new('struct BeerTexture**', ffi.NULL)
 
         err = lib.beer_texture_from_buffer(
             PixelFormat.RGBA8888,
-            img.width,
-            img.height,
-            ffi.from_buffer(img.tobytes()),
-            self.__tex
+            width,
+            height,
+            ffi.from_buffer(pixels),
+            self.ptr
         )
         if err:
-            raise RuntimeError('failed to create texture from "{}"'.format(filename))
+            raise RuntimeError('failed to create texture from "{}"'.format(name))
+
+        self.size = width * height * 4
 
     def __del__(self) -> None:
-        lib.beer_texture_free(self.pointer)
+        lib.beer_texture_free(self.ptr[0])
+
+
+class Texture:
+
+    def __init__(self, filename: str) -> None:
+        width, height, pixels = decode_image(filename)
+        self.__data = _TextureData(width, height, pixels, filename)
+        self.__release: Optional[Callable[[], None]] = None
+
+    @classmethod
+    def from_pixels(cls, width: int, height: int, pixels: Any, name: str = '<pixels>') -> 'Texture':
+        """
+        Creates a texture from a buffer of RGBA pixels.
+        """
+        texture = cls.__new__(cls)
+        texture.__data = _TextureData(width, height, pixels, name)
+        texture.__release = None
+        return texture
+
+    @classmethod
+    def _shared(cls, data: _TextureData, release: Callable[[], None]) -> 'Texture':
+        """
+        Creates a texture sharing the given data, `release` is called when the
+        texture is deleted.
+        """
+        texture = cls.__new__(cls)
+        texture.__data = data
+        texture.__release = release
+        return texture
+
+    def __del__(self) -> None:
+        if self.__release is not None:
+            self.__release()
 
     @property
     def width(self) -> int:
@@ -44,4 +97,152 @@ class Texture:
 
     @property
     def pointer(self) -> Any:
-        return self.__tex[0]
+        return self.__data.ptr[0]
+
+
+class TextureCacheStats:
+    """
+    Texture cache counters.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    textures: int
+    bytes_resident: int
+
+    def __init__(self, hits: int, misses: int, evictions: int, textures: int, bytes_resident: int) -> None:
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self.textures = textures
+        self.bytes_resident = bytes_resident
+
+
+class _CacheEntry:
+
+    def __init__(self, data: _TextureData) -> None:
+        self.data = data
+        self.refs = 0
+
+
+class TextureCache:
+    """
+    Cache of textures loaded from image files.
+
+    Textures are identified by the hash of the file contents, so a file is
+    decoded and uploaded once no matter how many times and through which path
+    it is loaded. Cached textures are reference counted: once the last texture
+    handed out for an image is deleted, its memory is either freed right away
+    or, when a byte budget is set, retained for reuse until it is the least
+    recently used one and the resident size exceeds the budget.
+    """
+
+    def __init__(self, budget: int = 0) -> None:
+        self.__entries: Dict[str, _CacheEntry] = {}
+        self.__unused: 'OrderedDict[str, _CacheEntry]' = OrderedDict()
+        self.__digests: Dict[str, Tuple[int, int, str]] = {}
+        self.__budget = budget
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__bytes_resident = 0
+
+    @property
+    def budget(self) -> int:
+        """
+        Maximum size in bytes of the resident textures, above which unused
+        textures are evicted.
+        """
+        return self.__budget
+
+    @budget.setter
+    def budget(self, value: int) -> None:
+        self.__budget = value
+        self.__evict()
+
+    def load(self, filename: str, decoded: Optional[DecodedImage] = None) -> Texture:
+        """
+        Returns a texture for the given image file, loading it if needed.
+
+        The file is decoded unless its pixels are given already.
+        """
+        key = self.key(filename)
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.__misses += 1
+            width, height, pixels = decoded if decoded is not None else decode_image(filename)
+            entry = _CacheEntry(_TextureData(width, height, pixels, filename))
+            self.__entries[key] = entry
+            self.__bytes_resident += entry.data.size
+        else:
+            self.__hits += 1
+            self.__unused.pop(key, None)
+
+        entry.refs += 1
+        return Texture._shared(entry.data, lambda: self.__release(key))  # pylint: disable=protected-access
+
+    def clear(self) -> None:
+        """
+        Frees all the unused textures.
+        """
+        while self.__unused:
+            self.__evict_one()
+
+    def get_stats(self) -> TextureCacheStats:
+        return TextureCacheStats(
+            self.__hits,
+            self.__misses,
+            self.__evictions,
+            len(self.__entries),
+            self.__bytes_resident)
+
+    def key(self, filename: str) -> str:
+        """
+        Returns the key of an image file in the cache, may be called from any
+        thread.
+        """
+        # mounted archives do not change until shutdown
+        data = pak.map_mounted(filename)
+        if data is not None:
+            return hashlib.sha1(data).hexdigest()
+
+        # file contents are hashed again only when their size or modification
+        # time change
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        cached = self.__digests.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        with open(path, 'rb') as file_handle:
+            digest = hashlib.sha1(file_handle.read()).hexdigest()
+        self.__digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def __release(self, key: str) -> None:
+        entry = self.__entries[key]
+        entry.refs -= 1
+        if entry.refs == 0:
+            self.__unused[key] = entry
+            self.__evict()
+
+    def __evict(self) -> None:
+        while self.__unused and self.__bytes_resident > self.__budget:
+            self.__evict_one()
+
+    def __evict_one(self) -> None:
+        key, entry = self.__unused.popitem(last=False)
+        del self.__entries[key]
+        self.__bytes_resident -= entry.data.size
+        self.__evictions += 1
+
+
+CACHE = TextureCache()
+
+
+def load_texture(filename: str) -> Texture:
+    """
+    Loads a texture through the process-wide cache.
+    """
+    return CACHE.load(filename)
@@ -0,0 +1,103 @@
+"""
+Static tile layers, baked into cached chunk textures.
+"""
+from typing import Any, Optional, cast
+from _beer import ffi, lib
+from beer.renderer import Drawable
+from beer.sprite import Sheet
+
+
+class TileLayer(Drawable):
+    """
+    Grid of tiles drawn from a sheet.
+
+    The layer is rendered into a few chunk textures which are drawn with one
+    copy each per frame; chunks are rebuilt only after their tiles change.
+    Tiles set through `set_tile()` invalidate their chunk automatically, when
+    writing the `tiles` view directly call `invalidate()` afterwards.
+    """
+
+    def __init__(self, sheet: Sheet, width: int, height: int, tile_width: int, tile_height: int) -> None:
+        super().__init__()
+        self.__ptr = ffi.new('struct BeerTileLayer**', ffi.NULL)
+        err = lib.beer_tile_layer_new(sheet.pointer, width, height, tile_width, tile_height, self.__ptr)
+        if err:
+            raise RuntimeError('failed to create tile layer')
+        self.__sheet = cast(Optional[Sheet], sheet)  # keep alive
+
+    def __del__(self) -> None:
+        self.visible = False
+        lib.beer_tile_layer_free(self.pointer)
+        self.__sheet = None
+
+    @property
+    def pointer(self) -> Any:
+        return self.__ptr[0]
+
+    @property
+    def width(self) -> int:
+        return cast(int, self.pointer.width)
+
+    @property
+    def height(self) -> int:
+        return cast(int, self.pointer.height)
+
+    @property
+    def x(self) -> float:
+        return cast(float, self.pointer.x)
+
+    @x.setter
+    def x(self, value: float) -> None:
+        self.pointer.x = value
+
+    @property
+    def y(self) -> float:
+        return cast(float, self.pointer.y)
+
+    @y.setter
+    def y(self, value: float) -> None:
+        self.pointer.y = value
+
+    @property
+    def tiles(self) -> memoryview:
+        """
+        Tile frames as a (height, width) int32 view, -1 marks empty tiles.
+        """
+        size = self.width * self.height * ffi.sizeof('int')
+        return memoryview(ffi.buffer(self.pointer.tiles, size)).cast('i', (self.height, self.width))
+
+    def set_tiles(self, tiles: Any) -> None:
+        """
+        Replaces all the tiles with the given buffer of width * height int32
+        frames, row by row.
+        """
+        size = self.width * self.height * ffi.sizeof('int')
+        buffer = ffi.from_buffer(tiles)
+        if len(buffer) != size:
+            raise ValueError(f'expected {size} bytes of tiles, got {len(buffer)}')
+        ffi.memmove(self.pointer.tiles, buffer, size)
+        self.invalidate()
+
+    def get_tile(self, x: int, y: int) -> int:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError(f'tile ({x}, {y}) out of layer bounds')
+        return cast(int, self.pointer.tiles[y * self.width + x])
+
+    def set_tile(self, x: int, y: int, frame: int) -> None:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError(f'tile ({x}, {y}) out of layer bounds')
+        self.pointer.tiles[y * self.width + x] = frame
+        self.invalidate(x, y, 1, 1)
+
+    def invalidate(self, x: int = 0, y: int = 0, width: Optional[int] = None, height: Optional[int] = None) -> None:
+        """
+        Marks the chunks covering the given tiles area for rebuild, by
+        default the whole layer.
+        """
+        width = self.width if width is None else width
+        height = self.height if height is None else height
+        if lib.beer_tile_layer_invalidate(self.pointer, x, y, width, height) != lib.BEER_OK:
+            raise RuntimeError('failed to invalidate tile layer')
+
+    def _add_node(self, r_node: Any) -> int:
+        return cast(int, lib.beer_renderer_add_tile_layer_node(self.pointer, r_node))
@@ -0,0 +1,252 @@
+"""
+Compiled tile maps.
+
+Tiled maps are compiled once into a binary file, which is then memory mapped
+on later loads, or read in place from the mounted archives. Tiles are stored
+as packed int32 frame planes, one per layer and sheet, ready to be copied into
+tile layers.
+
+File layout, in native byte order:
+
+    magic, version, header length   8s I I
+    header                          JSON, padded to a multiple of 4 bytes
+    frames and tile planes          int32 arrays, at the header offsets
+"""
+from typing import Any, Dict, List, Optional, Tuple, cast
+from array import array
+import json
+import os
+import struct
+import sys
+from beer import pak
+
+Rect = Tuple[int, int, int, int]
+
+MAGIC = b'BEERMAP\0'
+VERSION = 1
+
+_PREAMBLE = struct.Struct('8sII')
+
+# pytmx bookkeeping entries, left out of the compiled tile properties
+_TILE_INTERNALS = {'frames', 'id', 'width', 'height'}
+
+
+class MapLayer:
+    """
+    Map layer, with its tile frames split by sheet.
+    """
+
+    name: str
+    properties: Dict[str, Any]
+    planes: Dict[int, memoryview]
+
+    def __init__(self, name: str, properties: Dict[str, Any], planes: Dict[int, memoryview]) -> None:
+        self.name = name
+        self.properties = properties
+        self.planes = planes
+
+
+class TileMap:
+    """
+    Compiled tile map.
+
+    Each layer holds a (height, width) int32 plane for each sheet it uses,
+    with the sheet frame index of each tile and -1 for tiles from other sheets
+    or no tile at all.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.__buffer = pak.read(filename)
+
+        header, data_offset = _read_header(self.__buffer)
+        data = self.__buffer[data_offset:]
+
+        self.width: int = header['width']
+        self.height: int = header['height']
+        self.tile_width: int = header['tile_width']
+        self.tile_height: int = header['tile_height']
+        self.properties: Dict[str, Any] = header['properties']
+
+        self.sheets: List[str] = []
+        self.frames: List[List[Rect]] = []
+        for sheet in header['sheets']:
+            rects = data[sheet['offset']:sheet['offset'] + sheet['frames'] * 16].cast('i')
+            self.sheets.append(sheet['filename'])
+            self.frames.append([_rect(rects[i:i + 4]) for i in range(0, len(rects), 4)])
+
+        plane_size = self.width * self.height * 4
+        self.layers: List[MapLayer] = [
+            MapLayer(layer['name'], layer['properties'], {
+                int(sheet): data[offset:offset + plane_size].cast('i', (self.height, self.width))
+                for sheet, offset in layer['planes'].items()
+            })
+            for layer in header['layers']
+        ]
+
+        self.__tile_properties: Dict[Tuple[int, int], Dict[str, Any]] = {
+            (sheet, frame): properties for sheet, frame, properties in header['tile_properties']
+        }
+
+    def get_tile_properties(self, sheet: int, frame: int) -> Dict[str, Any]:
+        return self.__tile_properties.get((sheet, frame), {})
+
+
+def compile_map(tmx_filename: str, filename: str) -> None:
+    """
+    Compiles a Tiled map into the given file.
+    """
+    import pytmx  # pylint: disable=import-outside-toplevel
+
+    tiled_map = pytmx.TiledMap(tmx_filename)
+    sheets, gid_tiles = _frame_tables(tiled_map.images)
+
+    chunks: List[bytes] = []
+
+    def append(values: 'array[int]') -> int:
+        offset = sum(len(chunk) for chunk in chunks)
+        chunks.append(values.tobytes())
+        return offset
+
+    header_sheets = [
+        {
+            'filename': sheet_filename,
+            'frames': len(frames),
+            'offset': append(array('i', (value for rect in frames for value in rect))),
+        }
+        for sheet_filename, frames in sheets.items()
+    ]
+
+    header_layers = [
+        {
+            'name': layer.name,
+            'properties': dict(layer.properties),
+            'planes': {
+                str(sheet): append(plane)
+                for sheet, plane in _tile_planes(layer.data, gid_tiles, tiled_map.width).items()
+            },
+        }
+        for layer in tiled_map.layers if isinstance(layer, pytmx.TiledTileLayer)
+    ]
+
+    tile_properties = []
+    for gid, properties in tiled_map.tile_properties.items():
+        tile = gid_tiles[gid] if gid < len(gid_tiles) else None
+        properties = {key: value for key, value in properties.items() if key not in _TILE_INTERNALS}
+        if tile is not None and properties:
+            tile_properties.append([tile[0], tile[1], properties])
+
+    header = json.dumps({
+        'sources': _sources(tmx_filename),
+        'byteorder': sys.byteorder,
+        'width': tiled_map.width,
+        'height': tiled_map.height,
+        'tile_width': tiled_map.tilewidth,
+        'tile_height': tiled_map.tileheight,
+        'properties': dict(tiled_map.properties),
+        'sheets': header_sheets,
+        'layers': header_layers,
+        'tile_properties': tile_properties,
+    }).encode('utf-8')
+    header += b' ' * (-len(header) % 4)
+
+    # written aside and moved in place, so that a broken file is never loaded
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    with open(filename + '.tmp', 'wb') as file_handle:
+        file_handle.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        file_handle.write(header)
+        for chunk in chunks:
+            file_handle.write(chunk)
+    os.replace(filename + '.tmp', filename)
+
+
+def load_map(tmx_filename: str, filename: str) -> TileMap:
+    """
+    Loads a compiled Tiled map, compiling it first when the file is missing or
+    out of date with the map or its tilesets. Compiled maps of the mounted
+    archives are loaded as they are.
+    """
+    if pak.map_mounted(filename) is None and not _is_up_to_date(tmx_filename, filename):
+        compile_map(tmx_filename, filename)
+    return TileMap(filename)
+
+
+def _frame_tables(images: List[Any]) -> Tuple[Dict[str, Dict[Rect, int]], List[Optional[Tuple[int, int]]]]:
+    # frames of each sheet, and the sheet and frame of each map tile by gid
+    sheets: Dict[str, Dict[Rect, int]] = {}
+    sheet_indices: Dict[str, int] = {}
+    gid_tiles: List[Optional[Tuple[int, int]]] = []
+    for spec in images:
+        if spec is None:
+            gid_tiles.append(None)
+            continue
+        sheet_filename, rect = spec[0], _rect(spec[1])
+        sheet = sheet_indices.setdefault(sheet_filename, len(sheet_indices))
+        frames = sheets.setdefault(sheet_filename, {})
+        gid_tiles.append((sheet, frames.setdefault(rect, len(frames))))
+    return sheets, gid_tiles
+
+
+def _tile_planes(
+        data: List[List[int]],
+        gid_tiles: List[Optional[Tuple[int, int]]],
+        width: int) -> Dict[int, 'array[int]']:
+    # one plane of frames for each sheet used by a layer
+    planes: Dict[int, 'array[int]'] = {}
+    for y, row in enumerate(data):
+        for x, gid in enumerate(row):
+            tile = gid_tiles[gid] if gid else None
+            if tile is None:
+                continue
+            sheet, frame = tile
+            plane = planes.get(sheet)
+            if plane is None:
+                plane = planes[sheet] = array('i', [-1]) * (width * len(data))
+            plane[y * width + x] = frame
+    return planes
+
+
+def _rect(values: Any) -> Rect:
+    return values[0], values[1], values[2], values[3]
+
+
+def _read_header(data: Any) -> Tuple[Dict[str, Any], int]:
+    magic, version, header_len = _PREAMBLE.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a compiled map')
+    header = json.loads(bytes(data[_PREAMBLE.size:_PREAMBLE.size + header_len]).decode('utf-8'))
+    return header, _PREAMBLE.size + header_len
+
+
+def _sources(tmx_filename: str) -> List[Any]:
+    # the map and its external tilesets, with their modification times
+    from xml.etree import ElementTree  # pylint: disable=import-outside-toplevel
+
+    directory = os.path.dirname(tmx_filename)
+    paths = [tmx_filename] + [
+        os.path.join(directory, tileset.attrib['source'])
+        for tileset in ElementTree.parse(tmx_filename).getroot().iter('tileset')
+        if 'source' in tileset.attrib
+    ]
+    sources = []
+    for path in paths:
+        stat = os.stat(path)
+        sources.append([os.path.abspath(path), stat.st_mtime_ns, stat.st_size])
+    return sources
+
+
+def _is_up_to_date(tmx_filename: str, filename: str) -> bool:
+    try:
+        with open(filename, 'rb') as file_handle:
+            preamble = file_handle.read(_PREAMBLE.size)
+            _, _, header_len = _PREAMBLE.unpack(preamble)
+            header, _ = _read_header(preamble + file_handle.read(header_len))
+        if header['byteorder'] != sys.byteorder:
+            return False
+        for path, mtime, size in header['sources']:
+            stat = os.stat(path)
+            if (stat.st_mtime_ns, stat.st_size) != (mtime, size):
+                return False
+    except (OSError, ValueError, KeyError, struct.error):
+        return False
+
+    return cast(bool, header['sources'][0][0] == os.path.abspath(tmx_filename))
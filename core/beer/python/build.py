@@ -48,6 +48,9 @@ struct BeerSpriteSheet
     // frameset
     struct BeerRect *frames;
     unsigned int frames_len;
+
+    // size of the largest frame, bounds the sprites drawn with the sheet
+    unsigned max_width, max_height;
 };
 
 struct BeerSprite
@@ -62,8 +65,87 @@ struct BeerSprite
     struct BeerSpriteSheet *sheet;
 };
 
+struct BeerSpriteBatch
+{
+    // sheet shared by all sprites in the batch
+    struct BeerSpriteSheet *sheet;
+
+    // sprite positions, as consecutive (x, y) pairs
+    float *positions;
+
+    // current frames, a negative frame hides the sprite
+    int *frames;
+
+    // number of sprites
+    unsigned len;
+};
+
+struct BeerAnimation;
+
+struct BeerAnimationClip
+{
+    // sheet frames shown in turn
+    int *frames;
+
+    // time each frame is shown for, in seconds, all of them positive
+    float *durations;
+
+    // number of frames
+    unsigned len;
+
+    // whether the clip starts over after its last frame, instead of finishing
+    bool loop;
+};
+
+struct BeerTileLayer
+{
+    // tiles sheet
+    struct BeerSpriteSheet *sheet;
+
+    // layer size in tiles
+    unsigned width, height;
+
+    // tile size in pixels
+    unsigned tile_width, tile_height;
+
+    // layer position in pixels
+    float x, y;
+
+    // tile frames, row by row, negative values mark empty tiles
+    int *tiles;
+
+    // private
+    void *data_;
+};
+
 struct BeerRenderNode;
 
+struct BeerRendererStats
+{
+    // number of node slots currently allocated
+    unsigned capacity;
+
+    // number of nodes in use
+    unsigned nodes;
+
+    // number of draws issued and skipped as out of view in the last frame
+    unsigned drawn;
+    unsigned culled;
+
+    // number of times consecutive draws used different textures in the
+    // last frame
+    unsigned texture_switches;
+};
+
+struct BeerCamera
+{
+    // world position shown at the top-left corner of the window
+    float x, y;
+
+    // scale factor, 1 for no zoom
+    float zoom;
+};
+
 beer_err
 beer_texture_from_buffer(enum BeerPixelFormat fmt, int width, int height, char *data, struct BeerTexture **r_tex);
 
@@ -73,9 +155,71 @@ beer_texture_free(struct BeerTexture *tex);
 beer_err
 beer_renderer_add_sprite_node(struct BeerSprite *sprite, struct BeerRenderNode **r_node);
 
+beer_err
+beer_tile_layer_new(
+    struct BeerSpriteSheet *sheet,
+    unsigned width,
+    unsigned height,
+    unsigned tile_width,
+    unsigned tile_height,
+    struct BeerTileLayer **r_layer
+);
+
+void
+beer_tile_layer_free(struct BeerTileLayer *layer);
+
+beer_err
+beer_tile_layer_invalidate(struct BeerTileLayer *layer, unsigned x, unsigned y, unsigned w, unsigned h);
+
+beer_err
+beer_renderer_add_sprite_batch_node(struct BeerSpriteBatch *batch, struct BeerRenderNode **r_node);
+
+beer_err
+beer_renderer_add_tile_layer_node(struct BeerTileLayer *layer, struct BeerRenderNode **r_node);
+
 beer_err
 beer_renderer_remove_node(struct BeerRenderNode *node);
 
+beer_err
+beer_renderer_set_node_layer(struct BeerRenderNode *node, int layer);
+
+beer_err
+beer_renderer_get_node_layer(struct BeerRenderNode *node, int *r_layer);
+
+beer_err
+beer_renderer_move_sprite_node(struct BeerRenderNode *node, float x, float y);
+
+beer_err
+beer_renderer_set_camera(const struct BeerCamera *camera);
+
+beer_err
+beer_renderer_get_camera(struct BeerCamera *r_camera);
+
+beer_err
+beer_renderer_get_stats(struct BeerRendererStats *r_stats);
+
+beer_err
+beer_animation_play_sprite(
+    struct BeerSprite *sprite,
+    const struct BeerAnimationClip *clip,
+    struct BeerAnimation **r_anim
+);
+
+beer_err
+beer_animation_play_batch(
+    struct BeerSpriteBatch *batch,
+    const unsigned *indices,
+    unsigned len,
+    const struct BeerAnimationClip *clip,
+    struct BeerAnimation **r_anims
+);
+
+beer_err
+beer_animation_stop(struct BeerAnimation *const *anims, unsigned len);
+
+beer_err
+beer_animation_poll_finished(struct BeerAnimation **r_anims, unsigned len, unsigned *r_count);
+
 enum BeerKeyCode
 {
     BEER_KEY_UNKNOWN,
@@ -93,8 +237,125 @@ struct BeerKeyState
     bool pressed;
 };
 
+struct BeerKeyEvent
+{
+    enum BeerKeyCode key;
+    bool pressed;
+    unsigned timestamp;
+};
+
 beer_err
 beer_key_get_state(enum BeerKeyCode key, struct BeerKeyState *r_state);
+
+beer_err
+beer_key_get_states(struct BeerKeyState *r_states);
+
+beer_err
+beer_key_push_event(enum BeerKeyCode key, bool pressed);
+
+beer_err
+beer_key_poll_events(struct BeerKeyEvent *r_events, unsigned len, unsigned *r_count);
+
+struct BeerMemoryStats
+{
+    size_t allocations;
+    size_t bytes;
+    size_t live_allocations;
+    size_t live_bytes;
+    size_t peak_bytes;
+    size_t frame_allocations;
+    size_t arena_bytes;
+    size_t arena_peak;
+    size_t arena_capacity;
+};
+
+struct BeerPoolStats
+{
+    const char *name;
+    size_t item_size;
+    unsigned capacity;
+    unsigned used;
+    unsigned peak;
+};
+
+beer_err
+beer_memory_get_stats(struct BeerMemoryStats *r_stats);
+
+beer_err
+beer_memory_get_pool_stats(struct BeerPoolStats *r_stats, unsigned len, unsigned *r_count);
+
+#define BEER_STATS_FRAMES ...
+
+enum BeerStatsPhase
+{
+    BEER_STATS_PHASE_EVENTS,
+    BEER_STATS_PHASE_UPDATE,
+    BEER_STATS_PHASE_CLEAR,
+    BEER_STATS_PHASE_DRAW,
+    BEER_STATS_PHASE_PRESENT,
+    BEER_STATS_PHASE_WAIT,
+    BEER_STATS_PHASE_MAX,
+};
+
+struct BeerFrameStats
+{
+    unsigned frame;
+    double start;
+    double phases[...];
+    unsigned ticks;
+    unsigned drawn;
+    unsigned textures;
+    size_t allocations;
+    size_t bytes;
+    size_t live_bytes;
+};
+
+beer_err
+beer_stats_get_frames(struct BeerFrameStats *r_frames, unsigned len, unsigned *r_count);
+
+beer_err
+beer_stats_write_trace(const char *filename);
+
+struct BeerPak;
+
+enum BeerPakCompression
+{
+    BEER_PAK_COMPRESSION_NONE,
+    BEER_PAK_COMPRESSION_LZ4,
+    BEER_PAK_COMPRESSION_MAX,
+};
+
+struct BeerPakEntry
+{
+    const char *name;
+    size_t size;
+    size_t stored_size;
+    enum BeerPakCompression compression;
+};
+
+beer_err
+beer_pak_open(const char *path, struct BeerPak **r_pak);
+
+void
+beer_pak_close(struct BeerPak *pak);
+
+unsigned
+beer_pak_len(const struct BeerPak *pak);
+
+beer_err
+beer_pak_get_entry(const struct BeerPak *pak, unsigned index, struct BeerPakEntry *r_entry);
+
+beer_err
+beer_pak_find(const struct BeerPak *pak, const char *name, unsigned *r_index);
+
+beer_err
+beer_pak_read(struct BeerPak *pak, unsigned index, const char **r_data, size_t *r_size);
+
+beer_err
+beer_fs_mount(const char *path);
+
+beer_err
+beer_file_map(const char *path, const char **r_data, size_t *r_size);
 """)
 
 
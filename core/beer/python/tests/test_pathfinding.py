@@ -0,0 +1,70 @@
+"""
+Flow field pathfinding tests.
+"""
+from typing import List, Tuple
+import random
+import unittest
+import numpy
+from beer.pathfinding import UNREACHABLE, FlowField, PathFinder
+
+
+class FlowFieldUpdateTest(unittest.TestCase):
+    """
+    Fields repaired after blocking and unblocking tiles match fields computed
+    from scratch on the resulting grid.
+    """
+
+    WIDTH = 24
+    HEIGHT = 16
+
+    def assert_repaired(self, finder: PathFinder, field: FlowField) -> None:
+        fresh = FlowField(finder.walkable, field.goals)
+        numpy.testing.assert_array_equal(field.distances, fresh.distances)
+        numpy.testing.assert_array_equal(field.directions, fresh.directions)
+
+    def test_block_unblock(self) -> None:
+        rng = random.Random(7)
+        walkable = numpy.array([
+            [rng.random() > 0.2 for _ in range(self.WIDTH)]
+            for _ in range(self.HEIGHT)
+        ])
+        goals = [(0, 0), (self.WIDTH - 1, self.HEIGHT - 1)]
+        walkable[0, 0] = walkable[self.HEIGHT - 1, self.WIDTH - 1] = True
+
+        finder = PathFinder(walkable)
+        field = finder.field(goals)
+        blocked: List[Tuple[int, int]] = []
+        for _ in range(40):
+            if blocked and rng.random() < 0.4:
+                tiles = rng.sample(blocked, min(len(blocked), rng.randint(1, 3)))
+                blocked = [tile for tile in blocked if tile not in tiles]
+                finder.unblock(tiles)
+            else:
+                tiles = [
+                    (rng.randrange(self.WIDTH), rng.randrange(self.HEIGHT))
+                    for _ in range(rng.randint(1, 4))
+                ]
+                blocked.extend(tile for tile in tiles if tile not in blocked)
+                finder.block(tiles)
+            self.assert_repaired(finder, field)
+
+    def test_wall_across(self) -> None:
+        # a full wall cuts the goal off, opening a gap reconnects the far side
+        finder = PathFinder(numpy.ones((self.HEIGHT, self.WIDTH), dtype=bool))
+        field = finder.field([(0, 0)])
+        wall = [(self.WIDTH // 2, y) for y in range(self.HEIGHT)]
+
+        finder.block(wall)
+        self.assert_repaired(finder, field)
+        self.assertEqual(field.distances[0, self.WIDTH - 1], UNREACHABLE)
+
+        finder.unblock(wall[-1:])
+        self.assert_repaired(finder, field)
+        self.assertNotEqual(field.distances[0, self.WIDTH - 1], UNREACHABLE)
+
+        finder.unblock(wall[:1])
+        self.assert_repaired(finder, field)
+
+
+if __name__ == '__main__':
+    unittest.main()
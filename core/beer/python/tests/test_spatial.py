@@ -0,0 +1,45 @@
+"""
+Spatial grid tests.
+"""
+import unittest
+import numpy
+from beer.spatial import SpatialGrid
+
+
+class NearestTest(unittest.TestCase):
+    """
+    Nearest entities found for many points at once match a brute force search.
+    """
+
+    def test_random(self) -> None:
+        rng = numpy.random.RandomState(3)  # pylint: disable=no-member
+        for _ in range(50):
+            grid = SpatialGrid(12, 9, 16, 16)
+            # entities beyond the bounds too, on a coarse lattice for ties
+            positions = numpy.round(rng.uniform(-32, 224, (200, 2)) / 4) * 4
+            mask = rng.rand(len(positions)) > 0.25
+            points = rng.uniform(-32, 224, (30, 2))
+            radius = rng.uniform(0, 48)
+            grid.update(positions, mask)
+
+            nearest = grid.nearest(points, radius)
+            for point, index in zip(points, nearest):
+                offsets = positions - point
+                distances = (offsets * offsets).sum(axis=1)
+                distances[~mask] = numpy.inf
+                if distances.min() > radius * radius:
+                    self.assertEqual(index, -1)
+                else:
+                    self.assertNotEqual(index, -1)
+                    self.assertEqual(distances[index], distances.min())
+
+    def test_empty(self) -> None:
+        grid = SpatialGrid(4, 4, 8, 8)
+        self.assertEqual(grid.nearest([(1, 1)], 10).tolist(), [-1])
+        grid.update([(2, 2)])
+        self.assertEqual(grid.nearest(numpy.zeros((0, 2)), 10).tolist(), [])
+        self.assertEqual(grid.nearest([(1, 1), (30, 30)], 4).tolist(), [0, -1])
+
+
+if __name__ == '__main__':
+    unittest.main()
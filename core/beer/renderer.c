@@ -1,138 +1,1350 @@
 #include "renderer.h"
+#include "memory.h"
 #include "primitives.h"
 #include "texture.h"
+#include "tilelayer.h"
 #include "sprite.h"
+#include "stats.h"
 #include <assert.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <string.h>
 #include <SDL.h>
 
-#define RENDER_LIST_LEN 2048
+// nodes are allocated from a pool, so that their addresses stay valid while
+// the render list grows
+#define NODE_PAGE_LEN 256
+#define GROUP_PAGE_LEN 16
+
+// spatial grid cell size in world pixels and number of hash buckets the cells
+// are mapped to (must be a power of two)
+#define GRID_CELL_SIZE 128
+#define GRID_BUCKETS 1024
 
 extern SDL_Renderer *g_renderer;
 
+extern beer_err
+beer_tile_layer_render(struct BeerTileLayer *layer, float x, float y, bool bake, unsigned *r_culled);
+
+extern void
+beer_stats_mark(enum BeerStatsPhase phase);
+
+extern void
+beer_texture_destroy(struct BeerTexture *tex);
+
 enum NodeType
 {
 	NODE_TYPE_NONE,
 	NODE_TYPE_SPRITE,
+	NODE_TYPE_SPRITE_BATCH,
+	NODE_TYPE_TILE_LAYER,
+};
+
+// nodes drawing from the same texture on the same layer
+struct DrawGroup
+{
+	int layer;
+	struct BeerTexture *texture;
+
+	// number of nodes in the group
+	unsigned len;
+
+	// spatial hash of the group sprite nodes, each bucket ordered by
+	// decreasing sequence number
+	struct BeerRenderNode *grid[GRID_BUCKETS];
+	unsigned grid_len;
+
+	// largest frame size of the sheets of the sprite nodes, and number of
+	// nodes with a sheet of that size; the view query is extended by it since
+	// sprites are indexed by their top-left corner only
+	unsigned max_w, max_h;
+	unsigned max_w_len, max_h_len;
+
+	// nodes which do their own culling (sprite batches, tile layers), in the
+	// same order
+	struct BeerRenderNode *unindexed;
+
+	// links in the groups list, ordered by layer and then by creation
+	struct DrawGroup *prev, *next;
 };
 
 struct BeerRenderNode
 {
 	enum NodeType type;
 	void *data;
+
+	// insertion sequence number, orders the nodes within their group
+	uint64_t seq;
+
+	// links in the live nodes list; free nodes are chained through `next`
+	struct BeerRenderNode *prev, *next;
+
+	struct DrawGroup *group;
+
+	// spatial grid cell of sprite nodes
+	int cell_x, cell_y;
+
+	// links in the grid bucket list of sprite nodes, or in the list of
+	// non-indexed nodes of the group for the other types
+	struct BeerRenderNode *cell_prev, *cell_next;
+
+	// positions at the start of the last simulation tick, drawn blended
+	// with the current ones; not set for nodes added during the tick
+	bool has_prev;
+	float prev_x, prev_y;
+	float *prev_positions;
+	unsigned prev_positions_len;
+};
+
+// sprite or tile layer copied from the nodes when committing a render state
+struct DrawItem
+{
+	// tile layer to draw, NULL for a sprite
+	struct BeerTileLayer *layer;
+
+	// sprite texture and frame, textures freed since the commit are kept
+	// until no state refers to them
+	struct BeerTexture *texture;
+	struct BeerRect rect;
+
+	// positions at the start and at the end of the last tick
+	float prev_x, prev_y;
+	float x, y;
+};
+
+// Render state committed by the simulation thread when pipelined, drawn by the
+// main thread without touching the nodes.
+struct RenderState
+{
+	struct DrawItem *items;
+	unsigned len, capacity;
+
+	struct BeerCamera camera;
+
+	// number of ticks run since the previous state was committed, carried
+	// over by the states replaced before being drawn
+	unsigned ticks;
+
+	// commit time, in performance counter units
+	Uint64 time;
+
+	// number of the commit, counted from 1
+	Uint64 commit;
+};
+
+// texture freed while committed render states may still draw it, and the
+// number of commits started when it was freed
+struct PendingTexture
+{
+	struct BeerTexture *texture;
+	Uint64 commit;
 };
 
-static struct BeerRenderNode render_list[RENDER_LIST_LEN] = {{NODE_TYPE_NONE, NULL}};
+static struct BeerPool node_pool = BEER_POOL("render nodes", struct BeerRenderNode, NODE_PAGE_LEN);
+static struct BeerPool group_pool = BEER_POOL("draw groups", struct DrawGroup, GROUP_PAGE_LEN);
+
+static struct BeerRenderNode *live_head = NULL;
+static struct BeerRenderNode *live_tail = NULL;
+static unsigned live_len = 0;
+static uint64_t next_seq = 0;
+
+static struct DrawGroup *groups = NULL;
+
+static struct BeerCamera camera = {.x = 0, .y = 0, .zoom = 1};
+
+// visible world area of the current frame, and its scale factor
+static struct
+{
+	float x, y, w, h;
+	float zoom;
+} view;
+
+static struct BeerRendererStats frame_stats;
+
+// draw stats of the last frame presented, read from the simulation thread
+static struct BeerRendererStats drawn_stats;
+
+// texture used by the last copy, to count texture switches
+static SDL_Texture *last_texture = NULL;
+
+// blend factor between the previous and the current positions
+static float alpha = 1;
+
+// render state being committed, last state committed and not drawn yet, and
+// state last drawn; only the middle one changes hands between threads
+static struct RenderState states[3];
+static struct RenderState *back = &states[0];
+static struct RenderState *ready = &states[1];
+static struct RenderState *front = &states[2];
+static bool ready_committed = false;
+
+// guards the ready state, the commits count and the published draw stats
+static SDL_SpinLock state_lock = 0;
+
+// number of commits started, and textures freed waiting for the states which
+// may draw them to be replaced
+static Uint64 commits = 0;
+static struct PendingTexture *pending = NULL;
+static unsigned pending_len = 0, pending_capacity = 0;
 
 static beer_err
 alloc_node(struct BeerRenderNode **r_node)
 {
-	for (unsigned long i = 0; i < RENDER_LIST_LEN; i++)
+	struct BeerRenderNode *node = NULL;
+	beer_err err = beer_pool_new(&node_pool, &node);
+	if (err)
+	{
+		return err;
+	}
+
+	// append to the live list, keeping nodes in insertion order
+	node->prev = live_tail;
+	node->next = NULL;
+	if (live_tail)
+	{
+		live_tail->next = node;
+	}
+	else
+	{
+		live_head = node;
+	}
+	live_tail = node;
+	live_len++;
+
+	node->seq = next_seq++;
+
+	*r_node = node;
+	return BEER_OK;
+}
+
+// inserts a node in a list ordered by decreasing sequence number; new nodes
+// go first, nodes moved between cells or groups walk past the newer ones
+static void
+list_insert(struct BeerRenderNode **head, struct BeerRenderNode *node)
+{
+	struct BeerRenderNode *prev = NULL, *next = *head;
+	while (next && next->seq > node->seq)
+	{
+		prev = next;
+		next = next->cell_next;
+	}
+
+	node->cell_prev = prev;
+	node->cell_next = next;
+	if (prev)
+	{
+		prev->cell_next = node;
+	}
+	else
+	{
+		*head = node;
+	}
+	if (next)
+	{
+		next->cell_prev = node;
+	}
+}
+
+static void
+list_remove(struct BeerRenderNode **head, struct BeerRenderNode *node)
+{
+	if (node->cell_prev)
+	{
+		node->cell_prev->cell_next = node->cell_next;
+	}
+	else
+	{
+		*head = node->cell_next;
+	}
+
+	if (node->cell_next)
+	{
+		node->cell_next->cell_prev = node->cell_prev;
+	}
+	node->cell_prev = node->cell_next = NULL;
+}
+
+static inline int
+world_to_cell(float coord)
+{
+	return (int)floorf(coord / GRID_CELL_SIZE);
+}
+
+static inline struct BeerRenderNode**
+grid_bucket(struct DrawGroup *group, int cell_x, int cell_y)
+{
+	unsigned hash = ((unsigned)cell_x * 73856093u) ^ ((unsigned)cell_y * 19349663u);
+	return &group->grid[hash & (GRID_BUCKETS - 1)];
+}
+
+static void
+grid_update(struct BeerRenderNode *node)
+{
+	struct BeerSprite *sprite = (struct BeerSprite*)node->data;
+	int cell_x = world_to_cell(sprite->x);
+	int cell_y = world_to_cell(sprite->y);
+
+	if (cell_x != node->cell_x || cell_y != node->cell_y)
+	{
+		list_remove(grid_bucket(node->group, node->cell_x, node->cell_y), node);
+		node->cell_x = cell_x;
+		node->cell_y = cell_y;
+		list_insert(grid_bucket(node->group, cell_x, cell_y), node);
+	}
+}
+
+static void
+bound_add(struct DrawGroup *group, const struct BeerSpriteSheet *sheet)
+{
+	if (sheet->max_width > group->max_w)
+	{
+		group->max_w = sheet->max_width;
+		group->max_w_len = 0;
+	}
+	if (sheet->max_height > group->max_h)
+	{
+		group->max_h = sheet->max_height;
+		group->max_h_len = 0;
+	}
+	group->max_w_len += sheet->max_width == group->max_w;
+	group->max_h_len += sheet->max_height == group->max_h;
+}
+
+// shrinks the bound of a group once the last sprite node of its size is gone
+static void
+bound_remove(struct DrawGroup *group, const struct BeerSpriteSheet *sheet)
+{
+	bool shrink = false;
+	if (sheet->max_width == group->max_w)
+	{
+		shrink |= --group->max_w_len == 0;
+	}
+	if (sheet->max_height == group->max_h)
+	{
+		shrink |= --group->max_h_len == 0;
+	}
+	if (!shrink)
+	{
+		return;
+	}
+
+	group->max_w = group->max_h = group->max_w_len = group->max_h_len = 0;
+	for (unsigned i = 0; i < GRID_BUCKETS && group->grid_len; i++)
 	{
-		if (render_list[i].type == NODE_TYPE_NONE)
+		for (struct BeerRenderNode *node = group->grid[i]; node; node = node->cell_next)
 		{
-			*r_node = render_list + i;
-			return BEER_OK;
+			bound_add(group, ((struct BeerSprite*)node->data)->sheet);
 		}
 	}
-	return BEER_ERR_RENDER_QUEUE_FULL;
+}
+
+static struct BeerTexture*
+node_texture(enum NodeType type, void *data)
+{
+	switch (type)
+	{
+	case NODE_TYPE_SPRITE:
+		return ((struct BeerSprite*)data)->sheet->texture;
+	case NODE_TYPE_SPRITE_BATCH:
+		return ((struct BeerSpriteBatch*)data)->sheet->texture;
+	case NODE_TYPE_TILE_LAYER:
+		return ((struct BeerTileLayer*)data)->sheet->texture;
+	default:
+		return NULL;
+	}
 }
 
 static beer_err
-remove_node(struct BeerRenderNode *node)
+get_group(int layer, struct BeerTexture *texture, struct DrawGroup **r_group)
 {
-	for (unsigned long i = 0; i < RENDER_LIST_LEN; i++)
+	// find the group, or the last group of a lower or same layer to insert
+	// the new group after; groups of a layer keep their creation order
+	struct DrawGroup *after = NULL;
+	for (struct DrawGroup *group = groups; group && group->layer <= layer; group = group->next)
 	{
-		if (node == render_list + i)
+		if (group->layer == layer && group->texture == texture)
 		{
-			memset(node, 0, sizeof(struct BeerRenderNode));
+			*r_group = group;
 			return BEER_OK;
 		}
+		after = group;
+	}
+
+	struct DrawGroup *group = NULL;
+	beer_err err = beer_pool_new(&group_pool, &group);
+	if (err)
+	{
+		return err;
+	}
+	group->layer = layer;
+	group->texture = texture;
+
+	group->prev = after;
+	group->next = after ? after->next : groups;
+	if (group->next)
+	{
+		group->next->prev = group;
+	}
+	if (after)
+	{
+		after->next = group;
+	}
+	else
+	{
+		groups = group;
+	}
+
+	*r_group = group;
+	return BEER_OK;
+}
+
+static void
+group_add(struct DrawGroup *group, struct BeerRenderNode *node)
+{
+	node->group = group;
+	group->len++;
+
+	if (node->type == NODE_TYPE_SPRITE)
+	{
+		struct BeerSprite *sprite = (struct BeerSprite*)node->data;
+		node->cell_x = world_to_cell(sprite->x);
+		node->cell_y = world_to_cell(sprite->y);
+		list_insert(grid_bucket(group, node->cell_x, node->cell_y), node);
+		group->grid_len++;
+		bound_add(group, sprite->sheet);
+	}
+	else
+	{
+		list_insert(&group->unindexed, node);
+	}
+}
+
+static void
+group_remove(struct BeerRenderNode *node)
+{
+	struct DrawGroup *group = node->group;
+
+	if (node->type == NODE_TYPE_SPRITE)
+	{
+		list_remove(grid_bucket(group, node->cell_x, node->cell_y), node);
+		group->grid_len--;
+		bound_remove(group, ((struct BeerSprite*)node->data)->sheet);
+	}
+	else
+	{
+		list_remove(&group->unindexed, node);
+	}
+	node->group = NULL;
+
+	if (--group->len == 0)
+	{
+		if (group->prev)
+		{
+			group->prev->next = group->next;
+		}
+		else
+		{
+			groups = group->next;
+		}
+
+		if (group->next)
+		{
+			group->next->prev = group->prev;
+		}
+		beer_pool_free(&group_pool, group);
 	}
-	return BEER_ERR_RENDER_BAD_NODE;
 }
 
-static beer_err
-render_sprite(struct BeerSprite *sprite)
+static void
+free_node(struct BeerRenderNode *node)
 {
-	struct BeerRect rect = sprite->sheet->frames[sprite->frame];
-	struct BeerTexture *tex = sprite->sheet->texture;
+	if (node->prev)
+	{
+		node->prev->next = node->next;
+	}
+	else
+	{
+		live_head = node->next;
+	}
 
-	SDL_Rect src = {
-		.x = rect.x,
-		.y = rect.y,
-		.w = (int)rect.width,
-		.h = (int)rect.height,
-	};
-	SDL_Rect dst = src;
-	dst.x = roundf(sprite->x);
-	dst.y = roundf(sprite->y);
-
-	int result = SDL_RenderCopy(
-		g_renderer,
-		(SDL_Texture*)tex->data_,
-		&src,
-		&dst
-	);
-	if (result != 0)
+	if (node->next)
 	{
-		return BEER_ERR_SDL;
+		node->next->prev = node->prev;
 	}
-	return BEER_OK;
+	else
+	{
+		live_tail = node->prev;
+	}
+	live_len--;
+
+	beer_free(node->prev_positions);
+	beer_pool_free(&node_pool, node);
 }
 
-beer_err
-beer_renderer_add_sprite_node(struct BeerSprite *sprite, struct BeerRenderNode **r_node)
+static beer_err
+add_node(enum NodeType type, void *data, struct BeerRenderNode **r_node)
 {
-	assert(sprite);
-	assert(r_node);
+	struct DrawGroup *group = NULL;
 	beer_err err = alloc_node(r_node);
 	if (err)
 	{
 		return err;
 	}
 
-	(*r_node)->type = NODE_TYPE_SPRITE;
-	(*r_node)->data = (void*)sprite;
+	(*r_node)->type = type;
+	(*r_node)->data = data;
+
+	err = get_group(0, node_texture(type, data), &group);
+	if (err)
+	{
+		free_node(*r_node);
+		*r_node = NULL;
+		return err;
+	}
+	group_add(group, *r_node);
 
 	return BEER_OK;
 }
 
-beer_err
-beer_renderer_remove_node(struct BeerRenderNode *node)
+static beer_err
+remove_node(struct BeerRenderNode *node)
 {
-	return remove_node(node);
+	if (!node || node->type == NODE_TYPE_NONE)
+	{
+		return BEER_ERR_RENDER_BAD_NODE;
+	}
+
+	group_remove(node);
+	free_node(node);
+
+	return BEER_OK;
+}
+
+static void
+update_view(const struct BeerCamera *cam)
+{
+	int out_w = 0, out_h = 0;
+	SDL_GetRendererOutputSize(g_renderer, &out_w, &out_h);
+
+	view.x = cam->x;
+	view.y = cam->y;
+	view.w = out_w / cam->zoom;
+	view.h = out_h / cam->zoom;
+	view.zoom = cam->zoom;
+}
+
+bool
+beer_renderer_project(float x, float y, unsigned w, unsigned h, SDL_Rect *r_dst)
+{
+	if (x >= view.x + view.w || y >= view.y + view.h || x + w <= view.x || y + h <= view.y)
+	{
+		return false;
+	}
+
+	// round both edges, so that adjacent rectangles stay seamless when zoomed
+	int x0 = (int)roundf((x - view.x) * view.zoom);
+	int y0 = (int)roundf((y - view.y) * view.zoom);
+	int x1 = (int)roundf((x + w - view.x) * view.zoom);
+	int y1 = (int)roundf((y + h - view.y) * view.zoom);
+
+	r_dst->x = x0;
+	r_dst->y = y0;
+	r_dst->w = x1 - x0;
+	r_dst->h = y1 - y0;
+
+	return true;
 }
 
 beer_err
-beer_renderer_clear(void)
+beer_renderer_copy(SDL_Texture *texture, const SDL_Rect *src, const SDL_Rect *dst)
 {
-	if (SDL_RenderClear(g_renderer) != 0)
+	if (SDL_RenderCopy(g_renderer, texture, src, dst) != 0)
 	{
 		return BEER_ERR_SDL;
 	}
+
+	frame_stats.drawn++;
+	if (texture != last_texture)
+	{
+		frame_stats.texture_switches++;
+		last_texture = texture;
+	}
+
 	return BEER_OK;
 }
 
-beer_err
-beer_renderer_present(void)
+static beer_err
+render_rect(struct BeerTexture *tex, struct BeerRect rect, float x, float y)
+{
+	SDL_Rect src = {
+		.x = rect.x,
+		.y = rect.y,
+		.w = (int)rect.width,
+		.h = (int)rect.height,
+	};
+	SDL_Rect dst;
+	if (!beer_renderer_project(roundf(x), roundf(y), rect.width, rect.height, &dst))
+	{
+		frame_stats.culled++;
+		return BEER_OK;
+	}
+
+	return beer_renderer_copy((SDL_Texture*)tex->data_, &src, &dst);
+}
+
+static beer_err
+render_frame(struct BeerSpriteSheet *sheet, int frame, float x, float y)
+{
+	return render_rect(sheet->texture, sheet->frames[frame], x, y);
+}
+
+static inline float
+blend(float prev, float cur)
+{
+	return prev + (cur - prev) * alpha;
+}
+
+static beer_err
+render_sprite(struct BeerRenderNode *node)
 {
+	struct BeerSprite *sprite = (struct BeerSprite*)node->data;
+	float x = sprite->x, y = sprite->y;
+	if (node->has_prev)
+	{
+		x = blend(node->prev_x, x);
+		y = blend(node->prev_y, y);
+	}
+	return render_frame(sprite->sheet, sprite->frame, x, y);
+}
+
+static beer_err
+render_sprite_batch(struct BeerRenderNode *node)
+{
+	struct BeerSpriteBatch *batch = (struct BeerSpriteBatch*)node->data;
 	beer_err err = BEER_OK;
+	int frames_len = (int)batch->sheet->frames_len;
+	bool has_prev = node->has_prev && node->prev_positions_len == batch->len;
 
-	for (unsigned int i = 0; i < RENDER_LIST_LEN; i++)
+	for (unsigned i = 0; i < batch->len && !err; i++)
 	{
-		struct BeerRenderNode node = render_list[i];
-		if (node.type == NODE_TYPE_SPRITE)
+		// negative or out of range frames mark hidden sprites
+		int frame = batch->frames[i];
+		if (frame >= 0 && frame < frames_len)
 		{
-			err = render_sprite((struct BeerSprite*)node.data);
+			float x = batch->positions[i * 2];
+			float y = batch->positions[i * 2 + 1];
+			if (has_prev)
+			{
+				x = blend(node->prev_positions[i * 2], x);
+				y = blend(node->prev_positions[i * 2 + 1], y);
+			}
+			err = render_frame(batch->sheet, frame, x, y);
 		}
+	}
+
+	return err;
+}
+
+static beer_err
+snapshot_batch(struct BeerRenderNode *node)
+{
+	struct BeerSpriteBatch *batch = (struct BeerSpriteBatch*)node->data;
+	if (batch->len == 0)
+	{
+		return BEER_OK;
+	}
 
+	if (node->prev_positions_len != batch->len)
+	{
+		void *positions = node->prev_positions;
+		beer_err err = beer_realloc(sizeof(float) * 2 * batch->len, &positions);
 		if (err)
 		{
-			break;
+			return err;
 		}
+		node->prev_positions = positions;
+		node->prev_positions_len = batch->len;
 	}
 
-	SDL_RenderPresent(g_renderer);
+	memcpy(node->prev_positions, batch->positions, sizeof(float) * 2 * batch->len);
 
-	return err;
+	return BEER_OK;
+}
+
+// position in an ordered node list, visiting only the nodes of one cell
+// unless `any_cell` is set, as buckets are shared by distant cells
+struct Cursor
+{
+	struct BeerRenderNode *node;
+	int cell_x, cell_y;
+	bool any_cell;
+};
+
+static void
+cursor_seek(struct Cursor *cursor, struct BeerRenderNode *node)
+{
+	while (node && !cursor->any_cell && (node->cell_x != cursor->cell_x || node->cell_y != cursor->cell_y))
+	{
+		node = node->cell_next;
+	}
+	cursor->node = node;
+}
+
+// restores the order of a heap of cursors, newest node on top, below `i`
+static void
+heap_sift_down(struct Cursor *heap, unsigned len, unsigned i)
+{
+	while (true)
+	{
+		unsigned top = i, left = i * 2 + 1, right = left + 1;
+		if (left < len && heap[left].node->seq > heap[top].node->seq)
+		{
+			top = left;
+		}
+		if (right < len && heap[right].node->seq > heap[top].node->seq)
+		{
+			top = right;
+		}
+		if (top == i)
+		{
+			return;
+		}
+
+		struct Cursor cursor = heap[i];
+		heap[i] = heap[top];
+		heap[top] = cursor;
+		i = top;
+	}
+}
+
+static void
+heap_push(struct Cursor *heap, unsigned *len, struct Cursor cursor, struct BeerRenderNode *head)
+{
+	cursor_seek(&cursor, head);
+	if (cursor.node)
+	{
+		heap[(*len)++] = cursor;
+	}
+}
+
+// collects the nodes of a group in drawing order, either all of them or only
+// those in view
+static beer_err
+collect_nodes(struct DrawGroup *group, bool all, struct BeerRenderNode ***r_list, unsigned *r_len)
+{
+	unsigned len = 0, indexed = 0;
+	struct BeerRenderNode **draw_list = NULL;
+	beer_err err = beer_frame_alloc(sizeof(struct BeerRenderNode*) * group->len, (void**)&draw_list);
+	if (err)
+	{
+		return err;
+	}
+
+	// visit only the cells overlapping the view, extended up and left by the
+	// largest sprite size to catch sprites starting in a neighbouring cell
+	int min_x = world_to_cell(view.x - group->max_w);
+	int min_y = world_to_cell(view.y - group->max_h);
+	int max_x = world_to_cell(view.x + view.w);
+	int max_y = world_to_cell(view.y + view.h);
+	size_t cells = (size_t)(max_x - min_x + 1) * (size_t)(max_y - min_y + 1);
+
+	// when zoomed out over more cells than buckets, all the buckets are
+	// merged and the sprites out of view are culled when drawn
+	bool buckets = all || cells > GRID_BUCKETS;
+	cells = !group->grid_len ? 0 : buckets ? GRID_BUCKETS : cells;
+
+	// one cursor per list to merge: the non-indexed nodes, then the visible
+	// cells or all the buckets
+	struct Cursor *heap = NULL;
+	err = beer_frame_alloc(sizeof(struct Cursor) * (cells + 1), (void**)&heap);
+	if (err)
+	{
+		return err;
+	}
+
+	unsigned heap_len = 0;
+	heap_push(heap, &heap_len, (struct Cursor){.any_cell = true}, group->unindexed);
+	for (unsigned i = 0; i < GRID_BUCKETS && buckets && group->grid_len; i++)
+	{
+		heap_push(heap, &heap_len, (struct Cursor){.any_cell = true}, group->grid[i]);
+	}
+	for (int cy = min_y; cy <= max_y && group->grid_len && !buckets; cy++)
+	{
+		for (int cx = min_x; cx <= max_x; cx++)
+		{
+			struct Cursor cursor = {.cell_x = cx, .cell_y = cy};
+			heap_push(heap, &heap_len, cursor, *grid_bucket(group, cx, cy));
+		}
+	}
+
+	// merge the lists, newest node first
+	for (unsigned i = heap_len / 2; i-- > 0;)
+	{
+		heap_sift_down(heap, heap_len, i);
+	}
+	while (heap_len)
+	{
+		struct BeerRenderNode *node = heap[0].node;
+		draw_list[len++] = node;
+		indexed += node->type == NODE_TYPE_SPRITE;
+
+		cursor_seek(&heap[0], node->cell_next);
+		if (!heap[0].node)
+		{
+			heap[0] = heap[--heap_len];
+		}
+		heap_sift_down(heap, heap_len, 0);
+	}
+
+	// sprite nodes in cells out of view are culled without being visited
+	if (!all)
+	{
+		frame_stats.culled += group->grid_len - indexed;
+	}
+
+	// nodes sharing layer and texture are drawn in insertion order
+	for (unsigned i = 0; i < len / 2; i++)
+	{
+		struct BeerRenderNode *node = draw_list[i];
+		draw_list[i] = draw_list[len - 1 - i];
+		draw_list[len - 1 - i] = node;
+	}
+
+	*r_list = draw_list;
+	*r_len = len;
+	return BEER_OK;
+}
+
+static beer_err
+render_group(struct DrawGroup *group)
+{
+	// nodes to draw, in the frame arena
+	struct BeerRenderNode **draw_list = NULL;
+	unsigned len = 0;
+	beer_err err = collect_nodes(group, false, &draw_list, &len);
+
+	for (unsigned i = 0; i < len && !err; i++)
+	{
+		struct BeerRenderNode *node = draw_list[i];
+		if (node->type == NODE_TYPE_SPRITE)
+		{
+			err = render_sprite(node);
+		}
+		else if (node->type == NODE_TYPE_SPRITE_BATCH)
+		{
+			err = render_sprite_batch(node);
+		}
+		else if (node->type == NODE_TYPE_TILE_LAYER)
+		{
+			struct BeerTileLayer *layer = (struct BeerTileLayer*)node->data;
+			err = beer_tile_layer_render(layer, layer->x, layer->y, true, &frame_stats.culled);
+		}
+	}
+
+	return err;
+}
+
+static beer_err
+commit_item(const struct DrawItem *item)
+{
+	if (back->len == back->capacity)
+	{
+		unsigned capacity = back->capacity ? back->capacity * 2 : 256;
+		void *items = back->items;
+		beer_err err = beer_realloc(sizeof(struct DrawItem) * capacity, &items);
+		if (err)
+		{
+			return err;
+		}
+		back->items = items;
+		back->capacity = capacity;
+	}
+
+	back->items[back->len++] = *item;
+	return BEER_OK;
+}
+
+static beer_err
+commit_frame(struct BeerSpriteSheet *sheet, int frame, float prev_x, float prev_y, float x, float y)
+{
+	struct DrawItem item = {
+		.layer = NULL,
+		.texture = sheet->texture,
+		.rect = sheet->frames[frame],
+		.prev_x = prev_x,
+		.prev_y = prev_y,
+		.x = x,
+		.y = y,
+	};
+	return commit_item(&item);
+}
+
+static beer_err
+commit_sprite_batch(struct BeerRenderNode *node)
+{
+	struct BeerSpriteBatch *batch = (struct BeerSpriteBatch*)node->data;
+	beer_err err = BEER_OK;
+	int frames_len = (int)batch->sheet->frames_len;
+	bool has_prev = node->has_prev && node->prev_positions_len == batch->len;
+
+	for (unsigned i = 0; i < batch->len && !err; i++)
+	{
+		int frame = batch->frames[i];
+		if (frame >= 0 && frame < frames_len)
+		{
+			const float *pos = batch->positions + i * 2;
+			const float *prev = has_prev ? node->prev_positions + i * 2 : pos;
+			err = commit_frame(batch->sheet, frame, prev[0], prev[1], pos[0], pos[1]);
+		}
+	}
+
+	return err;
+}
+
+static beer_err
+commit_group(struct DrawGroup *group)
+{
+	struct BeerRenderNode **nodes = NULL;
+	unsigned len = 0;
+	beer_err err = collect_nodes(group, true, &nodes, &len);
+
+	for (unsigned i = 0; i < len && !err; i++)
+	{
+		struct BeerRenderNode *node = nodes[i];
+		if (node->type == NODE_TYPE_SPRITE)
+		{
+			struct BeerSprite *sprite = (struct BeerSprite*)node->data;
+			float prev_x = node->has_prev ? node->prev_x : sprite->x;
+			float prev_y = node->has_prev ? node->prev_y : sprite->y;
+			err = commit_frame(sprite->sheet, sprite->frame, prev_x, prev_y, sprite->x, sprite->y);
+		}
+		else if (node->type == NODE_TYPE_SPRITE_BATCH)
+		{
+			err = commit_sprite_batch(node);
+		}
+		else if (node->type == NODE_TYPE_TILE_LAYER)
+		{
+			struct BeerTileLayer *layer = (struct BeerTileLayer*)node->data;
+			struct DrawItem item = {
+				.layer = layer,
+				.prev_x = layer->x,
+				.prev_y = layer->y,
+				.x = layer->x,
+				.y = layer->y,
+			};
+			err = commit_item(&item);
+		}
+	}
+
+	return err;
+}
+
+static beer_err
+render_item(const struct DrawItem *item)
+{
+	if (item->layer)
+	{
+		// the chunks are baked when invalidated, while the simulation waits
+		return beer_tile_layer_render(item->layer, item->x, item->y, false, &frame_stats.culled);
+	}
+
+	return render_rect(item->texture, item->rect, blend(item->prev_x, item->x), blend(item->prev_y, item->y));
+}
+
+static void
+begin_draw(const struct BeerCamera *cam)
+{
+	frame_stats.drawn = frame_stats.culled = frame_stats.texture_switches = 0;
+	last_texture = NULL;
+	update_view(cam);
+}
+
+static void
+end_draw(void)
+{
+	beer_stats_mark(BEER_STATS_PHASE_DRAW);
+
+	SDL_RenderPresent(g_renderer);
+
+	SDL_AtomicLock(&state_lock);
+	drawn_stats = frame_stats;
+	SDL_AtomicUnlock(&state_lock);
+}
+
+beer_err
+beer_renderer_add_sprite_node(struct BeerSprite *sprite, struct BeerRenderNode **r_node)
+{
+	assert(sprite);
+	assert(r_node);
+	return add_node(NODE_TYPE_SPRITE, (void*)sprite, r_node);
+}
+
+beer_err
+beer_renderer_add_sprite_batch_node(struct BeerSpriteBatch *batch, struct BeerRenderNode **r_node)
+{
+	assert(batch);
+	assert(r_node);
+	return add_node(NODE_TYPE_SPRITE_BATCH, (void*)batch, r_node);
+}
+
+beer_err
+beer_renderer_add_tile_layer_node(struct BeerTileLayer *layer, struct BeerRenderNode **r_node)
+{
+	assert(layer);
+	assert(r_node);
+	return add_node(NODE_TYPE_TILE_LAYER, (void*)layer, r_node);
+}
+
+beer_err
+beer_renderer_remove_node(struct BeerRenderNode *node)
+{
+	return remove_node(node);
+}
+
+beer_err
+beer_renderer_set_node_layer(struct BeerRenderNode *node, int layer)
+{
+	if (!node || node->type == NODE_TYPE_NONE)
+	{
+		return BEER_ERR_RENDER_BAD_NODE;
+	}
+
+	if (node->group->layer == layer)
+	{
+		return BEER_OK;
+	}
+
+	struct DrawGroup *group = NULL;
+	beer_err err = get_group(layer, node->group->texture, &group);
+	if (err)
+	{
+		return err;
+	}
+
+	// the node keeps its sequence number, and thus its relative order
+	group_remove(node);
+	group_add(group, node);
+
+	return BEER_OK;
+}
+
+beer_err
+beer_renderer_get_node_layer(struct BeerRenderNode *node, int *r_layer)
+{
+	assert(r_layer);
+	if (!node || node->type == NODE_TYPE_NONE)
+	{
+		return BEER_ERR_RENDER_BAD_NODE;
+	}
+
+	*r_layer = node->group->layer;
+
+	return BEER_OK;
+}
+
+beer_err
+beer_renderer_move_sprite_node(struct BeerRenderNode *node, float x, float y)
+{
+	if (!node || node->type != NODE_TYPE_SPRITE)
+	{
+		return BEER_ERR_RENDER_BAD_NODE;
+	}
+
+	struct BeerSprite *sprite = (struct BeerSprite*)node->data;
+	sprite->x = x;
+	sprite->y = y;
+	grid_update(node);
+
+	return BEER_OK;
+}
+
+beer_err
+beer_renderer_set_camera(const struct BeerCamera *cam)
+{
+	assert(cam);
+	assert(cam->zoom > 0);
+
+	camera = *cam;
+
+	return BEER_OK;
+}
+
+beer_err
+beer_renderer_get_camera(struct BeerCamera *r_cam)
+{
+	assert(r_cam);
+
+	*r_cam = camera;
+
+	return BEER_OK;
+}
+
+beer_err
+beer_renderer_clear(void)
+{
+	if (SDL_RenderClear(g_renderer) != 0)
+	{
+		return BEER_ERR_SDL;
+	}
+	return BEER_OK;
+}
+
+beer_err
+beer_renderer_present(void)
+{
+	beer_err err = BEER_OK;
+
+	begin_draw(&camera);
+
+	for (struct DrawGroup *group = groups; group && !err; group = group->next)
+	{
+		err = render_group(group);
+	}
+
+	end_draw();
+
+	return err;
+}
+
+// Copies what the nodes draw into a new render state, which replaces the last
+// one committed; called by the simulation thread after running ticks.
+beer_err
+beer_renderer_commit(unsigned ticks)
+{
+	beer_err err = BEER_OK;
+
+	// textures freed from now on are not part of this state
+	SDL_AtomicLock(&state_lock);
+	back->commit = ++commits;
+	SDL_AtomicUnlock(&state_lock);
+
+	back->len = 0;
+	back->camera = camera;
+	for (struct DrawGroup *group = groups; group && !err; group = group->next)
+	{
+		err = commit_group(group);
+	}
+	if (err)
+	{
+		return err;
+	}
+	back->time = SDL_GetPerformanceCounter();
+
+	SDL_AtomicLock(&state_lock);
+	back->ticks = ticks + (ready_committed ? ready->ticks : 0);
+	struct RenderState *state = ready;
+	ready = back;
+	back = state;
+	ready_committed = true;
+	SDL_AtomicUnlock(&state_lock);
+
+	return BEER_OK;
+}
+
+// destroys the textures freed before the given commit started
+static void
+destroy_pending_textures(Uint64 commit)
+{
+	unsigned len = 0;
+	for (unsigned i = 0; i < pending_len; i++)
+	{
+		if (pending[i].commit < commit)
+		{
+			beer_texture_destroy(pending[i].texture);
+		}
+		else
+		{
+			pending[len++] = pending[i];
+		}
+	}
+	pending_len = len;
+}
+
+// Draws and presents the last committed render state, its positions blended
+// over the tick which follows its commit. Reports the number of ticks run
+// since the previous call.
+beer_err
+beer_renderer_present_committed(Uint64 tick, unsigned *r_ticks)
+{
+	beer_err err = BEER_OK;
+
+	SDL_AtomicLock(&state_lock);
+	*r_ticks = 0;
+	if (ready_committed)
+	{
+		struct RenderState *state = front;
+		front = ready;
+		ready = state;
+		ready_committed = false;
+		*r_ticks = front->ticks;
+	}
+	SDL_AtomicUnlock(&state_lock);
+
+	// states committed before the drawn one are never drawn again
+	destroy_pending_textures(front->commit);
+
+	// nothing to draw until the first commit
+	if (front->time == 0)
+	{
+		end_draw();
+		return BEER_OK;
+	}
+
+	Uint64 elapsed = SDL_GetPerformanceCounter() - front->time;
+	alpha = elapsed < tick ? (float)((double)elapsed / tick) : 1;
+
+	begin_draw(&front->camera);
+
+	for (unsigned i = 0; i < front->len && !err; i++)
+	{
+		err = render_item(&front->items[i]);
+	}
+
+	end_draw();
+
+	return err;
+}
+
+// Destroys a texture once no committed render state may draw it, on the main
+// thread: states committed before it was freed may, later ones do not.
+void
+beer_renderer_release_texture(struct BeerTexture *tex)
+{
+	assert(tex);
+
+	SDL_AtomicLock(&state_lock);
+	Uint64 commit = commits;
+	SDL_AtomicUnlock(&state_lock);
+
+	if (commit == 0)
+	{
+		beer_texture_destroy(tex);
+		return;
+	}
+
+	if (pending_len == pending_capacity)
+	{
+		unsigned capacity = pending_capacity ? pending_capacity * 2 : 16;
+		void *textures = pending;
+		if (beer_realloc(sizeof(struct PendingTexture) * capacity, &textures) != BEER_OK)
+		{
+			// leaked rather than drawn after being destroyed
+			return;
+		}
+		pending = textures;
+		pending_capacity = capacity;
+	}
+
+	pending[pending_len++] = (struct PendingTexture){tex, commit};
+}
+
+// removes a tile layer about to be freed from the render states, on the main
+// thread while the simulation waits
+void
+beer_renderer_forget_tile_layer(struct BeerTileLayer *layer)
+{
+	SDL_AtomicLock(&state_lock);
+	for (unsigned i = 0; i < 3; i++)
+	{
+		struct RenderState *state = &states[i];
+		unsigned len = 0;
+		for (unsigned j = 0; j < state->len; j++)
+		{
+			if (state->items[j].layer != layer)
+			{
+				state->items[len++] = state->items[j];
+			}
+		}
+		state->len = len;
+	}
+	SDL_AtomicUnlock(&state_lock);
+}
+
+beer_err
+beer_renderer_snapshot(void)
+{
+	for (struct BeerRenderNode *node = live_head; node; node = node->next)
+	{
+		if (node->type == NODE_TYPE_SPRITE)
+		{
+			struct BeerSprite *sprite = (struct BeerSprite*)node->data;
+			node->prev_x = sprite->x;
+			node->prev_y = sprite->y;
+		}
+		else if (node->type == NODE_TYPE_SPRITE_BATCH)
+		{
+			beer_err err = snapshot_batch(node);
+			if (err)
+			{
+				return err;
+			}
+		}
+		node->has_prev = true;
+	}
+
+	return BEER_OK;
+}
+
+void
+beer_renderer_set_alpha(float value)
+{
+	alpha = value;
+}
+
+beer_err
+beer_renderer_get_stats(struct BeerRendererStats *r_stats)
+{
+	assert(r_stats);
+
+	struct BeerPoolStats pool_stats;
+	beer_pool_get_stats(&node_pool, &pool_stats);
+
+	SDL_AtomicLock(&state_lock);
+	*r_stats = drawn_stats;
+	SDL_AtomicUnlock(&state_lock);
+
+	r_stats->capacity = pool_stats.capacity;
+	r_stats->nodes = live_len;
+
+	return BEER_OK;
+}
+
+// number of draws issued in the last frame, to be read from the main thread
+unsigned
+beer_renderer_get_drawn(void)
+{
+	SDL_AtomicLock(&state_lock);
+	unsigned drawn = drawn_stats.drawn;
+	SDL_AtomicUnlock(&state_lock);
+	return drawn;
+}
+
+void
+beer_renderer_fini(void)
+{
+	for (struct BeerRenderNode *node = live_head; node; node = node->next)
+	{
+		beer_free(node->prev_positions);
+	}
+
+	beer_pool_fini(&node_pool);
+	beer_pool_fini(&group_pool);
+
+	for (unsigned i = 0; i < 3; i++)
+	{
+		beer_free(states[i].items);
+		states[i] = (struct RenderState){0};
+	}
+	ready_committed = false;
+
+	// nothing draws the states anymore
+	destroy_pending_textures(UINT64_MAX);
+	beer_free(pending);
+	pending = NULL;
+	pending_len = pending_capacity = 0;
+	commits = 0;
+
+	groups = NULL;
+	live_head = live_tail = NULL;
+	live_len = 0;
 }
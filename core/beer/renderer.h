@@ -4,16 +4,73 @@
 #include "error.h"
 
 struct BeerSprite;
+struct BeerSpriteBatch;
+struct BeerTileLayer;
 struct BeerRenderNode;
 
+struct BeerRendererStats
+{
+	// number of node slots currently allocated
+	unsigned capacity;
+
+	// number of nodes in use
+	unsigned nodes;
+
+	// number of draws issued and skipped as out of view in the last frame
+	unsigned drawn;
+	unsigned culled;
+
+	// number of times consecutive draws used different textures in the
+	// last frame
+	unsigned texture_switches;
+};
+
+struct BeerCamera
+{
+	// world position shown at the top-left corner of the window
+	float x, y;
+
+	// scale factor, 1 for no zoom
+	float zoom;
+};
+
 BEER_API beer_err
 beer_renderer_add_sprite_node(struct BeerSprite *sprite, struct BeerRenderNode **r_node);
 
+BEER_API beer_err
+beer_renderer_add_sprite_batch_node(struct BeerSpriteBatch *batch, struct BeerRenderNode **r_node);
+
+BEER_API beer_err
+beer_renderer_add_tile_layer_node(struct BeerTileLayer *layer, struct BeerRenderNode **r_node);
+
 BEER_API beer_err
 beer_renderer_remove_node(struct BeerRenderNode *node);
 
+// Nodes are drawn by ascending layer, new nodes are put on layer 0. Within a
+// layer, nodes are grouped by texture, groups being ordered by creation, and
+// nodes of a group are drawn in the order they were added.
+BEER_API beer_err
+beer_renderer_set_node_layer(struct BeerRenderNode *node, int layer);
+
+BEER_API beer_err
+beer_renderer_get_node_layer(struct BeerRenderNode *node, int *r_layer);
+
+// Sprite nodes are culled through a spatial index, sprites which have a render
+// node must be moved with this function in order to keep it up to date.
+BEER_API beer_err
+beer_renderer_move_sprite_node(struct BeerRenderNode *node, float x, float y);
+
+BEER_API beer_err
+beer_renderer_set_camera(const struct BeerCamera *camera);
+
+BEER_API beer_err
+beer_renderer_get_camera(struct BeerCamera *r_camera);
+
 BEER_API beer_err
 beer_renderer_clear(void);
 
 BEER_API beer_err
 beer_renderer_present(void);
+
+BEER_API beer_err
+beer_renderer_get_stats(struct BeerRendererStats *r_stats);
@@ -0,0 +1,276 @@
+#include "error.h"
+#include "fs.h"
+#include "memory.h"
+#include <SDL.h>
+#include <assert.h>
+#include <stdbool.h>
+#include <string.h>
+
+// Input trace, little endian:
+//
+//     magic, version, tick rate        8s I I
+//     frames                           frame header, then its key events
+//
+// Each frame header holds the number of ticks run and of key events handled
+// before them, the time step of each tick, the frame time and the
+// interpolation alpha it was drawn with. Frames are replayed with the same
+// ticks and time steps whatever the time they actually take.
+#define TRACE_MAGIC "BEERREC"
+#define TRACE_VERSION 1
+#define HEADER_SIZE 16
+#define FRAME_SIZE 16
+#define EVENT_SIZE 12
+
+extern void
+handle_sdl_event(const SDL_Event *evt);
+
+// trace being recorded or replayed, and position of the next frame in it
+static char *trace = NULL;
+static size_t trace_len = 0;
+static size_t trace_capacity = 0;
+static size_t trace_pos = 0;
+
+// whether frames are being recorded, the trace length after the last one,
+// the position of the header of the current one and its number of events
+static bool recording = false;
+static size_t recorded_len = 0;
+static size_t frame_pos = 0;
+static unsigned frame_events = 0;
+
+static void
+write_u16(char *p, Uint16 v)
+{
+	v = SDL_SwapLE16(v);
+	memcpy(p, &v, sizeof(v));
+}
+
+static void
+write_u32(char *p, Uint32 v)
+{
+	v = SDL_SwapLE32(v);
+	memcpy(p, &v, sizeof(v));
+}
+
+static void
+write_float(char *p, float v)
+{
+	v = SDL_SwapFloatLE(v);
+	memcpy(p, &v, sizeof(v));
+}
+
+static Uint16
+read_u16(const char *p)
+{
+	Uint16 v;
+	memcpy(&v, p, sizeof(v));
+	return SDL_SwapLE16(v);
+}
+
+static Uint32
+read_u32(const char *p)
+{
+	Uint32 v;
+	memcpy(&v, p, sizeof(v));
+	return SDL_SwapLE32(v);
+}
+
+static float
+read_float(const char *p)
+{
+	float v;
+	memcpy(&v, p, sizeof(v));
+	return SDL_SwapFloatLE(v);
+}
+
+// the trace is kept up to the last complete frame when running out of memory
+static void
+stop_recording(void)
+{
+	trace_len = recorded_len;
+	recording = false;
+}
+
+// makes room for `size` more bytes at the end of the trace
+static beer_err
+grow(size_t size, char **r_p)
+{
+	if (trace_len + size > trace_capacity)
+	{
+		size_t capacity = trace_capacity ? trace_capacity * 2 : 4096;
+		beer_err err = beer_realloc(capacity, (void**)&trace);
+		if (err)
+		{
+			return err;
+		}
+		trace_capacity = capacity;
+	}
+
+	*r_p = trace + trace_len;
+	trace_len += size;
+	return BEER_OK;
+}
+
+beer_err
+beer_replay_start_recording(unsigned tick_rate)
+{
+	assert(!trace);
+
+	char *p;
+	beer_err err = grow(HEADER_SIZE, &p);
+	if (err)
+	{
+		return err;
+	}
+	memcpy(p, TRACE_MAGIC, sizeof(TRACE_MAGIC));
+	write_u32(p + 8, TRACE_VERSION);
+	write_u32(p + 12, tick_rate);
+
+	recording = true;
+	recorded_len = trace_len;
+	return BEER_OK;
+}
+
+void
+beer_replay_begin_frame(void)
+{
+	char *p;
+	if (!recording)
+	{
+		return;
+	}
+	if (grow(FRAME_SIZE, &p) != BEER_OK)
+	{
+		stop_recording();
+		return;
+	}
+	frame_pos = p - trace;
+	frame_events = 0;
+}
+
+void
+beer_replay_record_event(const SDL_Event *evt)
+{
+	assert(evt);
+
+	// only key events reach the script
+	if (!recording || (evt->type != SDL_KEYDOWN && evt->type != SDL_KEYUP) || frame_events == 0xFFFF)
+	{
+		return;
+	}
+
+	char *p;
+	if (grow(EVENT_SIZE, &p) != BEER_OK)
+	{
+		stop_recording();
+	}
+	else
+	{
+		p[0] = evt->type == SDL_KEYDOWN;
+		p[1] = evt->key.repeat != 0;
+		write_u16(p + 2, 0);
+		write_u32(p + 4, (Uint32)evt->key.keysym.sym);
+		write_u32(p + 8, evt->key.timestamp);
+		frame_events++;
+	}
+}
+
+void
+beer_replay_end_frame(unsigned ticks, float tick_dt, float frame_dt, float alpha)
+{
+	if (recording)
+	{
+		char *p = trace + frame_pos;
+		write_u16(p, (Uint16)(ticks < 0xFFFF ? ticks : 0xFFFF));
+		write_u16(p + 2, (Uint16)frame_events);
+		write_float(p + 4, tick_dt);
+		write_float(p + 8, frame_dt);
+		write_float(p + 12, alpha);
+		recorded_len = trace_len;
+	}
+}
+
+beer_err
+beer_replay_write(const char *filename)
+{
+	assert(filename);
+	assert(trace);
+
+	return beer_file_write(filename, trace, recorded_len);
+}
+
+beer_err
+beer_replay_load(const char *filename, unsigned *r_tick_rate)
+{
+	assert(filename);
+	assert(r_tick_rate);
+	assert(!trace);
+
+	size_t size = 0;
+	beer_err err = beer_file_read(filename, &trace, &size);
+	if (err)
+	{
+		return err;
+	}
+
+	// not counting the NUL-terminator
+	trace_len = size > 0 ? size - 1 : 0;
+	if (trace_len < HEADER_SIZE || memcmp(trace, TRACE_MAGIC, sizeof(TRACE_MAGIC)) != 0 ||
+	    read_u32(trace + 8) != TRACE_VERSION)
+	{
+		beer_free(trace);
+		trace = NULL;
+		return BEER_ERR_IO;
+	}
+
+	*r_tick_rate = read_u32(trace + 12);
+	trace_pos = HEADER_SIZE;
+	return BEER_OK;
+}
+
+// Hands the key events of the next recorded frame to handle_sdl_event(), and
+// gives its timing; returns false at the end of the trace.
+bool
+beer_replay_next_frame(unsigned *r_ticks, float *r_tick_dt, float *r_frame_dt, float *r_alpha)
+{
+	assert(trace);
+
+	if (trace_len - trace_pos < FRAME_SIZE)
+	{
+		return false;
+	}
+
+	const char *p = trace + trace_pos;
+	unsigned events = read_u16(p + 2);
+	if ((trace_len - trace_pos - FRAME_SIZE) / EVENT_SIZE < events)
+	{
+		return false;
+	}
+
+	*r_ticks = read_u16(p);
+	*r_tick_dt = read_float(p + 4);
+	*r_frame_dt = read_float(p + 8);
+	*r_alpha = read_float(p + 12);
+	p += FRAME_SIZE;
+
+	for (unsigned i = 0; i < events; i++, p += EVENT_SIZE)
+	{
+		SDL_Event evt = {.type = p[0] ? SDL_KEYDOWN : SDL_KEYUP};
+		evt.key.state = p[0] ? SDL_PRESSED : SDL_RELEASED;
+		evt.key.repeat = p[1];
+		evt.key.keysym.sym = (SDL_Keycode)read_u32(p + 4);
+		evt.key.timestamp = read_u32(p + 8);
+		handle_sdl_event(&evt);
+	}
+
+	trace_pos = p - trace;
+	return true;
+}
+
+void
+beer_replay_fini(void)
+{
+	beer_free(trace);
+	trace = NULL;
+	trace_len = trace_capacity = trace_pos = 0;
+	recording = false;
+}
@@ -1,4 +1,5 @@
 #include <Python.h> // must be first
+#include <marshal.h>
 
 #include "error.h"
 #include "fs.h"
@@ -7,61 +8,145 @@
 #include <assert.h>
 #include <stdarg.h>
 #include <stdbool.h>
+#include <stdint.h>
+#include <stdio.h>
 #include <string.h>
 
-#ifdef DEBUG
-# include <stdio.h>
-#endif
-
 #define INIT_FUNC_NAME "init"
 #define FINI_FUNC_NAME "fini"
 #define UPDATE_FUNC_NAME "update"
+#define RELOAD_FUNC_NAME "reload"
+
+// suffix appended to the script path to get its bytecode cache path
+#define CACHE_SUFFIX "c"
 
 static const char *funcs_names[] = {
 	INIT_FUNC_NAME,
 	FINI_FUNC_NAME,
 	UPDATE_FUNC_NAME,
+	RELOAD_FUNC_NAME,
 };
 
 enum {
 	INIT_FUNC,
 	FINI_FUNC,
 	UPDATE_FUNC,
+	RELOAD_FUNC,
 	FUNC_MAX,
 };
 
+// bytecode cache file header, followed by the marshalled code object
+struct CacheHeader
+{
+	char magic[8];
+
+	// interpreter bytecode magic number, the code is only valid for it
+	long py_magic;
+
+	// hash of the script source the code was compiled from
+	uint64_t hash;
+};
+
+static const char cache_magic[8] = "BEERPYC";
+
 struct ScriptData
 {
 	PyObject *funcs[FUNC_MAX];
+
+	// script globals
+	PyObject *context;
+
+	// hash of the script source
+	uint64_t hash;
+
+	// absolute path of the script directory, game modules are imported from
+	// there and watched for changes
+	char *directory;
+
+	// source hashes of the game modules, by path
+	PyObject *module_hashes;
 };
 
+// state of the main thread, saved while the GIL is released between script
+// calls so that Python threads can run meanwhile
+static PyThreadState *main_thread_state = NULL;
+
+// state of the simulation thread, when pipelined
+static PyGILState_STATE sim_thread_gil;
+static PyThreadState *sim_thread_state = NULL;
+static bool sim_thread_gil_held = false;
+
+static void
+handle_error(void)
+{
+#ifdef DEBUG
+	PyErr_Print();
+#else
+	PyErr_Clear();
+#endif
+}
+
 static beer_err
 call(struct BeerScript *script, int func, const char *pyarg_fmt, ...)
 {
 	PyObject *callable = ((struct ScriptData*)script->data_)->funcs[func];
+	beer_err err = BEER_OK;
 	if (callable)
 	{
+		PyGILState_STATE gil = PyGILState_Ensure();
 		va_list vargs;
 		va_start(vargs, pyarg_fmt);
 		PyObject *args = Py_VaBuildValue(pyarg_fmt, vargs);
 		PyObject *result = PyObject_Call(callable, args, NULL);
+		va_end(vargs);
 		Py_XDECREF(args);
 		if (!result)
 		{
-#ifdef DEBUG
-			PyErr_Print();
-#endif
-			return BEER_ERR_PY_EXEC;
+			handle_error();
+			err = BEER_ERR_PY_EXEC;
 		}
 		Py_XDECREF(result);
+		PyGILState_Release(gil);
 	}
-	return BEER_OK;
+	return err;
 }
 
 beer_err
-beer_py_init(void)
+beer_py_init(bool minimal, bool import_time)
 {
+#if PY_VERSION_HEX >= 0x03080000
+	PyConfig config;
+	if (minimal)
+	{
+		PyConfig_InitIsolatedConfig(&config);
+		config.site_import = 0;
+	}
+	else
+	{
+		PyConfig_InitPythonConfig(&config);
+	}
+	config.import_time = import_time;
+
+	PyStatus status = Py_InitializeFromConfig(&config);
+	PyConfig_Clear(&config);
+	if (PyStatus_Exception(status))
+	{
+		return BEER_ERR_PY_INIT;
+	}
+#else
+	Py_NoSiteFlag = minimal;
+	Py_IgnoreEnvironmentFlag = minimal;
+	Py_NoUserSiteDirectory = minimal;
+# if PY_VERSION_HEX >= 0x03070000
+	if (import_time)
+	{
+		PySys_AddXOption(L"importtime");
+	}
+# else
+	(void)import_time;
+# endif
 	Py_Initialize();
+#endif
 	if (!Py_IsInitialized())
 	{
 		return BEER_ERR_PY_INIT;
@@ -82,6 +167,11 @@ beer_py_init(void)
 		Py_DECREF(modpath);
 	}
 
+#if PY_VERSION_HEX < 0x03070000
+	PyEval_InitThreads();
+#endif
+	main_thread_state = PyEval_SaveThread();
+
 #ifdef DEBUG
 	printf("Python initialized\n");
 #endif
@@ -94,6 +184,11 @@ beer_py_fini(void)
 {
 	if (Py_IsInitialized())
 	{
+		if (main_thread_state)
+		{
+			PyEval_RestoreThread(main_thread_state);
+			main_thread_state = NULL;
+		}
 		Py_FinalizeEx();
 #ifdef DEBUG
 		printf("Python finalized\n");
@@ -101,104 +196,442 @@ beer_py_fini(void)
 	}
 }
 
-beer_err
-beer_script_load(const char *path, struct BeerScript **r_script)
+// Keeps a Python thread state for the calling thread until
+// beer_py_thread_end(), so that script calls made from it do not create a new
+// one each time; the GIL is not held in between.
+void
+beer_py_thread_begin(void)
 {
-	assert(path);
-	assert(r_script);
+	assert(!sim_thread_gil_held);
+	sim_thread_gil = PyGILState_Ensure();
+	sim_thread_state = PyEval_SaveThread();
+	sim_thread_gil_held = true;
+}
 
-	// read script file contents
-	char *script = NULL;
-	beer_err err = beer_file_read(path, &script, NULL);
+void
+beer_py_thread_end(void)
+{
+	assert(sim_thread_gil_held);
+	PyEval_RestoreThread(sim_thread_state);
+	PyGILState_Release(sim_thread_gil);
+	sim_thread_gil_held = false;
+}
+
+static uint64_t
+hash_source(const char *source, size_t size)
+{
+	// FNV-1a
+	uint64_t hash = 14695981039346656037ULL;
+	for (size_t i = 0; i < size; i++)
+	{
+		hash ^= (unsigned char)source[i];
+		hash *= 1099511628211ULL;
+	}
+	return hash;
+}
+
+static beer_err
+read_source(const char *path, char **r_source, uint64_t *r_hash)
+{
+	size_t size = 0;
+	beer_err err = beer_file_read(path, r_source, &size);
 	if (err)
 	{
 		return err;
 	}
+	else if (!*r_source)
+	{
+		// empty file
+		*r_hash = hash_source("", 0);
+		return beer_alloc0(1, (void**)r_source);
+	}
+
+	// the size includes the NUL-terminator
+	*r_hash = hash_source(*r_source, size - 1);
+	return BEER_OK;
+}
+
+static void
+write_code_cache(const char *cache_path, PyObject *code, uint64_t hash)
+{
+	// the cache is an optimization, failing to write it is not an error
+	PyObject *marshalled = PyMarshal_WriteObjectToString(code, Py_MARSHAL_VERSION);
+	if (!marshalled)
+	{
+		PyErr_Clear();
+		return;
+	}
 
-	PyObject *py = NULL;
+	struct CacheHeader header = {.py_magic = PyImport_GetMagicNumber(), .hash = hash};
+	memcpy(header.magic, cache_magic, sizeof(cache_magic));
+
+	size_t size = sizeof(header) + (size_t)PyBytes_GET_SIZE(marshalled);
+	char *data = NULL;
+	if (beer_alloc(size, (void**)&data) == BEER_OK)
+	{
+		memcpy(data, &header, sizeof(header));
+		memcpy(data + sizeof(header), PyBytes_AS_STRING(marshalled), size - sizeof(header));
+		beer_file_write(cache_path, data, size);
+		beer_free(data);
+	}
+	Py_DECREF(marshalled);
+}
+
+// returns a new reference to the code object of a script, read from its
+// bytecode cache when it was compiled from the same source, otherwise the
+// script is compiled and the cache updated
+static PyObject*
+load_code(const char *path, const char *source, uint64_t hash)
+{
+	size_t cache_path_len = strlen(path) + sizeof(CACHE_SUFFIX);
+	char *cache_path = NULL;
+	if (beer_alloc(cache_path_len, (void**)&cache_path) != BEER_OK)
+	{
+		return PyErr_NoMemory();
+	}
+	snprintf(cache_path, cache_path_len, "%s" CACHE_SUFFIX, path);
+
+	PyObject *code = NULL;
+	char *cached = NULL;
+	size_t cached_size = 0;
+	if (beer_file_read(cache_path, &cached, &cached_size) == BEER_OK &&
+	    cached_size > sizeof(struct CacheHeader) + 1)
+	{
+		struct CacheHeader header;
+		memcpy(&header, cached, sizeof(header));
+		if (memcmp(header.magic, cache_magic, sizeof(cache_magic)) == 0 &&
+		    header.py_magic == PyImport_GetMagicNumber() &&
+		    header.hash == hash)
+		{
+			code = PyMarshal_ReadObjectFromString(
+				cached + sizeof(header),
+				(Py_ssize_t)(cached_size - 1 - sizeof(header))
+			);
+			if (!code || !PyCode_Check(code))
+			{
+				Py_XDECREF(code);
+				code = NULL;
+				PyErr_Clear();
+			}
+		}
+	}
+	beer_free(cached);
+
+	if (!code)
+	{
+		code = Py_CompileString(source, path, Py_file_input);
+		if (code)
+		{
+			write_code_cache(cache_path, code, hash);
+		}
+	}
+
+	beer_free(cache_path);
+	return code;
+}
+
+// runs a script in a new context, returning it along with the script
+// functions
+static beer_err
+exec_script(const char *path, const char *source, uint64_t hash, PyObject **r_context, PyObject *r_funcs[])
+{
+	beer_err err = BEER_OK;
 	PyObject *context = NULL;
-	PyObject *builtins = NULL;
 	PyObject *eval = NULL;
-	PyObject *funcs[FUNC_MAX] = {NULL,};
 
 	// compile the script
-	if (!(py = Py_CompileString(script, path, Py_file_input)))
+	PyObject *code = load_code(path, source, hash);
+	if (!code)
 	{
-#ifdef DEBUG
-		PyErr_Print();
-#endif
-		err = BEER_ERR_PY_COMPILE;
-		goto error;
+		handle_error();
+		return BEER_ERR_PY_COMPILE;
 	}
 
 	// prepare script execution context: create a dict which will hold the
 	// globals and the locals and initialize populate its __builtins__
 	context = PyDict_New();
-	builtins = PyImport_ImportModule("builtins");
+	PyObject *builtins = PyImport_ImportModule("builtins");
 	PyDict_SetItemString(context, "__builtins__", builtins);
 	Py_DECREF(builtins);
 
 	// execute the script
-	eval = PyEval_EvalCode(py, context, context);
+	eval = PyEval_EvalCode(code, context, context);
 	if (!eval)
 	{
-#ifdef DEBUG
-		PyErr_Print();
-#endif
+		handle_error();
 		err = BEER_ERR_PY_EXEC;
-		goto error;
+		goto cleanup;
 	}
 
-	// lookup predefined script functions
+	// lookup predefined script functions, all of them are optional
 	for (int i = 0; i < FUNC_MAX; i++)
 	{
-		PyObject *attr = Py_BuildValue("s", funcs_names[i]);
-		PyObject *func = PyObject_GetItem(context, attr);
-		Py_DECREF(attr);
-
+		PyObject *func = PyDict_GetItemString(context, funcs_names[i]);
 		if (func != NULL && !PyCallable_Check(func))
 		{
 			err = BEER_ERR_PY_BAD_SCRIPT;
-			Py_DECREF(func);
-			goto error;
+			for (int j = 0; j < i; j++)
+			{
+				Py_CLEAR(r_funcs[j]);
+			}
+			goto cleanup;
 		}
 
-		funcs[i] = func;
+		Py_XINCREF(func);
+		r_funcs[i] = func;
 	}
 
-	err = beer_new(struct BeerScript, r_script);
+	*r_context = context;
+	context = NULL;
+
+cleanup:
+	Py_XDECREF(context);
+	Py_XDECREF(eval);
+	Py_DECREF(code);
+
+	return err;
+}
+
+// adds the script directory to the modules search path, returning its
+// absolute path
+static beer_err
+add_script_directory(const char *path, char **r_directory)
+{
+	PyObject *os_path = PyImport_ImportModule("os.path");
+	PyObject *abspath = os_path ? PyObject_CallMethod(os_path, "abspath", "s", path) : NULL;
+	PyObject *directory = abspath ? PyObject_CallMethod(os_path, "dirname", "O", abspath) : NULL;
+	const char *directory_str = directory ? PyUnicode_AsUTF8(directory) : NULL;
+
+	beer_err err = BEER_OK;
+	if (!directory_str)
+	{
+		handle_error();
+		err = BEER_ERR_PY_EXEC;
+	}
+	else
+	{
+		PyObject *syspath = PySys_GetObject("path");
+		if (PySequence_Contains(syspath, directory) == 0)
+		{
+			PyList_Insert(syspath, 0, directory);
+		}
+		*r_directory = strdup(directory_str);
+	}
+
+	Py_XDECREF(directory);
+	Py_XDECREF(abspath);
+	Py_XDECREF(os_path);
+
+	return err;
+}
+
+static bool
+is_game_module(struct ScriptData *data, const char *filename)
+{
+	size_t dir_len = strlen(data->directory);
+	size_t len = strlen(filename);
+	return (
+		len > dir_len + 3 &&
+		strncmp(filename, data->directory, dir_len) == 0 &&
+		(filename[dir_len] == '/' || filename[dir_len] == '\\') &&
+		strcmp(filename + len - 3, ".py") == 0
+	);
+}
+
+// updates the source hashes of the game modules, reloading the ones which
+// changed since the previous check when `reload` is set; modules imported
+// since then are just recorded
+static beer_err
+check_modules(struct ScriptData *data, bool reload, bool *r_changed)
+{
+	beer_err err = BEER_OK;
+
+	// reloading may import other modules, iterate over a snapshot
+	PyObject *modules = PyDict_Values(PyImport_GetModuleDict());
+	for (Py_ssize_t i = 0; i < PyList_GET_SIZE(modules) && !err; i++)
+	{
+		PyObject *module = PyList_GET_ITEM(modules, i);
+		PyObject *file = PyObject_GetAttrString(module, "__file__");
+		const char *filename = file && PyUnicode_Check(file) ? PyUnicode_AsUTF8(file) : NULL;
+		if (!filename)
+		{
+			PyErr_Clear();
+			Py_XDECREF(file);
+			continue;
+		}
+
+		char *source = NULL;
+		uint64_t hash = 0;
+		if (is_game_module(data, filename) && read_source(filename, &source, &hash) == BEER_OK)
+		{
+			PyObject *new_hash = PyLong_FromUnsignedLongLong(hash);
+			PyObject *old_hash = PyDict_GetItem(data->module_hashes, file);
+			bool changed = old_hash && PyObject_RichCompareBool(old_hash, new_hash, Py_NE) == 1;
+			PyDict_SetItem(data->module_hashes, file, new_hash);
+			Py_DECREF(new_hash);
+
+			if (changed && reload)
+			{
+				PyObject *reloaded = PyImport_ReloadModule(module);
+				if (!reloaded)
+				{
+					handle_error();
+					err = BEER_ERR_PY_EXEC;
+				}
+				Py_XDECREF(reloaded);
+				*r_changed = true;
+			}
+		}
+
+		beer_free(source);
+		Py_DECREF(file);
+	}
+	Py_DECREF(modules);
+
+	return err;
+}
+
+static void
+free_data(struct ScriptData *data)
+{
+	for (int i = 0; i < FUNC_MAX; i++)
+	{
+		Py_XDECREF(data->funcs[i]);
+	}
+	Py_XDECREF(data->context);
+	Py_XDECREF(data->module_hashes);
+	free(data->directory);
+	beer_free(data);
+}
+
+beer_err
+beer_script_load(const char *path, struct BeerScript **r_script)
+{
+	assert(path);
+	assert(r_script);
+
+	// read script file contents
+	char *source = NULL;
+	uint64_t hash = 0;
+	beer_err err = read_source(path, &source, &hash);
 	if (err)
 	{
-		goto error;
+		return err;
 	}
 
+	PyGILState_STATE gil = PyGILState_Ensure();
+
 	struct ScriptData *data = NULL;
 	err = beer_new(struct ScriptData, &data);
 	if (err)
 	{
-		beer_free(*r_script);
-		*r_script = NULL;
+		goto cleanup;
+	}
+	data->hash = hash;
+	data->module_hashes = PyDict_New();
+
+	if ((err = add_script_directory(path, &data->directory)) ||
+	    (err = exec_script(path, source, hash, &data->context, data->funcs)) ||
+	    (err = check_modules(data, false, NULL)))
+	{
+		goto error;
+	}
+
+	err = beer_new(struct BeerScript, r_script);
+	if (err)
+	{
 		goto error;
 	}
 
 	(*r_script)->data_ = data;
 	(*r_script)->path = strdup(path);
-	memcpy(data->funcs, funcs, sizeof(funcs));
 
 cleanup:
-	Py_XDECREF(context);
-	Py_XDECREF(eval);
-	beer_free(script);
+	PyGILState_Release(gil);
+	beer_free(source);
 
 	return err;
 
 error:
+	free_data(data);
+	goto cleanup;
+}
+
+beer_err
+beer_script_reload(struct BeerScript *script, bool *r_reloaded)
+{
+	assert(script);
+	assert(r_reloaded);
+
+	struct ScriptData *data = (struct ScriptData*)script->data_;
+	*r_reloaded = false;
+
+	char *source = NULL;
+	uint64_t hash = 0;
+	beer_err err = read_source(script->path, &source, &hash);
+	if (err)
+	{
+		return err;
+	}
+
+	PyGILState_STATE gil = PyGILState_Ensure();
+
+	bool changed = hash != data->hash;
+	err = check_modules(data, true, &changed);
+	if (err || !changed)
+	{
+		goto cleanup;
+	}
+
+	// a broken script is not retried until it changes again
+	data->hash = hash;
+
+	PyObject *context = NULL;
+	PyObject *funcs[FUNC_MAX] = {NULL,};
+	err = exec_script(script->path, source, hash, &context, funcs);
+	if (err)
+	{
+		goto cleanup;
+	}
+
+	// let the new script take over the state of the previous one
+	if (funcs[RELOAD_FUNC])
+	{
+		PyObject *result = PyObject_CallFunctionObjArgs(funcs[RELOAD_FUNC], data->context, NULL);
+		if (!result)
+		{
+			handle_error();
+			err = BEER_ERR_PY_EXEC;
+		}
+		Py_XDECREF(result);
+	}
+
+	if (err)
+	{
+		for (int i = 0; i < FUNC_MAX; i++)
+		{
+			Py_XDECREF(funcs[i]);
+		}
+		Py_DECREF(context);
+		goto cleanup;
+	}
+
+	// swap the script functions and globals, the previous ones are released
+	// unless the new script kept them
 	for (int i = 0; i < FUNC_MAX; i++)
 	{
-		Py_XDECREF(funcs[i]);
+		Py_XDECREF(data->funcs[i]);
+		data->funcs[i] = funcs[i];
 	}
+	Py_DECREF(data->context);
+	data->context = context;
+	*r_reloaded = true;
 
-	goto cleanup;
+cleanup:
+	PyGILState_Release(gil);
+	beer_free(source);
+
+	return err;
 }
 
 void
@@ -206,13 +639,11 @@ beer_script_free(struct BeerScript *script)
 {
 	if (script)
 	{
-		struct ScriptData *data = (struct ScriptData*)script->data_;
-		for (int i = 0; i < FUNC_MAX; i++)
-		{
-			Py_XDECREF(data->funcs[i]);
-		}
-		free(script->data_);
-		free(script);
+		PyGILState_STATE gil = PyGILState_Ensure();
+		free_data((struct ScriptData*)script->data_);
+		PyGILState_Release(gil);
+		free(script->path);
+		beer_free(script);
 	}
 }
 
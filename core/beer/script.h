@@ -2,6 +2,7 @@
 
 #include "defs.h"
 #include "error.h"
+#include <stdbool.h>
 
 struct BeerScript
 {
@@ -12,9 +13,21 @@ struct BeerScript
 	void *data_;
 };
 
+// The compiled script is cached next to it (path + "c") and reused while its
+// source does not change. The script directory is added to the modules search
+// path, so that game modules can be imported from there.
 BEER_API beer_err
 beer_script_load(const char *path, struct BeerScript **r_script);
 
+// Reloads the script when its source or the source of a game module, imported
+// from the script directory, changed since the last load. Changed modules are
+// reloaded and the script is run again in a new context; if it defines a
+// `reload(old_globals)` function, it is called with the globals of the
+// previous script to take over its state, the new script functions replace
+// the previous ones only if it succeeds. `init` is not called again.
+BEER_API beer_err
+beer_script_reload(struct BeerScript *script, bool *r_reloaded);
+
 BEER_API void
 beer_script_free(struct BeerScript *script);
 
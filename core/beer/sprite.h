@@ -11,6 +11,9 @@ struct BeerSpriteSheet
 	// frameset
 	struct BeerRect *frames;
 	unsigned int frames_len;
+
+	// size of the largest frame, bounds the sprites drawn with the sheet
+	unsigned max_width, max_height;
 };
 
 struct BeerSprite
@@ -24,3 +27,18 @@ struct BeerSprite
 	// sheet
 	struct BeerSpriteSheet *sheet;
 };
+
+struct BeerSpriteBatch
+{
+	// sheet shared by all sprites in the batch
+	struct BeerSpriteSheet *sheet;
+
+	// sprite positions, as consecutive (x, y) pairs
+	float *positions;
+
+	// current frames, a negative frame hides the sprite
+	int *frames;
+
+	// number of sprites
+	unsigned len;
+};
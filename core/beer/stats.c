@@ -0,0 +1,189 @@
+#include "memory.h"
+#include "stats.h"
+#include <SDL.h>
+#include <assert.h>
+#include <stdio.h>
+#include <string.h>
+
+extern unsigned
+beer_renderer_get_drawn(void);
+
+static const char *phase_names[] = {
+	"events",
+	"update",
+	"clear",
+	"draw",
+	"present",
+	"wait",
+};
+
+// ring of recorded frames, `frames_head` is the slot of the next one
+static struct BeerFrameStats frames[BEER_STATS_FRAMES];
+static unsigned frames_head = 0;
+static unsigned frames_len = 0;
+
+// guards the recorded frames, which are read from the simulation thread when
+// pipelined
+static SDL_SpinLock frames_lock = 0;
+
+// frame being recorded
+static struct BeerFrameStats current;
+
+static Uint64 origin = 0;
+static Uint64 last_mark = 0;
+static double us_per_count = 0;
+
+// memory counters at the end of the previous frame
+static struct BeerMemoryStats last_memory;
+
+static double
+to_us(Uint64 counter)
+{
+	return (double)counter * us_per_count;
+}
+
+void
+beer_stats_init(void)
+{
+	origin = last_mark = SDL_GetPerformanceCounter();
+	us_per_count = 1e6 / (double)SDL_GetPerformanceFrequency();
+	memset(&current, 0, sizeof(current));
+	frames_head = frames_len = 0;
+	beer_memory_get_stats(&last_memory);
+}
+
+void
+beer_stats_begin_frame(void)
+{
+	last_mark = SDL_GetPerformanceCounter();
+	current.start = to_us(last_mark - origin);
+}
+
+// adds the time elapsed since the previous mark to a phase
+void
+beer_stats_mark(enum BeerStatsPhase phase)
+{
+	assert(phase < BEER_STATS_PHASE_MAX);
+
+	Uint64 now = SDL_GetPerformanceCounter();
+	current.phases[phase] += to_us(now - last_mark);
+	last_mark = now;
+}
+
+void
+beer_stats_count_texture(void)
+{
+	current.textures++;
+}
+
+void
+beer_stats_end_frame(unsigned ticks)
+{
+	struct BeerMemoryStats memory;
+	beer_memory_get_stats(&memory);
+
+	current.ticks = ticks;
+	current.drawn = beer_renderer_get_drawn();
+	current.allocations = memory.allocations - last_memory.allocations;
+	current.bytes = memory.bytes - last_memory.bytes;
+	current.live_bytes = memory.live_bytes;
+	last_memory = memory;
+
+	SDL_AtomicLock(&frames_lock);
+	frames[frames_head] = current;
+	frames_head = (frames_head + 1) % BEER_STATS_FRAMES;
+	if (frames_len < BEER_STATS_FRAMES)
+	{
+		frames_len++;
+	}
+	SDL_AtomicUnlock(&frames_lock);
+
+	unsigned frame = current.frame;
+	memset(&current, 0, sizeof(current));
+	current.frame = frame + 1;
+}
+
+beer_err
+beer_stats_get_frames(struct BeerFrameStats *r_frames, unsigned len, unsigned *r_count)
+{
+	assert(r_frames || len == 0);
+	assert(r_count);
+
+	SDL_AtomicLock(&frames_lock);
+	unsigned count = len < frames_len ? len : frames_len;
+	unsigned first = (frames_head + BEER_STATS_FRAMES - count) % BEER_STATS_FRAMES;
+	for (unsigned i = 0; i < count; i++)
+	{
+		r_frames[i] = frames[(first + i) % BEER_STATS_FRAMES];
+	}
+	SDL_AtomicUnlock(&frames_lock);
+	*r_count = count;
+
+	return BEER_OK;
+}
+
+beer_err
+beer_stats_write_trace(const char *filename)
+{
+	assert(filename);
+
+	FILE *file = fopen(filename, "w");
+	if (!file)
+	{
+		return BEER_ERR_IO;
+	}
+
+	// frames as complete events, their phases nested in them, and their
+	// counters as counter events
+	fprintf(file, "{\"traceEvents\":[\n");
+	unsigned first = (frames_head + BEER_STATS_FRAMES - frames_len) % BEER_STATS_FRAMES;
+	for (unsigned i = 0; i < frames_len; i++)
+	{
+		const struct BeerFrameStats *stats = &frames[(first + i) % BEER_STATS_FRAMES];
+
+		double duration = 0;
+		for (int phase = 0; phase < BEER_STATS_PHASE_MAX; phase++)
+		{
+			duration += stats->phases[phase];
+		}
+
+		fprintf(
+			file,
+			"%s{\"name\":\"frame\",\"ph\":\"X\",\"pid\":1,\"tid\":1,\"ts\":%.3f,\"dur\":%.3f,"
+			"\"args\":{\"frame\":%u,\"ticks\":%u}}",
+			i > 0 ? ",\n" : "",
+			stats->start,
+			duration,
+			stats->frame,
+			stats->ticks
+		);
+
+		double ts = stats->start;
+		for (int phase = 0; phase < BEER_STATS_PHASE_MAX; phase++)
+		{
+			fprintf(
+				file,
+				",\n{\"name\":\"%s\",\"ph\":\"X\",\"pid\":1,\"tid\":1,\"ts\":%.3f,\"dur\":%.3f}",
+				phase_names[phase],
+				ts,
+				stats->phases[phase]
+			);
+			ts += stats->phases[phase];
+		}
+
+		fprintf(
+			file,
+			",\n{\"name\":\"counters\",\"ph\":\"C\",\"pid\":1,\"ts\":%.3f,"
+			"\"args\":{\"drawn\":%u,\"textures\":%u,\"allocations\":%zu,\"bytes\":%zu,\"live_bytes\":%zu}}",
+			stats->start,
+			stats->drawn,
+			stats->textures,
+			stats->allocations,
+			stats->bytes,
+			stats->live_bytes
+		);
+	}
+	fprintf(file, "\n]}\n");
+
+	return fclose(file) == 0 ? BEER_OK : BEER_ERR_IO;
+}
@@ -0,0 +1,67 @@
+#pragma once
+
+#include "defs.h"
+#include "error.h"
+#include <stddef.h>
+
+// number of frames kept by the recorder, older ones are overwritten
+#define BEER_STATS_FRAMES 600
+
+enum BeerStatsPhase
+{
+	// polling and dispatching SDL events
+	BEER_STATS_PHASE_EVENTS,
+
+	// simulation ticks, the script update function mostly
+	BEER_STATS_PHASE_UPDATE,
+
+	// beer_renderer_clear()
+	BEER_STATS_PHASE_CLEAR,
+
+	// draws submitted by beer_renderer_present()
+	BEER_STATS_PHASE_DRAW,
+
+	// SDL_RenderPresent(), including the wait for vsync
+	BEER_STATS_PHASE_PRESENT,
+
+	// frame rate limiter sleep
+	BEER_STATS_PHASE_WAIT,
+
+	BEER_STATS_PHASE_MAX,
+};
+
+struct BeerFrameStats
+{
+	// number of the frame since startup, first is 0
+	unsigned frame;
+
+	// frame start and time spent in each phase, in microseconds, starts
+	// counted from beer_init()
+	double start;
+	double phases[BEER_STATS_PHASE_MAX];
+
+	// number of simulation ticks run
+	unsigned ticks;
+
+	// number of draws issued
+	unsigned drawn;
+
+	// number of textures created since the previous frame
+	unsigned textures;
+
+	// number of allocations made through beer_alloc() and friends since the
+	// previous frame, and the amount of bytes they requested
+	size_t allocations;
+	size_t bytes;
+
+	// amount of bytes held by live allocations at the end of the frame
+	size_t live_bytes;
+};
+
+// copies the most recent recorded frames, up to `len`, oldest first
+BEER_API beer_err
+beer_stats_get_frames(struct BeerFrameStats *r_frames, unsigned len, unsigned *r_count);
+
+// writes the recorded frames as a Chrome trace (chrome://tracing, Perfetto)
+BEER_API beer_err
+beer_stats_write_trace(const char *filename);
@@ -1,10 +1,36 @@
 #include "texture.h"
 #include "memory.h"
+#include "stats.h"
 #include <SDL.h>
 #include <assert.h>
 
+// number of textures allocated at once
+#define TEXTURE_PAGE_LEN 64
+
 extern SDL_Renderer *g_renderer;
 
+extern void
+beer_stats_count_texture(void);
+
+extern void
+beer_pipeline_call(void (*func)(void*), void *arg);
+
+extern void
+beer_renderer_release_texture(struct BeerTexture *tex);
+
+// beer_texture_from_buffer() arguments, to run it on the main thread
+struct CreateCall
+{
+	enum BeerPixelFormat fmt;
+	int width, height;
+	char *data;
+	struct BeerTexture *tex;
+	beer_err err;
+};
+
+// textures may outlive the core finalization, the pool is never freed
+static struct BeerPool pool = BEER_POOL("textures", struct BeerTexture, TEXTURE_PAGE_LEN);
+
 static inline int
 beer_pixel_format_to_sdl(enum BeerPixelFormat fmt)
 {
@@ -29,15 +55,9 @@ beer_pixel_format_bpp(enum BeerPixelFormat fmt)
 	}
 }
 
-beer_err
-beer_texture_from_buffer(enum BeerPixelFormat fmt, int width, int height, char *data, struct BeerTexture **r_tex)
+static beer_err
+create_texture(enum BeerPixelFormat fmt, int width, int height, char *data, struct BeerTexture **r_tex)
 {
-	assert(fmt > BEER_PIXEL_FORMAT_UNKNOWN && fmt < BEER_PIXEL_FORMAT_MAX);
-	assert(width > 0);
-	assert(height > 0);
-	assert(data);
-	assert(r_tex);
-
 	// create a SDL_Texture instance
 	SDL_Texture *sdl_tex = SDL_CreateTexture(
 		g_renderer,
@@ -64,9 +84,10 @@ beer_texture_from_buffer(enum BeerPixelFormat fmt, int width, int height, char *
 
 	// create and fill a BeerTexture
 	struct BeerTexture *tex = NULL;
-	beer_err err = beer_new(struct BeerTexture, &tex);
+	beer_err err = beer_pool_new(&pool, &tex);
 	if (err)
 	{
+		SDL_DestroyTexture(sdl_tex);
 		return err;
 	}
 
@@ -77,15 +98,61 @@ beer_texture_from_buffer(enum BeerPixelFormat fmt, int width, int height, char *
 
 	*r_tex = tex;
 
+	beer_stats_count_texture();
+
+	return BEER_OK;
+}
+
+static void
+create_call(void *arg)
+{
+	struct CreateCall *call = (struct CreateCall*)arg;
+	call->err = create_texture(call->fmt, call->width, call->height, call->data, &call->tex);
+}
+
+beer_err
+beer_texture_from_buffer(enum BeerPixelFormat fmt, int width, int height, char *data, struct BeerTexture **r_tex)
+{
+	assert(fmt > BEER_PIXEL_FORMAT_UNKNOWN && fmt < BEER_PIXEL_FORMAT_MAX);
+	assert(width > 0);
+	assert(height > 0);
+	assert(data);
+	assert(r_tex);
+
+	// the renderer is owned by the main thread
+	struct CreateCall call = {fmt, width, height, data, NULL, BEER_OK};
+	beer_pipeline_call(create_call, &call);
+	if (call.err)
+	{
+		return call.err;
+	}
+
+	*r_tex = call.tex;
 	return BEER_OK;
 }
 
+// destroys a texture no render state refers to, on the main thread
 void
-beer_texture_free(struct BeerTexture *tex)
+beer_texture_destroy(struct BeerTexture *tex)
+{
+	SDL_DestroyTexture((SDL_Texture*)tex->data_);
+	beer_pool_free(&pool, tex);
+}
+
+static void
+free_texture(void *arg)
 {
+	struct BeerTexture *tex = (struct BeerTexture*)arg;
 	if (tex)
 	{
-		SDL_DestroyTexture((SDL_Texture*)tex->data_);
-		beer_free(tex);
+		beer_renderer_release_texture(tex);
 	}
 }
+
+void
+beer_texture_free(struct BeerTexture *tex)
+{
+	// render states committed before may still draw it, it is destroyed once
+	// they are all replaced
+	beer_pipeline_call(free_texture, tex);
+}
@@ -0,0 +1,383 @@
+#include "tilelayer.h"
+#include "memory.h"
+#include "primitives.h"
+#include "sprite.h"
+#include "texture.h"
+#include <SDL.h>
+#include <assert.h>
+#include <stdbool.h>
+
+// chunk side length, in tiles
+#define CHUNK_LEN 32
+
+extern SDL_Renderer *g_renderer;
+
+extern bool
+beer_renderer_project(float x, float y, unsigned w, unsigned h, SDL_Rect *r_dst);
+
+extern beer_err
+beer_renderer_copy(SDL_Texture *texture, const SDL_Rect *src, const SDL_Rect *dst);
+
+extern void
+beer_renderer_forget_tile_layer(struct BeerTileLayer *layer);
+
+extern bool
+beer_pipeline_is_running(void);
+
+extern void
+beer_pipeline_call(void (*func)(void*), void *arg);
+
+struct Chunk
+{
+	// baked chunk image, created on first bake
+	SDL_Texture *texture;
+
+	// whether the chunk image is out of date with the layer tiles
+	bool dirty;
+};
+
+struct TileLayerData
+{
+	struct Chunk *chunks;
+	unsigned chunks_w, chunks_h;
+};
+
+// beer_tile_layer_invalidate() arguments, to run it on the main thread
+struct InvalidateCall
+{
+	struct BeerTileLayer *layer;
+	unsigned x, y, w, h;
+	beer_err err;
+};
+
+static inline unsigned
+min_u(unsigned a, unsigned b)
+{
+	return a < b ? a : b;
+}
+
+static beer_err
+draw_tiles(
+	struct BeerTileLayer *layer,
+	unsigned x,
+	unsigned y,
+	unsigned w,
+	unsigned h,
+	const SDL_Point *origin,
+	unsigned *r_culled
+)
+{
+	struct BeerSpriteSheet *sheet = layer->sheet;
+	SDL_Texture *sdl_tex = (SDL_Texture*)sheet->texture->data_;
+	bool to_screen = origin != NULL;
+
+	for (unsigned ty = y; ty < y + h; ty++)
+	{
+		for (unsigned tx = x; tx < x + w; tx++)
+		{
+			int frame = layer->tiles[ty * layer->width + tx];
+			if (frame < 0 || frame >= (int)sheet->frames_len)
+			{
+				continue;
+			}
+
+			struct BeerRect rect = sheet->frames[frame];
+			SDL_Rect src = {
+				.x = rect.x,
+				.y = rect.y,
+				.w = (int)rect.width,
+				.h = (int)rect.height,
+			};
+			SDL_Rect dst = {
+				.x = (int)((tx - x) * layer->tile_width),
+				.y = (int)((ty - y) * layer->tile_height),
+				.w = src.w,
+				.h = src.h,
+			};
+
+			// tiles are either drawn in chunk space while baking, or in
+			// world space, through the camera
+			if (to_screen && !beer_renderer_project(
+				origin->x + dst.x,
+				origin->y + dst.y,
+				rect.width,
+				rect.height,
+				&dst))
+			{
+				(*r_culled)++;
+				continue;
+			}
+
+			beer_err err = BEER_OK;
+			if (to_screen)
+			{
+				err = beer_renderer_copy(sdl_tex, &src, &dst);
+			}
+			else if (SDL_RenderCopy(g_renderer, sdl_tex, &src, &dst) != 0)
+			{
+				err = BEER_ERR_SDL;
+			}
+
+			if (err)
+			{
+				return err;
+			}
+		}
+	}
+
+	return BEER_OK;
+}
+
+static beer_err
+bake_chunk(struct BeerTileLayer *layer, unsigned cx, unsigned cy, struct Chunk *chunk)
+{
+	unsigned x = cx * CHUNK_LEN;
+	unsigned y = cy * CHUNK_LEN;
+	unsigned w = min_u(CHUNK_LEN, layer->width - x);
+	unsigned h = min_u(CHUNK_LEN, layer->height - y);
+
+	if (!chunk->texture)
+	{
+		chunk->texture = SDL_CreateTexture(
+			g_renderer,
+			SDL_PIXELFORMAT_RGBA32,
+			SDL_TEXTUREACCESS_TARGET,
+			(int)(w * layer->tile_width),
+			(int)(h * layer->tile_height)
+		);
+		if (!chunk->texture)
+		{
+			return BEER_ERR_SDL;
+		}
+		SDL_SetTextureBlendMode(chunk->texture, SDL_BLENDMODE_BLEND);
+	}
+
+	if (SDL_SetRenderTarget(g_renderer, chunk->texture) != 0)
+	{
+		return BEER_ERR_SDL;
+	}
+
+	Uint8 r, g, b, a;
+	SDL_GetRenderDrawColor(g_renderer, &r, &g, &b, &a);
+	SDL_SetRenderDrawColor(g_renderer, 0, 0, 0, 0);
+	SDL_RenderClear(g_renderer);
+	SDL_SetRenderDrawColor(g_renderer, r, g, b, a);
+
+	// tiles of a layer never overlap, copy them verbatim so that the alpha
+	// channel is preserved and blending happens only once, when the chunk is
+	// drawn
+	SDL_Texture *sheet_tex = (SDL_Texture*)layer->sheet->texture->data_;
+	SDL_BlendMode blend_mode;
+	SDL_GetTextureBlendMode(sheet_tex, &blend_mode);
+	SDL_SetTextureBlendMode(sheet_tex, SDL_BLENDMODE_NONE);
+
+	beer_err err = draw_tiles(layer, x, y, w, h, NULL, NULL);
+
+	SDL_SetTextureBlendMode(sheet_tex, blend_mode);
+	if (SDL_SetRenderTarget(g_renderer, NULL) != 0 && !err)
+	{
+		err = BEER_ERR_SDL;
+	}
+
+	chunk->dirty = err != BEER_OK;
+
+	return err;
+}
+
+beer_err
+beer_tile_layer_new(
+	struct BeerSpriteSheet *sheet,
+	unsigned width,
+	unsigned height,
+	unsigned tile_width,
+	unsigned tile_height,
+	struct BeerTileLayer **r_layer
+)
+{
+	assert(sheet);
+	assert(width > 0 && height > 0);
+	assert(tile_width > 0 && tile_height > 0);
+	assert(r_layer);
+
+	struct BeerTileLayer *layer = NULL;
+	struct TileLayerData *data = NULL;
+	beer_err err;
+
+	if ((err = beer_new(struct BeerTileLayer, &layer)) ||
+	    (err = beer_new(struct TileLayerData, &data)) ||
+	    (err = beer_alloc(sizeof(int) * width * height, (void**)&layer->tiles)))
+	{
+		goto error;
+	}
+
+	data->chunks_w = (width + CHUNK_LEN - 1) / CHUNK_LEN;
+	data->chunks_h = (height + CHUNK_LEN - 1) / CHUNK_LEN;
+	err = beer_alloc0(sizeof(struct Chunk) * data->chunks_w * data->chunks_h, (void**)&data->chunks);
+	if (err)
+	{
+		goto error;
+	}
+
+	for (unsigned i = 0; i < width * height; i++)
+	{
+		layer->tiles[i] = -1;
+	}
+
+	for (unsigned i = 0; i < data->chunks_w * data->chunks_h; i++)
+	{
+		data->chunks[i].dirty = true;
+	}
+
+	layer->sheet = sheet;
+	layer->width = width;
+	layer->height = height;
+	layer->tile_width = tile_width;
+	layer->tile_height = tile_height;
+	layer->data_ = data;
+
+	*r_layer = layer;
+
+	return BEER_OK;
+
+error:
+	if (layer)
+	{
+		beer_free(layer->tiles);
+	}
+	beer_free(data);
+	beer_free(layer);
+	return err;
+}
+
+static void
+free_layer(void *arg)
+{
+	struct BeerTileLayer *layer = (struct BeerTileLayer*)arg;
+	if (layer)
+	{
+		beer_renderer_forget_tile_layer(layer);
+
+		struct TileLayerData *data = (struct TileLayerData*)layer->data_;
+		for (unsigned i = 0; i < data->chunks_w * data->chunks_h; i++)
+		{
+			if (data->chunks[i].texture)
+			{
+				SDL_DestroyTexture(data->chunks[i].texture);
+			}
+		}
+		beer_free(data->chunks);
+		beer_free(data);
+		beer_free(layer->tiles);
+		beer_free(layer);
+	}
+}
+
+static void
+invalidate(void *arg)
+{
+	struct InvalidateCall *call = (struct InvalidateCall*)arg;
+	struct BeerTileLayer *layer = call->layer;
+	struct TileLayerData *data = (struct TileLayerData*)layer->data_;
+	unsigned x = call->x, y = call->y, w = call->w, h = call->h;
+
+	for (unsigned cy = y / CHUNK_LEN; cy <= (y + h - 1) / CHUNK_LEN; cy++)
+	{
+		for (unsigned cx = x / CHUNK_LEN; cx <= (x + w - 1) / CHUNK_LEN; cx++)
+		{
+			struct Chunk *chunk = &data->chunks[cy * data->chunks_w + cx];
+			chunk->dirty = true;
+
+			// when pipelined, the main thread cannot read the tiles while
+			// drawing, chunks are baked now that the simulation waits
+			if (beer_pipeline_is_running() && SDL_RenderTargetSupported(g_renderer) && !call->err)
+			{
+				call->err = bake_chunk(layer, cx, cy, chunk);
+			}
+		}
+	}
+}
+
+beer_err
+beer_tile_layer_invalidate(struct BeerTileLayer *layer, unsigned x, unsigned y, unsigned w, unsigned h)
+{
+	assert(layer);
+
+	if (x >= layer->width || y >= layer->height || w == 0 || h == 0)
+	{
+		return BEER_OK;
+	}
+
+	struct InvalidateCall call = {
+		.layer = layer,
+		.x = x,
+		.y = y,
+		.w = min_u(w, layer->width - x),
+		.h = min_u(h, layer->height - y),
+		.err = BEER_OK,
+	};
+	beer_pipeline_call(invalidate, &call);
+
+	return call.err;
+}
+
+beer_err
+beer_tile_layer_render(struct BeerTileLayer *layer, float x, float y, bool bake, unsigned *r_culled)
+{
+	struct TileLayerData *data = (struct TileLayerData*)layer->data_;
+	SDL_Point origin = {(int)roundf(x), (int)roundf(y)};
+
+	// without render targets support, fall back to drawing the tiles
+	if (!SDL_RenderTargetSupported(g_renderer))
+	{
+		return draw_tiles(layer, 0, 0, layer->width, layer->height, &origin, r_culled);
+	}
+
+	unsigned chunk_w = CHUNK_LEN * layer->tile_width;
+	unsigned chunk_h = CHUNK_LEN * layer->tile_height;
+
+	for (unsigned cy = 0; cy < data->chunks_h; cy++)
+	{
+		for (unsigned cx = 0; cx < data->chunks_w; cx++)
+		{
+			struct Chunk *chunk = &data->chunks[cy * data->chunks_w + cx];
+
+			// chunks on the layer edges may be smaller
+			unsigned w = min_u(chunk_w, (layer->width - cx * CHUNK_LEN) * layer->tile_width);
+			unsigned h = min_u(chunk_h, (layer->height - cy * CHUNK_LEN) * layer->tile_height);
+
+			SDL_Rect dst;
+			float chunk_x = (float)origin.x + cx * chunk_w;
+			float chunk_y = (float)origin.y + cy * chunk_h;
+			if (!beer_renderer_project(chunk_x, chunk_y, w, h, &dst))
+			{
+				(*r_culled)++;
+				continue;
+			}
+
+			// chunks not baked yet are left out when baking is not allowed
+			beer_err err = BEER_OK;
+			if (bake && chunk->dirty && (err = bake_chunk(layer, cx, cy, chunk)))
+			{
+				return err;
+			}
+			if (!chunk->texture)
+			{
+				continue;
+			}
+
+			if ((err = beer_renderer_copy(chunk->texture, NULL, &dst)))
+			{
+				return err;
+			}
+		}
+	}
+
+	return BEER_OK;
+}
+
+void
+beer_tile_layer_free(struct BeerTileLayer *layer)
+{
+	// the chunk textures are destroyed on the main thread
+	beer_pipeline_call(free_layer, layer);
+}
@@ -0,0 +1,43 @@
+#pragma once
+
+#include "defs.h"
+#include "error.h"
+
+struct BeerSpriteSheet;
+
+struct BeerTileLayer
+{
+	// tiles sheet
+	struct BeerSpriteSheet *sheet;
+
+	// layer size in tiles
+	unsigned width, height;
+
+	// tile size in pixels
+	unsigned tile_width, tile_height;
+
+	// layer position in pixels
+	float x, y;
+
+	// tile frames, row by row, negative values mark empty tiles
+	int *tiles;
+
+	// private
+	void *data_;
+};
+
+BEER_API beer_err
+beer_tile_layer_new(
+	struct BeerSpriteSheet *sheet,
+	unsigned width,
+	unsigned height,
+	unsigned tile_width,
+	unsigned tile_height,
+	struct BeerTileLayer **r_layer
+);
+
+BEER_API void
+beer_tile_layer_free(struct BeerTileLayer *layer);
+
+BEER_API beer_err
+beer_tile_layer_invalidate(struct BeerTileLayer *layer, unsigned x, unsigned y, unsigned w, unsigned h);
@@ -3,30 +3,180 @@
 #include <assert.h>
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 
 #define WIN_WIDTH 800
 #define WIN_HEIGHT 600
+#define SCRIPT_PATH "game/defense/main.py"
+
+// milliseconds between checks for script changes, when hot reloading
+#define RELOAD_INTERVAL 500
+
+// maximum number of asset archives mounted from the command line
+#define PAKS_MAX 8
 
 static struct BeerScript *script = NULL;
 
+static bool hot_reload = false;
+
+// asset archives to mount, the last ones taking precedence
+static const char *paks[PAKS_MAX];
+static unsigned paks_len = 0;
+
+static void
+reload_script(void)
+{
+	static Uint32 last_check = 0;
+	Uint32 now = SDL_GetTicks();
+	if (now - last_check < RELOAD_INTERVAL)
+	{
+		return;
+	}
+	last_check = now;
+
+	// a broken script is reported and the previous one kept running
+	bool reloaded = false;
+	if (beer_script_reload(script, &reloaded) != BEER_OK)
+	{
+		printf("failed to reload script\n");
+	}
+	else if (reloaded)
+	{
+		printf("script reloaded\n");
+	}
+}
+
 static bool
 update(float dt)
 {
+	if (hot_reload)
+	{
+		reload_script();
+	}
 	return beer_script_invoke_update(script, dt) == BEER_OK;
 }
 
+static void
+print_usage(const char *program)
+{
+	printf(
+		"usage: %s [options]\n"
+		"  --headless        render offscreen, with no window\n"
+		"  --frames N        quit after N frames\n"
+		"  --script PATH     game script to run (default: %s)\n"
+		"  --bench           update once per frame, with no frame rate limit\n"
+		"  --pipelined       run the script on its own thread, drawing meanwhile\n"
+		"  --pak FILE        mount an asset archive, may be repeated\n"
+		"  --record FILE     record the key events and frame timing to a file\n"
+		"  --replay FILE     replay recorded key events and frame timing, then quit\n"
+		"  --trace FILE      write the last frames stats to a Chrome trace on exit\n"
+		"  --reload          reload the script and its game modules when they change\n"
+		"  --minimal-python  start Python with no site and only the engine paths\n"
+		"  --import-time     report the time taken by each Python import\n",
+		program,
+		SCRIPT_PATH
+	);
+}
+
+static bool
+parse_args(int argc, char *argv[], struct BeerConfig *config, const char **script_path)
+{
+	for (int i = 1; i < argc; i++)
+	{
+		if (strcmp(argv[i], "--headless") == 0)
+		{
+			config->headless = true;
+		}
+		else if (strcmp(argv[i], "--frames") == 0 && i + 1 < argc)
+		{
+			config->max_frames = (unsigned)strtoul(argv[++i], NULL, 10);
+		}
+		else if (strcmp(argv[i], "--script") == 0 && i + 1 < argc)
+		{
+			*script_path = argv[++i];
+		}
+		else if (strcmp(argv[i], "--pak") == 0 && i + 1 < argc && paks_len < PAKS_MAX)
+		{
+			paks[paks_len++] = argv[++i];
+		}
+		else if (strcmp(argv[i], "--record") == 0 && i + 1 < argc)
+		{
+			config->record_filename = argv[++i];
+		}
+		else if (strcmp(argv[i], "--replay") == 0 && i + 1 < argc)
+		{
+			config->replay_filename = argv[++i];
+		}
+		else if (strcmp(argv[i], "--trace") == 0 && i + 1 < argc)
+		{
+			config->trace_filename = argv[++i];
+		}
+		else if (strcmp(argv[i], "--minimal-python") == 0)
+		{
+			config->python_minimal = true;
+		}
+		else if (strcmp(argv[i], "--import-time") == 0)
+		{
+			config->python_import_time = true;
+		}
+		else if (strcmp(argv[i], "--reload") == 0)
+		{
+			hot_reload = true;
+		}
+		else if (strcmp(argv[i], "--pipelined") == 0)
+		{
+			config->pipelined = true;
+		}
+		else if (strcmp(argv[i], "--bench") == 0)
+		{
+			// frame times measure the whole update and render cost
+			config->present_mode = BEER_PRESENT_UNCAPPED;
+			config->tick_rate = 0;
+		}
+		else
+		{
+			return false;
+		}
+	}
+
+	// the simulation thread runs at a fixed tick rate, and its ticks are
+	// neither recorded nor replayed
+	if (config->pipelined && (config->tick_rate == 0 || config->record_filename || config->replay_filename))
+	{
+		return false;
+	}
+	return !(config->record_filename && config->replay_filename);
+}
+
 int
 main(int argc, char *argv[])
 {
-	(void)argc;
-	(void)argv;
+	struct BeerConfig config;
+	beer_config_default(WIN_WIDTH, WIN_HEIGHT, &config);
+
+	const char *script_path = SCRIPT_PATH;
+	if (!parse_args(argc, argv, &config, &script_path))
+	{
+		print_usage(argv[0]);
+		return EXIT_FAILURE;
+	}
 
-	if (beer_init(WIN_WIDTH, WIN_HEIGHT) != BEER_OK)
+	if (beer_init(&config) != BEER_OK)
 	{
 		return EXIT_FAILURE;
 	}
 
-	if (beer_script_load("game/defense/main.py", &script) != BEER_OK)
+	// the script and its assets may come from the archives
+	for (unsigned i = 0; i < paks_len; i++)
+	{
+		if (beer_fs_mount(paks[i]) != BEER_OK)
+		{
+			printf("failed to mount %s\n", paks[i]);
+			goto cleanup;
+		}
+	}
+
+	if (beer_script_load(script_path, &script) != BEER_OK)
 	{
 		printf("failed to load script\n");
 		goto cleanup;
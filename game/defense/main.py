@@ -2,146 +2,181 @@
 Defense base game entry point.
 """
 
+from concurrent.futures import Future
 from typing import Dict, Set, Tuple, List, Any, Optional
-import math
 import os
-import pytmx
-import yaml
-from beer.event import KeyCode, get_key_state
-from beer.sprite import Sheet, Sprite
-from beer.texture import Texture
+from beer import pak, pixelcache
+from beer.atlas import Atlas, AtlasBuilder
+from beer.event import KeyCode, get_key_states, poll_events
+from beer.loader import Loader
+from beer.pathfinding import PathFinder
+from beer.tilelayer import TileLayer
+from beer.tilemap import TileMap, load_map as load_tile_map
+from mobs import MobSystem
 
-SPRITES = []
+MAP_FILENAME = 'game/defense/maps/01_demo.tmx'
+CHARACTER_FILENAME = 'game/defense/characters/rob.yaml'
+
+# compiled map, prebuilt atlas and decoded images, rebuilt whenever their
+# sources change
+MAP_CACHE_FILENAME = 'game/defense/.cache/01_demo.map'
+ATLAS_DIRECTORY = 'game/defense/.cache/atlas'
+PIXEL_CACHE_DIRECTORY = 'game/defense/.cache/pixels'
+
+# render layers, Tiled map layers are stacked upwards from MAP_LAYER
+MAP_LAYER = 0
+MOBS_LAYER = 100
+
+# maximum number of mobs alive at once
+MOBS_CAPACITY = 256
+
+LAYERS: List[TileLayer] = []
 
 KEYS: Set[KeyCode] = set()
 
-MAP: Any = None
+MAP: Optional[TileMap] = None
 
+# walkability of the map tiles and flow fields towards mob goals
+PATHFINDER: Optional[PathFinder] = None
 
-class Mob:
+MOBS: Optional[MobSystem] = None
 
-    speed: float
+# mob index of the character
+CHARACTER: Optional[int] = None
 
-    def __init__(self, sprite: Sprite, speed: float) -> None:
-        self.__sprite = sprite
-        self.__dst_x = sprite.x
-        self.__dst_y = sprite.y
-        self.__time_acc = 0.0
-        self.speed = speed
+LOADER = Loader()
 
-    @property
-    def destination(self) -> Tuple[float, float]:
-        return (self.__dst_x, self.__dst_y)
+# level being loaded, the parsed level data first, then its atlas
+LEVEL_FUTURE: Optional['Future[Any]'] = None
+ATLAS_FUTURE: Optional['Future[Atlas]'] = None
 
-    @destination.setter
-    def destination(self, dst: Tuple[int, int]) -> None:
-        self.__dst_x, self.__dst_y = dst
+# globals holding the game state, taken over by the script when hot reloaded
+STATE = ['LAYERS', 'KEYS', 'MAP', 'PATHFINDER', 'MOBS', 'CHARACTER', 'LOADER', 'LEVEL_FUTURE', 'ATLAS_FUTURE']
 
-    @property
-    def is_moving(self) -> bool:
-        return self.__sprite.x != self.__dst_x or self.__sprite.y != self.__dst_y
 
-    def update(self, dt: float) -> None:
-        if not self.is_moving:
-            self.__time_acc = 0.0
-            return
+def load_map(tile_map: TileMap, atlas: Atlas) -> None:
+    global MAP, PATHFINDER  # pylint: disable=global-statement
 
-        self.__time_acc += dt
-        t = 1.0 / self.speed
+    # each map layer is baked into one tile layer per sheet it uses
+    for layer_index, layer in enumerate(tile_map.layers):
+        for sheet, plane in layer.planes.items():
+            tile_layer = TileLayer(
+                atlas.sheet(tile_map.sheets[sheet]),
+                tile_map.width,
+                tile_map.height,
+                tile_map.tile_width,
+                tile_map.tile_height)
+            tile_layer.set_tiles(plane)
+            tile_layer.layer = MAP_LAYER + layer_index
+            tile_layer.visible = True
+            LAYERS.append(tile_layer)
 
-        while self.__time_acc >= t:
-            dx = self.__dst_x - self.__sprite.x
-            if math.fabs(dx) > 0:
-                dx = math.copysign(1, dx)
+    MAP = tile_map
+    PATHFINDER = PathFinder.from_map(tile_map)
 
-            dy = self.__dst_y - self.__sprite.y
-            if math.fabs(dy) > 0:
-                dy = math.copysign(1, dy)
+    print(f'Map {MAP_FILENAME} loaded')
 
-            self.__sprite.x += dx
-            self.__sprite.y += dy
-            self.__time_acc -= dt
 
+def read_character(character_filename: str) -> Tuple[Any, str, Tuple[int, int, int, int]]:
+    """
+    Returns the data of a character along with its sheet filename and frame.
+    """
+    import yaml  # pylint: disable=import-outside-toplevel
 
-CHARACTER: Optional[Mob] = None
+    with pak.open_file(character_filename) as file_handle:
+        data = yaml.safe_load(file_handle)
+        spr_info = data['sprite']
+        sheet_filename = os.path.join(os.path.dirname(character_filename), spr_info['sheet'])
+        rect = spr_info['x'], spr_info['y'], spr_info['w'], spr_info['h']
+        return data, sheet_filename, rect
 
 
-def load_map(tiled_map_filename: str) -> None:
-    global MAP  # pylint: disable=global-statement
+def load_character(character_filename: str, atlas: Atlas) -> None:
+    global MOBS, CHARACTER  # pylint: disable=global-statement
 
-    tiled_map = pytmx.TiledMap(tiled_map_filename)
+    MOBS = MobSystem(atlas.sheet(character_filename), MOBS_CAPACITY)
+    MOBS.batch.layer = MOBS_LAYER
+    MOBS.batch.visible = True
 
-    sheet_tiles: Dict[str, List[Tuple[int, int, int, int]]] = {}
+    # place the character on the spawn point
+    assert MAP is not None
+    spawn_x, spawn_y = [int(coord) for coord in MAP.properties.get('spawn_point', '0,0').split(',')]
+    CHARACTER = MOBS.spawn(MAP.tile_width * spawn_x, MAP.tile_height * spawn_y, 16)
 
-    for filename, rect, _ in (spec for spec in tiled_map.images if spec is not None):
-        sheet_tiles.setdefault(filename, []).append(rect)
 
-    sheet_textures = {
-        filename: Texture(filename) for filename in sheet_tiles
-    }
+def read_level(map_filename: str, character_filename: str) -> Tuple[TileMap, AtlasBuilder]:
+    """
+    Parses the level files, runs on a loader thread.
+    """
+    tile_map = load_tile_map(map_filename, MAP_CACHE_FILENAME)
+    _, character_sheet, character_frame = read_character(character_filename)
 
-    sheets = {
-        filename: Sheet(sheet_textures[filename], sheet_tiles[filename])
-        for filename in sheet_tiles
-    }
+    # map tiles and characters share the atlas pages
+    builder = AtlasBuilder()
+    for filename, frames in zip(tile_map.sheets, tile_map.frames):
+        builder.add(filename, filename, frames)
+    builder.add(character_filename, character_sheet, [character_frame])
 
-    for layer in tiled_map.layers:
-        for x, y, (filename, rect, _) in layer.tiles():
-            sprite = Sprite(sheets[filename])
-            sprite.frame = sheet_tiles[filename].index(rect)
-            sprite.x = x * tiled_map.tilewidth
-            sprite.y = y * tiled_map.tileheight
-            sprite.visible = True
-            SPRITES.append(sprite)
+    return tile_map, builder
 
-    MAP = tiled_map
 
-    print(f'Map {tiled_map_filename} loaded')
+def update_loading() -> bool:
+    """
+    Advances the level loading, returns whether it is still in progress.
+    """
+    global LEVEL_FUTURE, ATLAS_FUTURE  # pylint: disable=global-statement
 
+    LOADER.update()
 
-def load_character(character_filename: str) -> None:
-    global CHARACTER  # pylint: disable=global-statement
+    if LEVEL_FUTURE is None:
+        return False
+    if not LEVEL_FUTURE.done():
+        return True
 
-    with open(character_filename, 'r') as file_handle:
-        data = yaml.load(file_handle)
-        spr_info = data['sprite']
-        texture_filename = os.path.join(os.path.dirname(character_filename), spr_info['sheet'])
-        texture = Texture(texture_filename)
-        rect = spr_info['x'], spr_info['y'], spr_info['w'], spr_info['h']
-        sheet = Sheet(texture, [rect])
-        sprite = Sprite(sheet)
-        sprite.visible = True
-        SPRITES.append(sprite)
+    tile_map, builder = LEVEL_FUTURE.result()
+    if ATLAS_FUTURE is None:
+        ATLAS_FUTURE = LOADER.build_atlas(builder, ATLAS_DIRECTORY)
+    if not ATLAS_FUTURE.done():
+        return True
+
+    atlas = ATLAS_FUTURE.result()
+    LEVEL_FUTURE = ATLAS_FUTURE = None
 
-        # place the character on the spawn point
-        spawn_x, spawn_y = [int(coord) for coord in MAP.properties.get('spawn_point', '0,0').split(',')]
-        sprite.x = MAP.tilewidth * spawn_x
-        sprite.y = MAP.tileheight * spawn_y
+    load_map(tile_map, atlas)
+    load_character(CHARACTER_FILENAME, atlas)
 
-        CHARACTER = Mob(sprite, 16)
+    return False
 
 
 def init() -> None:
-    load_map('game/defense/maps/01_demo.tmx')
-    load_character('game/defense/characters/rob.yaml')
+    global LEVEL_FUTURE  # pylint: disable=global-statement
+
+    pixelcache.enable(PIXEL_CACHE_DIRECTORY)
+    LEVEL_FUTURE = LOADER.submit(read_level, MAP_FILENAME, CHARACTER_FILENAME)
 
     print('Defense initialized')
 
 
 def update(delta_time: float) -> None:
-    global KEYS, MAP, CHARACTER  # pylint: disable=global-statement
-    current_keys = {code for code in KeyCode if get_key_state(code).pressed}
-    for pressed in current_keys - KEYS:
-        print(f'{pressed.name} pressed!')
-    for released in KEYS - current_keys:
-        print(f'{released.name} released!')
-    KEYS = current_keys
-
-    if CHARACTER:
-        if not CHARACTER.is_moving:
-            tw = MAP.tilewidth
-            th = MAP.tileheight
-            dst_x, dst_y = CHARACTER.destination
+    global KEYS  # pylint: disable=global-statement
+    key_states = get_key_states()
+    KEYS = {code for code in KeyCode if key_states[code]}
+    for event in poll_events():
+        if event.pressed:
+            print(f'{event.key.name} pressed!')
+            # keys tapped within the frame count as held for it
+            KEYS.add(event.key)
+        else:
+            print(f'{event.key.name} released!')
+
+    if update_loading():
+        return
+
+    if MOBS is not None and CHARACTER is not None and MAP:
+        if not MOBS.is_moving(CHARACTER):
+            tw = MAP.tile_width
+            th = MAP.tile_height
+            dst_x, dst_y = MOBS.get_destination(CHARACTER)
 
             if KeyCode.W in KEYS:
                 dst_y -= th
@@ -152,11 +187,18 @@ def update(delta_time: float) -> None:
             elif KeyCode.D in KEYS:
                 dst_x += tw
 
-            dst = (dst_x, dst_y)
-            if CHARACTER.destination != dst:
-                CHARACTER.destination = dst
+            MOBS.set_destination(CHARACTER, dst_x, dst_y)
+
+        MOBS.update(delta_time)
+
+def reload(old_globals: Dict[str, Any]) -> None:
+    globals().update({name: old_globals[name] for name in STATE if name in old_globals})
+
+    # keep the mobs running the reloaded code
+    if MOBS is not None:
+        MOBS.__class__ = MobSystem
 
-        CHARACTER.update(delta_time)
 
 def fini() -> None:
+    LOADER.shutdown()
     print('Defense finalized')
@@ -0,0 +1,118 @@
+"""
+Mobs movement system.
+"""
+from typing import Any, List, Sequence, Tuple
+import numpy
+from beer.pathfinding import FlowField
+from beer.sprite import Sheet, SpriteBatch, SpritePool
+
+
+class MobSystem:
+    """
+    Mobs sharing a sheet, moved all at once.
+
+    Mobs walk towards their destination one pixel per step along each axis,
+    taking `speed` steps per second. Positions are kept right in the sprite
+    pool storage, the other mob attributes in arrays alongside it, so that
+    a tick advances every mob with a few array operations, and spawning or
+    killing a wave allocates nothing.
+    """
+
+    def __init__(self, sheet: Sheet, capacity: int) -> None:
+        self.__pool = SpritePool(sheet, capacity)
+        self.__positions: Any = numpy.asarray(self.__pool.batch.positions)
+        self.__destinations = numpy.zeros((capacity, 2), dtype=numpy.float32)
+        self.__speeds = numpy.zeros(capacity, dtype=numpy.float64)
+        self.__time_acc = numpy.zeros(capacity, dtype=numpy.float64)
+        self.__alive = numpy.zeros(capacity, dtype=bool)
+
+    @property
+    def batch(self) -> SpriteBatch:
+        return self.__pool.batch
+
+    @property
+    def pool(self) -> SpritePool:
+        return self.__pool
+
+    @property
+    def capacity(self) -> int:
+        return self.__pool.capacity
+
+    @property
+    def count(self) -> int:
+        return self.__pool.used
+
+    def spawn(self, x: float, y: float, speed: float, frame: int = 0) -> int:
+        """
+        Adds a mob standing at the given position, returns its index.
+        """
+        return self.spawn_many([(x, y)], speed, frame)[0]
+
+    def spawn_many(self, positions: Sequence[Tuple[float, float]], speed: float, frame: int = 0) -> List[int]:
+        """
+        Adds mobs standing at the given positions, returns their indices.
+        """
+        if len(positions) > self.capacity - self.count:
+            raise RuntimeError('mob system is full')
+
+        indices = self.__pool.acquire(len(positions), frame)
+        if not indices:
+            return indices
+        self.__alive[indices] = True
+        self.__positions[indices] = self.__destinations[indices] = positions
+        self.__speeds[indices] = speed
+        self.__time_acc[indices] = 0.0
+        return indices
+
+    def kill(self, index: int) -> None:
+        self.kill_many([index])
+
+    def kill_many(self, indices: Sequence[int]) -> None:
+        self.__pool.release(indices)
+        self.__alive[list(indices)] = False
+
+    def get_position(self, index: int) -> Tuple[float, float]:
+        x, y = self.__positions[index]
+        return float(x), float(y)
+
+    def get_destination(self, index: int) -> Tuple[float, float]:
+        x, y = self.__destinations[index]
+        return float(x), float(y)
+
+    def set_destination(self, index: int, x: float, y: float) -> None:
+        self.__destinations[index] = (x, y)
+
+    def is_moving(self, index: int) -> bool:
+        return bool((self.__positions[index] != self.__destinations[index]).any())
+
+    def follow(self, flow_field: FlowField, tile_width: int, tile_height: int) -> None:
+        """
+        Sends the mobs standing still one tile further along a flow field.
+
+        Mobs are expected to stand on tile corners, as placed by the field.
+        """
+        standing = self.__alive & (self.__positions == self.__destinations).all(axis=1)
+        if not standing.any():
+            return
+
+        tile_size = numpy.array((tile_width, tile_height))
+        tiles = (self.__positions[standing] // tile_size).astype(numpy.intp)
+        self.__destinations[standing] = flow_field.next_tiles(tiles) * tile_size
+
+    def update(self, dt: float) -> None:
+        """
+        Advances the mobs by the given time.
+        """
+        delta = self.__destinations - self.__positions
+        moving = self.__alive & (delta != 0).any(axis=1)
+
+        # whole steps due are taken, the remainder is kept for the next update
+        self.__time_acc[moving] += dt
+        steps = numpy.floor(self.__time_acc * self.__speeds)
+        self.__time_acc -= steps / numpy.where(self.__speeds > 0, self.__speeds, 1.0)
+
+        self.__positions += numpy.sign(delta) * numpy.minimum(numpy.abs(delta), steps[:, numpy.newaxis])
+
+        # mobs standing still start their next move afresh
+        arrived = (self.__positions == self.__destinations).all(axis=1)
+        self.__time_acc[arrived | ~moving] = 0.0